@@ -1,9 +1,21 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, session, stream_with_context
 from finwise_bot import FinWiseBot
+from session_store import SessionStore
+from streaming import SSE_HEADERS, sse_stream
 import json
+import os
 
 app = Flask(__name__)
+# Must be shared by every worker process so session cookies stay valid across them
+app.secret_key = os.getenv('FLASK_SECRET_KEY') or os.urandom(24)
 bot = FinWiseBot()
+sessions = SessionStore(ttl=int(os.getenv('FINWISE_SESSION_TTL', '1800')))
+
+def current_session():
+    """Get the bot state for the user behind this request"""
+    if 'sid' not in session:
+        session['sid'] = SessionStore.new_session_id()
+    return sessions.get(session['sid'])
 
 @app.route('/')
 def home():
@@ -13,19 +25,33 @@ def home():
 def process_command():
     data = request.json
     command = data.get('command', '')
-    response = bot.process_command(command)
+    response = bot.process_command(command, session=current_session())
     return jsonify({'response': response})
 
+@app.route('/api/command/stream', methods=['POST'])
+def stream_command():
+    """Same as /api/command, but sends the response as Server-Sent Events while it is generated"""
+    data = request.json
+    command = data.get('command', '')
+    chunks = bot.stream_command(command, session=current_session())
+    return Response(stream_with_context(sse_stream(chunks)), mimetype='text/event-stream', headers=SSE_HEADERS)
+
 @app.route('/api/mode', methods=['POST'])
 def change_mode():
     data = request.json
     mode = data.get('mode', '')
-    response = bot.process_command(f'mode {mode}')
+    response = bot.process_command(f'mode {mode}', session=current_session())
     return jsonify({'response': response})
 
 @app.route('/api/help')
 def get_help():
     return jsonify({'help': bot.show_help()})
 
+@app.route('/api/health')
+def get_health():
+    """Model backend health; 503 when no backend can take requests"""
+    health = bot.get_backend_health()
+    return jsonify(health), 503 if health['status'] == 'down' else 200
+
 if __name__ == '__main__':
-    app.run(debug=True) 
\ No newline at end of file
+    app.run(debug=True) 
@@ -0,0 +1,150 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from quart import Quart, make_response, render_template, request, jsonify, session
+from finwise_bot import FinWiseBot
+from session_store import SessionStore
+from streaming import SSE_HEADERS, sse_event, sse_stream
+
+# Async serving mode: run with `hypercorn asgi_app:app` (or `python asgi_app.py` for development)
+MAX_CONCURRENCY = int(os.getenv('FINWISE_MAX_CONCURRENCY', '16'))    # Bot calls in flight at once
+QUEUE_TIMEOUT = float(os.getenv('FINWISE_QUEUE_TIMEOUT', '10'))      # Seconds to wait for a free slot
+REQUEST_TIMEOUT = float(os.getenv('FINWISE_REQUEST_TIMEOUT', '90'))  # Seconds before a bot call is abandoned
+
+app = Quart(__name__)
+# Must be shared by every worker process so session cookies stay valid across them
+app.secret_key = os.getenv('FLASK_SECRET_KEY') or os.urandom(24)
+bot = FinWiseBot()
+sessions = SessionStore(ttl=int(os.getenv('FINWISE_SESSION_TTL', '1800')))
+executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY, thread_name_prefix='finwise-worker')
+limiter = None
+
+class BotBusyError(Exception):
+    """Raised when every worker slot stays busy for longer than the queue timeout"""
+
+@app.before_serving
+async def create_limiter():
+    # The semaphore must belong to the serving event loop
+    global limiter
+    limiter = asyncio.Semaphore(MAX_CONCURRENCY)
+
+def current_session():
+    """Get the bot state for the user behind this request"""
+    if 'sid' not in session:
+        session['sid'] = SessionStore.new_session_id()
+    return sessions.get(session['sid'])
+
+async def acquire_slot():
+    """Wait for a free worker slot, giving up after the queue timeout"""
+    try:
+        await asyncio.wait_for(limiter.acquire(), timeout=QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise BotBusyError()
+
+async def run_bot(func, *args):
+    """Run a blocking bot call on the worker pool without blocking the event loop"""
+    await acquire_slot()
+
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(executor, func, *args)
+    # Free the slot when the worker actually finishes, even if the caller stopped waiting
+    future.add_done_callback(lambda _: limiter.release())
+    return await asyncio.wait_for(asyncio.shield(future), timeout=REQUEST_TIMEOUT)
+
+def stream_bot(func, *args):
+    """Start a blocking generator on the worker pool and return an async stream of its SSE messages
+
+    The caller must already hold a worker slot; it is released when the generator finishes.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stop = threading.Event()
+    finished = object()
+
+    def produce():
+        chunks = func(*args)
+        try:
+            for chunk in sse_stream(chunks):
+                if stop.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, chunk)
+        finally:
+            chunks.close()
+            loop.call_soon_threadsafe(queue.put_nowait, finished)
+
+    # Started right away so the slot is released even if the response body is never read
+    future = loop.run_in_executor(executor, produce)
+    future.add_done_callback(lambda _: limiter.release())
+    deadline = loop.time() + REQUEST_TIMEOUT
+
+    async def events():
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=max(deadline - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    yield sse_event({'message': 'This request took too long to complete. Please try again.'}, event='error')
+                    return
+                if item is finished:
+                    return
+                yield item
+        finally:
+            # Client went away or we timed out: let the worker stop at its next chunk
+            stop.set()
+
+    return events()
+
+async def bot_response(func, *args):
+    """Run a bot call and wrap its result, or the reason it failed, in a JSON response"""
+    try:
+        response = await run_bot(func, *args)
+        return jsonify({'response': response})
+    except BotBusyError:
+        return jsonify({'response': 'FinWise is handling a lot of requests right now. Please try again in a moment.'}), 503
+    except asyncio.TimeoutError:
+        return jsonify({'response': 'This request took too long to complete. Please try again.'}), 504
+
+@app.route('/')
+async def home():
+    return await render_template('index.html', modes=bot.modes, commands=bot.commands)
+
+@app.route('/api/command', methods=['POST'])
+async def process_command():
+    data = await request.get_json()
+    command = data.get('command', '')
+    return await bot_response(bot.process_command, command, current_session())
+
+@app.route('/api/command/stream', methods=['POST'])
+async def stream_command():
+    """Same as /api/command, but sends the response as Server-Sent Events while it is generated"""
+    data = await request.get_json()
+    command = data.get('command', '')
+    try:
+        await acquire_slot()
+    except BotBusyError:
+        return jsonify({'response': 'FinWise is handling a lot of requests right now. Please try again in a moment.'}), 503
+
+    response = await make_response(stream_bot(bot.stream_command, command, current_session()), SSE_HEADERS)
+    response.mimetype = 'text/event-stream'
+    response.timeout = None  # stream_bot enforces REQUEST_TIMEOUT itself
+    return response
+
+@app.route('/api/mode', methods=['POST'])
+async def change_mode():
+    data = await request.get_json()
+    mode = data.get('mode', '')
+    return await bot_response(bot.process_command, f'mode {mode}', current_session())
+
+@app.route('/api/help')
+async def get_help():
+    return jsonify({'help': bot.show_help()})
+
+@app.route('/api/health')
+async def get_health():
+    """Model backend health; 503 when no backend can take requests"""
+    health = bot.get_backend_health()
+    return jsonify(health), 503 if health['status'] == 'down' else 200
+
+if __name__ == '__main__':
+    app.run(debug=True)
@@ -0,0 +1,211 @@
+import argparse
+import re
+import subprocess
+import sys
+import time
+
+def run_python(code, *flags):
+    """Run a snippet in a fresh interpreter so nothing is already imported"""
+    return subprocess.run([sys.executable, *flags, '-c', code],
+                          capture_output=True, text=True)
+
+def parse_importtime(stderr):
+    """Parse `python -X importtime` output into (module, self_us, cumulative_us) rows"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((name.rstrip(), int(self_us), int(cumulative_us)))
+    return rows
+
+def bench_imports(module='finwise_bot', top=15, max_ms=None):
+    """Report import cost of a module and the cold start of FinWiseBot"""
+    result = run_python(f"import {module}", '-X', 'importtime')
+    if result.returncode != 0:
+        print(result.stderr.splitlines()[-1] if result.stderr else 'import failed')
+        return 1
+
+    rows = parse_importtime(result.stderr)
+    total_ms = sum(self_us for _, self_us, _ in rows) / 1000
+
+    print(f"📦 Import time for '{module}': {total_ms:,.1f} ms across {len(rows)} modules")
+    print(f"\n{'Module':<50} {'Self (ms)':>10} {'Cumulative (ms)':>16}")
+    print('─' * 78)
+    # Only the module and what it imports directly; deeper entries are already in their parent's cumulative time
+    direct = [row for row in rows if len(row[0]) - len(row[0].lstrip()) <= 3]
+    for name, self_us, cumulative_us in sorted(direct, key=lambda r: r[2], reverse=True)[:top]:
+        print(f"{name.strip():<50} {self_us / 1000:>10.1f} {cumulative_us / 1000:>16.1f}")
+
+    startup = run_python(
+        "import time\n"
+        "started = time.perf_counter()\n"
+        "import finwise_bot\n"
+        "finwise_bot.FinWiseBot()\n"
+        "print(time.perf_counter() - started)"
+    )
+    if startup.returncode == 0:
+        startup_ms = float(startup.stdout.strip().splitlines()[-1]) * 1000
+        print(f"\n⏱️ FinWiseBot cold start (import + init): {startup_ms:,.1f} ms")
+
+    if max_ms is not None and total_ms > max_ms:
+        print(f"\n❌ Import time {total_ms:,.1f} ms exceeds the {max_ms:,.1f} ms budget")
+        return 1
+    return 0
+
+def legacy_format_text(response):
+    """The chained replace/sub formatter FinWiseBot used before response_formatter, kept for comparison"""
+    response = response.replace('**', '')
+    response = response.replace(':**', ':')
+    response = response.replace(':**', ':')
+    response = re.sub(r'(?<!\d)(\d{4,})(?!\d)', lambda m: "{:,}".format(int(m.group(1))), response)
+    response = re.sub(r'(\d+\.?\d*)%', lambda m: f"{float(m.group(1)):.2f}%", response)
+    response = re.sub(r'₹\s*(\d+\.?\d*)', lambda m: f"₹{float(m.group(1)):,.2f}", response)
+    response = response.replace('Summary:', '\n📋 Summary:')
+    response = response.replace('Key Points:', '\n🎯 Key Points:')
+    response = response.replace('Action Items:', '\n✅ Action Items:')
+    response = response.replace('Note:', '\n📝 Note:')
+    return response
+
+def sample_llm_output(size_kb):
+    """Model-style text with the numbers, amounts and labels the formatter rewrites"""
+    paragraph = (
+        "**Summary:** The Nifty 50 closed at 19845 today, up 0.85% on strong FII buying of ₹ 2450.5 crore.\n"
+        "Key Points:\n"
+        "* **HDFC Bank** gained 1.2% to ₹1642.3 while volumes rose to 15234567 shares.\n"
+        "* A monthly SIP of ₹5000 at 12% for 15 years grows to roughly ₹2522880.\n"
+        "Action Items: Review allocation; keep an emergency fund of 6 months of expenses.\n"
+        "Note: Past performance of 14.5% CAGR does not guarantee future returns.\n\n"
+    )
+    return paragraph * max(1, size_kb * 1024 // len(paragraph.encode()))
+
+def time_call(func, text, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def bench_formatter(size_kb=64, repeat=20):
+    """Compare the single-pass response formatter with the legacy chained formatter"""
+    from response_formatter import finwise_formatter
+
+    text = sample_llm_output(size_kb)
+    legacy = time_call(legacy_format_text, text, repeat)
+    single = time_call(finwise_formatter.format, text, repeat)
+    streamed = time_call(lambda t: ''.join(finwise_formatter.stream(t[i:i + 64] for i in range(0, len(t), 64))),
+                         text, repeat)
+
+    print(f"📝 Formatting {len(text.encode()) / 1024:,.0f} KB of model output (best of {repeat})")
+    print(f"\n{'Formatter':<30} {'Time (ms)':>10} {'Speedup':>8}")
+    print('─' * 50)
+    for name, seconds in (('legacy chained passes', legacy), ('single pass', single),
+                          ('single pass, 64-char chunks', streamed)):
+        print(f"{name:<30} {seconds * 1000:>10.2f} {legacy / seconds:>7.1f}x")
+    return 0
+
+def legacy_value_holdings(rows, quotes):
+    """The per-holding dict loop get_portfolio_summary used before portfolio_valuation, kept for comparison"""
+    portfolios = {}
+    for user_id, name, symbol, quantity, buy_price, stored_price in rows:
+        current_price = quotes.get(symbol, {}).get('price', stored_price)
+        investment = quantity * buy_price
+        current_value = quantity * current_price
+        profit_loss = current_value - investment
+        totals = portfolios.setdefault((user_id, name), {'summary': [], 'investment': 0, 'current_value': 0})
+        totals['investment'] += investment
+        totals['current_value'] += current_value
+        totals['summary'].append({
+            "symbol": symbol,
+            "quantity": quantity,
+            "buy_price": buy_price,
+            "current_price": current_price,
+            "investment": investment,
+            "current_value": current_value,
+            "profit_loss": profit_loss,
+            "profit_loss_percent": (profit_loss / investment) * 100
+        })
+    return portfolios
+
+def bench_valuation(users=2000, holdings=25, repeat=5):
+    """Compare vectorized multi-portfolio revaluation with the legacy per-holding loop"""
+    import random
+    from portfolio_valuation import holdings_frame, value_holdings, portfolio_totals
+
+    rng = random.Random(7)
+    symbols = [f"SYM{i}" for i in range(500)]
+    quotes = {symbol: {'price': rng.uniform(50, 5000), 'previous_close': rng.uniform(50, 5000)} for symbol in symbols}
+    rows = [
+        (f"user{u}", "default", symbol, float(rng.randint(1, 500)), rng.uniform(50, 5000), 0.0)
+        for u in range(users)
+        for symbol in rng.sample(symbols, holdings)
+    ]
+
+    legacy = time_call(lambda r: legacy_value_holdings(r, quotes), rows, repeat)
+    frame = holdings_frame(rows)
+    vectorized = time_call(lambda f: portfolio_totals(value_holdings(f, quotes)), frame, repeat)
+    with_frame = time_call(lambda r: portfolio_totals(value_holdings(holdings_frame(r), quotes)), rows, repeat)
+
+    print(f"💼 Revaluing {users:,} portfolios, {len(rows):,} holdings (best of {repeat})")
+    print(f"\n{'Valuation':<34} {'Time (ms)':>10} {'Speedup':>8}")
+    print('─' * 54)
+    for name, seconds in (('legacy per-holding loop', legacy), ('vectorized', vectorized),
+                          ('vectorized, incl. building frame', with_frame)):
+        print(f"{name:<34} {seconds * 1000:>10.2f} {legacy / seconds:>7.1f}x")
+    return 0
+
+def bench_montecarlo(paths=100000, years=30, repeat=3):
+    """Time the Monte Carlo SIP projection against the deterministic calculator's answer"""
+    from monte_carlo import MonteCarloSimulator
+    from financial_advisor_bot import FinancialCalculator
+
+    simulator = MonteCarloSimulator(paths=paths, seed=42)
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = simulator.sip(5000, years, 12)
+        best = min(best, time.perf_counter() - started)
+    expected = FinancialCalculator.calculate_sip_returns(5000, years, 12)['future_value']
+
+    print(f"🎲 SIP of ₹5,000/month for {years} years: {paths:,} paths x {years * 12} months (best of {repeat})")
+    print(f"Time: {best * 1000:,.1f} ms ({paths * years * 12 / best / 1e6:,.0f}M path-months/s)")
+    print(f"Median ₹{result['percentiles'][50]:,.0f} vs deterministic ₹{expected:,.0f}; "
+          f"5th-95th ₹{result['percentiles'][5]:,.0f} - ₹{result['percentiles'][95]:,.0f}")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="FinWise performance benchmarks")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    imports = subparsers.add_parser('imports', help="import-time report (python -X importtime)")
+    imports.add_argument('--module', default='finwise_bot')
+    imports.add_argument('--top', type=int, default=15)
+    imports.add_argument('--max-ms', type=float, help="fail if the import takes longer than this")
+
+    formatter = subparsers.add_parser('formatter', help="single-pass vs legacy response formatting")
+    formatter.add_argument('--size-kb', type=int, default=64, help="size of the generated model output")
+    formatter.add_argument('--repeat', type=int, default=20)
+
+    valuation = subparsers.add_parser('valuation', help="vectorized vs per-holding portfolio revaluation")
+    valuation.add_argument('--users', type=int, default=2000)
+    valuation.add_argument('--holdings', type=int, default=25, help="holdings per portfolio")
+    valuation.add_argument('--repeat', type=int, default=5)
+
+    montecarlo = subparsers.add_parser('montecarlo', help="Monte Carlo SIP projection speed")
+    montecarlo.add_argument('--paths', type=int, default=100000)
+    montecarlo.add_argument('--years', type=int, default=30)
+    montecarlo.add_argument('--repeat', type=int, default=3)
+
+    args = parser.parse_args()
+    if args.benchmark == 'imports':
+        sys.exit(bench_imports(args.module, args.top, args.max_ms))
+    elif args.benchmark == 'formatter':
+        sys.exit(bench_formatter(args.size_kb, args.repeat))
+    elif args.benchmark == 'valuation':
+        sys.exit(bench_valuation(args.users, args.holdings, args.repeat))
+    elif args.benchmark == 'montecarlo':
+        sys.exit(bench_montecarlo(args.paths, args.years, args.repeat))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import re
+
+class Route:
+    """A command handler and the compiled pattern its arguments must match"""
+
+    def __init__(self, phrase, handler, args=None, usage=None):
+        self.phrase = phrase
+        self.handler = handler
+        self.args = re.compile(args or '')  # Case-sensitive, so "price today" isn't read as symbol TODAY
+        self.usage = usage or phrase
+
+class CommandRouter:
+    """Routes deterministic commands (price, analysis, calculators, ...) straight to their handlers
+
+    Command words are looked up in a trie, longest phrase first, and the rest of the input
+    must fully match the route's argument pattern; named groups become handler arguments.
+    Command words are case-insensitive, argument patterns are not.
+    Anything else returns None so the caller can fall back to the AI models.
+    """
+
+    def __init__(self):
+        self._root = {}
+
+    def add(self, phrase, handler, args=None, usage=None):
+        node = self._root
+        for word in phrase.lower().split():
+            node = node.setdefault(word, {})
+        node[None] = Route(phrase, handler, args, usage)
+
+    def match(self, text):
+        """Find the route for a command; returns (route, arguments) or (None, None)"""
+        words = text.strip().split()
+        node, found, used = self._root, None, 0
+        for i, word in enumerate(words):
+            node = node.get(word.lower())
+            if node is None:
+                break
+            if None in node:
+                found, used = node[None], i + 1
+        if found is None:
+            return None, None
+
+        args = found.args.fullmatch(' '.join(words[used:]))
+        if args is None:
+            return None, None
+        return found, {name: value for name, value in args.groupdict().items() if value is not None}
+
+    def route(self, text):
+        """Run the matching handler and return its response, or None if no command matches"""
+        route, args = self.match(text)
+        if route is None:
+            return None
+        return route.handler(**args)
+
+    @property
+    def commands(self):
+        """Usage strings for every registered command"""
+        usages = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            for key, child in node.items():
+                if key is None:
+                    usages.append(child.usage)
+                else:
+                    stack.append(child)
+        return sorted(usages)
@@ -1,24 +1,48 @@
 import os
+import re
 import time
 import json
-import yfinance as yf
-import pandas as pd
-import numpy as np
+import threading
 from datetime import datetime
-import google.generativeai as genai
+from collections import deque
 from dotenv import load_dotenv
-import requests
-from bs4 import BeautifulSoup
-import plotly.graph_objects as go
 from pathlib import Path
 import random
+from lazy_imports import lazy_import
 from portfolio_manager import PortfolioManager
+from monte_carlo import MonteCarloSimulator, nifty_monthly_returns
+from ohlcv_cache import OHLCVCache
+from response_formatter import advisor_formatter
+from prompt_builder import PromptBuilder
+from model_backends import GEMINI_MODEL, gemini_with_system_instruction
+
+# Heavy libraries load on the code paths that use them
+yf = lazy_import('yfinance')
+requests = lazy_import('requests')
+genai = lazy_import('google.generativeai')
 
 # Load environment variables
 load_dotenv()
 
-# Configure Google Gemini API
-genai.configure(api_key=os.getenv('GOOGLE_API_KEY'))
+# Arguments of the simulate commands: amounts may carry ₹ and Indian or Western commas, the return a %
+SIMULATION_AMOUNTS = {'sip': 2, 'lumpsum': 2, 'goal': 3}
+_AMOUNT = r"(₹?[\d,]+(?:\.\d+)?)"
+_RATE = r"(?:\s+(\d+(?:\.\d+)?)%?)?"
+
+def parse_simulation_args(kind, text):
+    """(amounts, expected_return or None) from a simulate command's arguments, or None if they don't parse
+
+    sip and lumpsum take AMOUNT YEARS [RETURN]; goal takes TARGET YEARS MONTHLY [RETURN].
+    """
+    count = SIMULATION_AMOUNTS.get(kind)
+    if count is None:
+        return None
+    match = re.fullmatch(r"\s+".join([_AMOUNT] * count) + _RATE, text.strip())
+    if match is None:
+        return None
+    amounts = [float(value.lstrip('₹').replace(',', '')) for value in match.groups()[:count]]
+    rate = match.group(count + 1)
+    return amounts, float(rate) if rate else None
 
 class MarketData:
     """Class to handle market data operations"""
@@ -138,15 +162,44 @@ class FinancialCalculator:
             'total_interest': round(total_interest, 2)
         }
 
+    @staticmethod
+    def simulate_sip_returns(monthly_investment, years, expected_return=12.0, volatility=15.0,
+                             paths=100000, seed=None, history=None):
+        """Monte Carlo percentile bands for a SIP; history (monthly log returns) replaces the assumed rate"""
+        simulator = MonteCarloSimulator(paths=paths, seed=seed, volatility=volatility, history=history)
+        return simulator.sip(monthly_investment, years, expected_return)
+
+    @staticmethod
+    def simulate_lumpsum_returns(principal, years, expected_return=12.0, volatility=15.0,
+                                 paths=100000, seed=None, history=None):
+        """Monte Carlo percentile bands for a one-time investment"""
+        simulator = MonteCarloSimulator(paths=paths, seed=seed, volatility=volatility, history=history)
+        return simulator.lumpsum(principal, years, expected_return)
+
+    @staticmethod
+    def simulate_goal(target, years, monthly_investment=0, lumpsum=0, expected_return=12.0, volatility=15.0,
+                      paths=100000, seed=None, history=None):
+        """Chance of reaching a target corpus and the SIP needed for a 90% chance"""
+        simulator = MonteCarloSimulator(paths=paths, seed=seed, volatility=volatility, history=history)
+        return simulator.goal(target, years, monthly_investment, lumpsum, expected_return)
+
 class FinancialAdvisor:
-    def __init__(self):
-        self.model = genai.GenerativeModel('gemini-pro')
-        self.conversation_history = []
+    def __init__(self, history_cache=None):
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._inline_system_prompt = True
+        self.system_prompt = self._get_system_prompt()
+        self.prompt_builder = PromptBuilder()
+        self.conversation_history = deque(maxlen=5)
+        self.conversation_summary = ''
         self.max_retries = 3
         self.retry_delay = 1
         self.market_data = MarketData()
         self.calculator = FinancialCalculator()
-        self.portfolio_manager = PortfolioManager()
+        # Share the market analyzer's cache when given, so histories are held in memory once
+        self.history_cache = history_cache or OHLCVCache(Path("market_analysis") / "cache")
+        self.portfolio_manager = PortfolioManager(history_cache=self.history_cache)
+        self._nifty_returns = None
         
         # Create necessary directories
         self.advice_dir = Path("saved_advice")
@@ -166,21 +219,65 @@ class FinancialAdvisor:
             "Risk management is like carrying an umbrella - better safe than sorry! ☔"
         ]
 
+    @property
+    def model(self):
+        """Gemini model, configured on first use so startup doesn't import the SDK"""
+        with self._model_lock:
+            if self._model is None:
+                genai.configure(api_key=os.getenv('GOOGLE_API_KEY'))
+                # Keep the long system prompt server-side when the SDK supports it
+                self._model = gemini_with_system_instruction(self.system_prompt)
+                self._inline_system_prompt = self._model is None
+                if self._model is None:
+                    self._model = genai.GenerativeModel(GEMINI_MODEL)
+            return self._model
+
+    def _get_system_prompt(self):
+        """System message with Indian context"""
+        return """You are FinWise (फाइनवाइज़), a friendly AI-powered financial guide (not an advisor) with knowledge about:
+1. Indian Stock Markets (NSE/BSE)
+2. Mutual Funds and SIP investments
+3. Tax-saving instruments (ELSS, PPF, NPS)
+4. Portfolio diversification
+5. Risk management
+6. Indian tax laws and regulations
+7. Retirement planning
+8. Insurance planning
+
+Your personality:
+- Friendly and approachable, like a knowledgeable friend
+- Use simple language and relatable Indian examples
+- Add occasional humor but maintain professionalism
+- Use relevant analogies from daily Indian life
+- Be encouraging but realistic
+
+Important guidelines:
+- Always clarify that you're an AI guide providing general information
+- Encourage users to verify information with registered financial advisors
+- Focus on educational content and basic concepts
+- Use examples from Indian context
+- Explain complex terms in simple language
+- Include relevant disclaimers
+
+Always structure your response with:
+1. A brief introduction/summary
+2. Detailed explanation with examples from Indian context
+3. Educational points and concepts
+4. Things to consider
+5. Next steps to learn more
+6. A clear disclaimer
+
+Make it engaging and conversational while maintaining accuracy and professionalism.
+
+Remember to start each response with: 'As an AI-powered financial guide, here's what I can share about...'"""
+
     def get_random_quote(self):
         """Get a random money quote"""
         return random.choice(self.money_quotes)
 
     def format_response(self, text):
         """Format the response for better readability"""
-        text = text.replace("Disclaimer:", "⚠️ Disclaimer:")
-        text = text.replace("Note:", "📝 Note:")
-        text = text.replace("Warning:", "⚠️ Warning:")
-        text = text.replace("Tip:", "💡 Tip:")
-        text = text.replace("Action Items:", "✅ Action Items:")
-        text = text.replace("Risk Level:", "🎯 Risk Level:")
-        text = text.replace("Tax Implications:", "💰 Tax Implications:")
-        text = text.replace("Pro Tip:", "🎯 Pro Tip:")
-        return text
+        return advisor_formatter.format(text)
 
     def save_advice(self, question, advice):
         """Save important financial advice to a file"""
@@ -224,8 +321,9 @@ class FinancialAdvisor:
                 response += f"""
 {stock['symbol']}:
 Quantity: {stock['quantity']}
-Current Value: ₹{stock['current_value']:,.2f}
+Current Value: ₹{stock['current_value']:,.2f} ({stock['weight']:.1f}% of portfolio)
 Profit/Loss: ₹{stock['profit_loss']:,.2f} ({stock['profit_loss_percent']:.2f}%)
+Today: ₹{stock['day_change']:,.2f} ({stock['day_change_percent']:.2f}%)
 ------------------------"""
             
             response += f"""
@@ -233,24 +331,34 @@ Profit/Loss: ₹{stock['profit_loss']:,.2f} ({stock['profit_loss_percent']:.2f}%
 Total Investment: ₹{summary['total_investment']:,.2f}
 Current Value: ₹{summary['current_value']:,.2f}
 Total Profit/Loss: ₹{summary['total_profit_loss']:,.2f} ({summary['total_profit_loss_percent']:.2f}%)
+Today's Change: ₹{summary['day_change']:,.2f} ({summary['day_change_percent']:.2f}%)
 """
             
-            # Generate and add chart
-            chart_path = self.portfolio_manager.generate_portfolio_chart(user_id)
+            # Chart and metrics reuse the summary instead of pricing the portfolio again
+            chart_path = self.portfolio_manager.generate_portfolio_chart(user_id, summary=summary)
             if not isinstance(chart_path, str) or "error" in chart_path.lower():
                 response += "\n❌ Could not generate portfolio chart."
             else:
                 response += f"\n📊 Portfolio allocation chart saved to: {chart_path}"
             
             # Add portfolio metrics
-            metrics = self.portfolio_manager.get_portfolio_metrics(user_id)
+            metrics = self.portfolio_manager.get_portfolio_metrics(user_id, summary=summary)
             if not isinstance(metrics, str):
                 response += f"""
 \n📊 Portfolio Metrics:
-Diversification Score: {metrics['diversification_score']}
+Diversification Score: {metrics['diversification_score']}/10
 Risk Level: {metrics['risk_level']}
-Suggested Actions: {', '.join(metrics['suggested_actions'])}
 """
+                if 'volatility' in metrics:
+                    response += f"""Annual Volatility: {metrics['volatility']:.2f}%
+Beta (vs Nifty 50): {metrics['beta']:.2f}
+Alpha: {metrics['alpha']:.2f}%
+Sharpe Ratio: {metrics['sharpe_ratio']:.2f}
+Sortino Ratio: {metrics['sortino_ratio']:.2f}
+Max Drawdown: {metrics['max_drawdown']:.2f}%
+1-Day VaR (95%): {metrics['var_historical']:.2f}% (₹{metrics['var_amount']:,.2f}); parametric {metrics['var_parametric']:.2f}%
+"""
+                response += f"Suggested Actions: {', '.join(metrics['suggested_actions'])}\n"
             
             return response
 
@@ -287,12 +395,37 @@ Dividend Yield: {stock_info['dividend_yield']}%
             try:
                 numbers = [float(s) for s in query.split() if s.replace('.','').isdigit()]
                 if len(numbers) >= 3:
-                    result = self.calculator.calculate_sip_returns(numbers[0], numbers[1], numbers[2])
-                    return f"""
+                    return self.format_sip_result(numbers[0], numbers[1], numbers[2])
+            except Exception as e:
+                return f"Error in SIP calculation: {str(e)}"
+        
+        # Monte Carlo projections: simulate sip|lumpsum AMOUNT YEARS [RETURN], simulate goal TARGET YEARS MONTHLY [RETURN]
+        if query_lower.startswith("simulate"):
+            words = query.split(None, 2)
+            if len(words) == 3:
+                response = self.run_simulation(words[1].lower(), words[2])
+                if response is not None:
+                    return response
+        
+        # EMI Calculator
+        if "calculate emi" in query_lower:
+            try:
+                numbers = [float(s) for s in query.split() if s.replace('.','').isdigit()]
+                if len(numbers) >= 3:
+                    return self.format_emi_result(numbers[0], numbers[1], numbers[2])
+            except Exception as e:
+                return f"Error in EMI calculation: {str(e)}"
+        
+        return None
+
+    def format_sip_result(self, monthly_investment, years, expected_return):
+        """Run the SIP calculator and format the result"""
+        result = self.calculator.calculate_sip_returns(monthly_investment, years, expected_return)
+        return f"""
 💰 SIP Calculator Results:
-Monthly Investment: ₹{numbers[0]:,.2f}
-Time Period: {numbers[1]} years
-Expected Return: {numbers[2]}%
+Monthly Investment: ₹{monthly_investment:,.2f}
+Time Period: {years} years
+Expected Return: {expected_return}%
 
 Future Value: ₹{result['future_value']:,.2f}
 Total Investment: ₹{result['total_investment']:,.2f}
@@ -301,20 +434,15 @@ XIRR: {result['xirr']}%
 
 {self.get_random_quote()}
 """
-            except Exception as e:
-                return f"Error in SIP calculation: {str(e)}"
-        
-        # EMI Calculator
-        if "calculate emi" in query_lower:
-            try:
-                numbers = [float(s) for s in query.split() if s.replace('.','').isdigit()]
-                if len(numbers) >= 3:
-                    result = self.calculator.calculate_emi(numbers[0], numbers[1], numbers[2])
-                    return f"""
+
+    def format_emi_result(self, principal, rate, years):
+        """Run the EMI calculator and format the result"""
+        result = self.calculator.calculate_emi(principal, rate, years)
+        return f"""
 💳 EMI Calculator Results:
-Loan Amount: ₹{numbers[0]:,.2f}
-Interest Rate: {numbers[1]}%
-Loan Term: {numbers[2]} years
+Loan Amount: ₹{principal:,.2f}
+Interest Rate: {rate}%
+Loan Term: {years} years
 
 Monthly EMI: ₹{result['emi']:,.2f}
 Total Payment: ₹{result['total_payment']:,.2f}
@@ -322,69 +450,130 @@ Total Interest: ₹{result['total_interest']:,.2f}
 
 {self.get_random_quote()}
 """
+
+    def format_lumpsum_result(self, principal, years, expected_return):
+        """Run the lumpsum calculator and format the result"""
+        result = self.calculator.calculate_lumpsum_returns(principal, years, expected_return)
+        return f"""
+📈 Lumpsum Calculator Results:
+Investment: ₹{principal:,.2f}
+Time Period: {years} years
+Expected Return: {expected_return}%
+
+Future Value: ₹{result['future_value']:,.2f}
+Expected Returns: ₹{result['returns']:,.2f}
+
+{self.get_random_quote()}
+"""
+
+    def nifty_returns(self):
+        """Monthly Nifty 50 log returns to bootstrap simulations from, or None if unavailable"""
+        if self._nifty_returns is None:
+            try:
+                self._nifty_returns = nifty_monthly_returns(self.history_cache)
             except Exception as e:
-                return f"Error in EMI calculation: {str(e)}"
-        
-        return None
+                print(f"Nifty history error: {str(e)}")
+        return self._nifty_returns
+
+    def _simulation_inputs(self, expected_return):
+        """Assumed rate, or Nifty history to resample when no rate is given"""
+        if expected_return is not None:
+            return {'expected_return': expected_return}, f"{expected_return:g}% expected return, 15% volatility"
+        history = self.nifty_returns()
+        if history is None:
+            return {'expected_return': 12.0}, "12% expected return, 15% volatility (Nifty history unavailable)"
+        return {'history': history}, f"resampled from {len(history)} months of Nifty 50 returns"
+
+    def _format_bands(self, result):
+        labels = {5: 'Pessimistic (5th)', 25: 'Cautious (25th)', 50: 'Median (50th)',
+                  75: 'Good (75th)', 95: 'Optimistic (95th)'}
+        return '\n'.join(f"{labels[p]}: ₹{value:,.2f}" for p, value in result['percentiles'].items())
+
+    def run_simulation(self, kind, text):
+        """Run a simulate command from its arguments; None if they don't parse"""
+        parsed = parse_simulation_args(kind, text)
+        if parsed is None:
+            return None
+        amounts, expected_return = parsed
+        formatter = {
+            'sip': self.format_sip_simulation,
+            'lumpsum': self.format_lumpsum_simulation,
+            'goal': self.format_goal_simulation
+        }[kind]
+        try:
+            return formatter(*amounts, expected_return=expected_return)
+        except Exception as e:
+            return f"Error in simulation: {str(e)}"
+
+    def format_sip_simulation(self, monthly_investment, years, expected_return=None):
+        """Run the SIP Monte Carlo simulation and format the percentile bands"""
+        inputs, basis = self._simulation_inputs(expected_return)
+        result = self.calculator.simulate_sip_returns(monthly_investment, years, **inputs)
+        return f"""
+🎲 SIP Simulation ({result['paths']:,} paths, {basis}):
+Monthly Investment: ₹{monthly_investment:,.2f}
+Time Period: {years:g} years
+Total Investment: ₹{result['total_investment']:,.2f}
 
-    def get_financial_advice(self, user_query):
+{self._format_bands(result)}
+Chance of Loss: {result['probability_of_loss']}%
+
+{self.get_random_quote()}
+"""
+
+    def format_lumpsum_simulation(self, principal, years, expected_return=None):
+        """Run the lumpsum Monte Carlo simulation and format the percentile bands"""
+        inputs, basis = self._simulation_inputs(expected_return)
+        result = self.calculator.simulate_lumpsum_returns(principal, years, **inputs)
+        return f"""
+🎲 Lumpsum Simulation ({result['paths']:,} paths, {basis}):
+Investment: ₹{principal:,.2f}
+Time Period: {years:g} years
+
+{self._format_bands(result)}
+Chance of Loss: {result['probability_of_loss']}%
+
+{self.get_random_quote()}
+"""
+
+    def format_goal_simulation(self, target, years, monthly_investment, expected_return=None):
+        """Run the goal Monte Carlo simulation and format the chance of success"""
+        inputs, basis = self._simulation_inputs(expected_return)
+        result = self.calculator.simulate_goal(target, years, monthly_investment, **inputs)
+        return f"""
+🎯 Goal Simulation ({result['paths']:,} paths, {basis}):
+Target: ₹{target:,.2f} in {years:g} years
+Monthly Investment: ₹{monthly_investment:,.2f}
+
+Chance of Reaching Goal: {result['success_probability']}%
+SIP Needed for a 90% Chance: ₹{result['sip_for_90_percent']:,.2f}
+
+{self._format_bands(result)}
+
+{self.get_random_quote()}
+"""
+
+    def get_financial_advice(self, user_query, session=None):
         """Get financial advice with Indian context and real-time data"""
+        # Web users keep their own history in their session
+        history = session.history if session is not None else self.conversation_history
+        user_id = session.user_id if session is not None else "default"
+        
         # First check for special commands
-        special_response = self.process_special_commands(user_query)
+        special_response = self.process_special_commands(user_query, user_id=user_id)
         if special_response:
             return special_response
         
-        # System message with Indian context
-        context = """You are FinWise (फाइनवाइज़), a friendly AI-powered financial guide (not an advisor) with knowledge about:
-        1. Indian Stock Markets (NSE/BSE)
-        2. Mutual Funds and SIP investments
-        3. Tax-saving instruments (ELSS, PPF, NPS)
-        4. Portfolio diversification
-        5. Risk management
-        6. Indian tax laws and regulations
-        7. Retirement planning
-        8. Insurance planning
-        
-        Your personality:
-        - Friendly and approachable, like a knowledgeable friend
-        - Use simple language and relatable Indian examples
-        - Add occasional humor but maintain professionalism
-        - Use relevant analogies from daily Indian life
-        - Be encouraging but realistic
-        
-        Important guidelines:
-        - Always clarify that you're an AI guide providing general information
-        - Encourage users to verify information with registered financial advisors
-        - Focus on educational content and basic concepts
-        - Use examples from Indian context
-        - Explain complex terms in simple language
-        - Include relevant disclaimers
-        
-        Always structure your response with:
-        1. A brief introduction/summary
-        2. Detailed explanation with examples from Indian context
-        3. Educational points and concepts
-        4. Things to consider
-        5. Next steps to learn more
-        6. A clear disclaimer
-        
-        Make it engaging and conversational while maintaining accuracy and professionalism.
-        
-        Remember to start each response with: 'As an AI-powered financial guide, here's what I can share about...'"""
-
-        # Add conversation history for context
-        history_context = ""
-        if self.conversation_history:
-            last_exchanges = self.conversation_history[-2:]
-            history_context = "\n\nPrevious conversation:\n" + "\n".join(
-                [f"Q: {q}\nA: {a}" for q, a in last_exchanges]
-            )
+        # Recent turns, cleaned and summarized to fit the prompt budget
+        summary = session.summary if session is not None else self.conversation_summary
+        prompt = self.prompt_builder.build(user_query, history, summary)
 
         retries = 0
         while retries < self.max_retries:
             try:
-                full_prompt = f"{context}{history_context}\n\nUser Question: {user_query}"
-                response = self.model.generate_content(full_prompt)
+                model = self.model
+                full_prompt = f"{self.system_prompt}\n\n{prompt}" if self._inline_system_prompt else prompt
+                response = model.generate_content(full_prompt)
                 
                 if not response or not response.text:
                     raise Exception("Empty response from AI model")
@@ -395,9 +584,11 @@ Total Interest: ₹{result['total_interest']:,.2f}
                 if "disclaimer" not in formatted_response.lower():
                     formatted_response += "\n\n⚠️ Disclaimer: This is general information for educational purposes only. Please consult with SEBI registered financial advisors for personalized investment advice."
                 
-                self.conversation_history.append((user_query, formatted_response))
-                if len(self.conversation_history) > 5:
-                    self.conversation_history.pop(0)
+                summary = self.prompt_builder.remember(history, summary, user_query, formatted_response)
+                if session is not None:
+                    session.summary = summary
+                else:
+                    self.conversation_summary = summary
                 
                 # Add a random money quote at the end
                 formatted_response += f"\n\n{self.get_random_quote()}"
@@ -433,6 +624,7 @@ def main():
     print("2. 💰 SIP Calculator (e.g., 'Calculate SIP for 5000 monthly for 10 years at 12% return')")
     print("3. 💳 EMI Calculator (e.g., 'Calculate EMI for 1000000 loan at 8.5% for 20 years')")
     print("4. 📊 Market Mood (e.g., 'How is the market today?')")
+    print("   🎲 Simulations (e.g., 'simulate sip 5000 15 12' or 'simulate goal 10000000 20 15000')")
     print("5. 📱 Mutual Fund Analysis")
     print("\n📊 Portfolio Management:")
     print("- 'create portfolio' - Create a new portfolio")
@@ -1,25 +1,75 @@
 import os
+import re
+import time
 from datetime import datetime
-import google.generativeai as genai
 from dotenv import load_dotenv
 from market_analyzer import MarketAnalyzer
 from financial_advisor_bot import FinancialAdvisor
-import json
-import pandas as pd
-import torch
+from market_context import MarketContextService
+from session_store import SessionState
+from command_router import CommandRouter
+from model_backends import BackendScheduler, create_default_backends, gemini_with_system_instruction, warm_up
+from prompt_builder import PromptBuilder
+from response_cache import ResponseCache
+from response_formatter import finwise_formatter
 
 class FinWiseBot:
-    def __init__(self):
+    # Modes whose answers never depend on earlier turns, e.g. explaining a concept
+    CONTEXT_FREE_MODES = ('learning',)
+    # Words that only make sense after an earlier turn ("why is that?", "what about HDFC?")
+    _FOLLOW_UP = re.compile(
+        r"\b(it|its|that|this|these|those|they|them|their|above|previous|earlier|again|more|else|same|also|instead|why)\b"
+        r"|^\s*(and|but|so|what about|how about)\b",
+        re.IGNORECASE
+    )
+
+    def __init__(self, warmup=None):
+        started = time.perf_counter()
+        self.startup_timings = {}
         load_dotenv()
+        
         self.market_analyzer = MarketAnalyzer()
-        self.financial_advisor = FinancialAdvisor()
+        # Nifty mood and breadth for prompts, refreshed in the background once first needed
+        self.market_context = MarketContextService(self.market_analyzer)
+        self.startup_timings['market_analyzer'] = time.perf_counter() - started
+        
+        step = time.perf_counter()
+        self.financial_advisor = FinancialAdvisor(history_cache=self.market_analyzer.history_cache)
+        self.startup_timings['financial_advisor'] = time.perf_counter() - step
         
-        # Initialize AI models with better error handling
+        # AI models are registered here but only loaded when first used
+        step = time.perf_counter()
         self.models = self._initialize_models()
+        self.scheduler = BackendScheduler(
+            self.models,
+            hedge_percentile=float(os.getenv('FINWISE_HEDGE_PERCENTILE', '0.9')),
+            deadline=float(os.getenv('FINWISE_MODEL_DEADLINE', '45'))
+        )
+        self._system_models = {}  # mode -> Gemini model carrying that mode's system prompt
+        self.prompt_builder = PromptBuilder(budget=int(os.getenv('FINWISE_PROMPT_BUDGET', '1200')))
+        self.startup_timings['model_registry'] = time.perf_counter() - step
+        
+        # Optionally load backends in the background, e.g. FINWISE_WARMUP=gemini,palm or 'all'
+        warmup = warmup if warmup is not None else os.getenv('FINWISE_WARMUP', '')
+        if warmup:
+            names = None if warmup == 'all' else [name.strip() for name in warmup.split(',')]
+            self._warmup_thread = warm_up(self.models, names)
+        
+        # Repeat questions are answered from cache instead of calling a model again;
+        # set FINWISE_RESPONSE_CACHE_DB to keep answers across restarts
+        self.response_cache = ResponseCache(
+            max_entries=int(os.getenv('FINWISE_RESPONSE_CACHE_SIZE', '512')),
+            ttl=int(os.getenv('FINWISE_RESPONSE_CACHE_TTL', '3600')),
+            mode_ttl={'learning': 7 * 24 * 3600},  # Concepts don't go stale like market commentary
+            db_path=os.getenv('FINWISE_RESPONSE_CACHE_DB') or None
+        )
+        
+        # State for the CLI user; web users each get their own SessionState
+        self.default_session = SessionState('cli', max_history=5)
         
         # Enhanced conversation context
         self.conversation_context = {
-            'history': [],
+            'history': self.default_session.history,
             'max_history': 5,
             'system_prompts': {
                 'advisor': self._get_advisor_prompt(),
@@ -27,11 +77,7 @@ class FinWiseBot:
                 'portfolio': self._get_portfolio_prompt(),
                 'learning': self._get_learning_prompt()
             },
-            'user_preferences': {
-                'language': 'en',
-                'detail_level': 'detailed',
-                'risk_profile': 'moderate'
-            }
+            'user_preferences': self.default_session.preferences
         }
         
         # Initialize modes and commands
@@ -54,91 +100,99 @@ class FinWiseBot:
             'preferences': 'Set user preferences'
         }
         
-        self.current_mode = 'advisor'
+        # Deterministic commands are answered directly instead of going through an AI model
+        self.router = self._build_router()
+        
+        self.startup_timings['total'] = time.perf_counter() - started
+    
+    @property
+    def current_mode(self):
+        return self.default_session.mode
+    
+    @current_mode.setter
+    def current_mode(self, mode):
+        self.default_session.mode = mode
     
     def _initialize_models(self):
-        """Initialize all AI models with better error handling"""
-        models = {}
+        """Register AI model backends; each is imported and loaded lazily on first use"""
+        return create_default_backends()
+
+    def _build_router(self):
+        """Command grammar for the fast path; arguments are matched by the patterns below"""
+        symbol = r"(?P<symbol>[A-Z][A-Z0-9&-]{0,19})(?:\.NS)?"
+        number = r"₹?[\d,]+(?:\.\d+)?"
+        router = CommandRouter()
         
-        # Initialize Gemini
-        try:
-            genai.configure(api_key=os.getenv('GOOGLE_API_KEY'))
-            models['gemini'] = {
-                'model': genai.GenerativeModel('gemini-pro'),
-                'status': 'active',
-                'priority': 1
-            }
-        except Exception as e:
-            print(f"Gemini initialization error: {str(e)}")
-            models['gemini'] = {'status': 'error', 'error': str(e)}
-
-        # Initialize PaLM
-        try:
-            import google.generativeai as palm
-            palm.configure(api_key=os.getenv('GOOGLE_API_KEY'))
-            models['palm'] = {
-                'model': palm,
-                'status': 'active',
-                'priority': 2
-            }
-        except Exception as e:
-            print(f"PaLM initialization error: {str(e)}")
-            models['palm'] = {'status': 'error', 'error': str(e)}
-
-        # Initialize HuggingFace
-        try:
-            from transformers import pipeline
-            models['huggingface'] = {
-                'model': pipeline('text-generation', 
-                                model='facebook/opt-350m',
-                                device='cuda' if torch.cuda.is_available() else 'cpu'),
-                'status': 'active',
-                'priority': 3
-            }
-        except Exception as e:
-            print(f"HuggingFace initialization error: {str(e)}")
-            models['huggingface'] = {'status': 'error', 'error': str(e)}
-
-        return models
-
-    def _enhance_prompt(self, base_prompt, mode, query):
-        """Enhance the prompt with context and specifics"""
-        # Add market context
-        market_mood = self.market_analyzer.get_market_mood()
+        router.add('price', lambda symbol: self.format_price_data(
+            symbol.upper(), self.market_analyzer.verify_price(symbol.upper())),
+            args=symbol, usage='price SYMBOL')
+        router.add('analysis', lambda symbol: self.format_technical_analysis(
+            symbol.upper(), self.market_analyzer.get_technical_analysis(symbol.upper())),
+            args=symbol, usage='analysis SYMBOL')
+        router.add('sentiment', lambda symbol: self.format_sentiment_analysis(
+            symbol.upper(), self.market_analyzer.get_market_sentiment(symbol.upper())),
+            args=symbol, usage='sentiment SYMBOL')
         
-        # Add user preferences
-        prefs = self.conversation_context['user_preferences']
+        for direction in ('gainers', 'losers'):
+            router.add(f'top {direction}', lambda count=5, direction=direction: self.format_top_movers(
+                self.market_analyzer.get_top_movers(direction, min(int(count), 50))),
+                args=r"(?P<count>\d{1,2})?", usage=f'top {direction} [COUNT]')
         
-        # Add recent conversation context
-        recent_context = "\n".join([
-            f"User: {q}\nAssistant: {a}" 
-            for q, a in self.conversation_context['history'][-2:]
-        ])
+        # Unknown topics return None, so questions like "learn what is a sip" go to the models
+        router.add('learn', lambda topic: self.get_learning_content(topic.lower().replace(' ', '_'), default=None),
+                   args=r"(?P<topic>[A-Za-z_ ]+)", usage='learn TOPIC')
         
-        enhanced_prompt = f"""
-{base_prompt}
-
-Current Market Context:
-{market_mood}
-
-User Preferences:
-- Detail Level: {prefs['detail_level']}
-- Risk Profile: {prefs['risk_profile']}
+        calculators = {
+            'sip': (self.financial_advisor.format_sip_result, 'AMOUNT YEARS RETURN'),
+            'emi': (self.financial_advisor.format_emi_result, 'AMOUNT RATE YEARS'),
+            'lumpsum': (self.financial_advisor.format_lumpsum_result, 'AMOUNT YEARS RETURN')
+        }
+        for name, (formatter, usage) in calculators.items():
+            router.add(f'calculate {name}', lambda a, b, c, formatter=formatter: formatter(
+                *(float(value.lstrip('₹').replace(',', '')) for value in (a, b, c))),
+                args=rf"(?P<a>{number})\s+(?P<b>{number})%?\s+(?P<c>{number})%?",
+                usage=f'calculate {name} {usage}')
+        
+        # Monte Carlo projections; without a RETURN they resample historical Nifty 50 returns.
+        # Arguments are parsed by the advisor, so this and its own command handling always agree
+        simulations = {
+            'sip': 'AMOUNT YEARS [RETURN]',
+            'lumpsum': 'AMOUNT YEARS [RETURN]',
+            'goal': 'TARGET YEARS MONTHLY [RETURN]'
+        }
+        for name, usage in simulations.items():
+            router.add(f'simulate {name}', lambda args, name=name: self.financial_advisor.run_simulation(name, args),
+                       args=r"(?P<args>.+)", usage=f'simulate {name} {usage}')
+        
+        return router
 
-Recent Conversation:
-{recent_context}
+    def get_startup_report(self):
+        """Time spent starting the bot and loading each model backend so far"""
+        return {
+            'init_seconds': dict(self.startup_timings),
+            'backends': {name: backend.report() for name, backend in self.models.items()}
+        }
 
-Current Query: {query}
+    def get_backend_health(self):
+        """Circuit breaker state, error rate and latency for each model backend"""
+        backends = {name: backend.report() for name, backend in self.models.items()}
+        available = [name for name, info in backends.items() if info['available']]
+        return {
+            'status': 'ok' if len(available) == len(backends) else 'degraded' if available else 'down',
+            'order': [backend.name for backend in self.scheduler.ordered()],
+            'backends': backends
+        }
 
-Remember to:
-1. Be precise and data-driven
-2. Use simple language but maintain professionalism
-3. Include relevant market context
-4. Consider user preferences
-5. Provide actionable insights
-6. Include appropriate disclaimers
-"""
-        return enhanced_prompt
+    def show_startup_report(self):
+        report = self.get_startup_report()
+        output = "⏱️ Startup Report\n"
+        for step, seconds in report['init_seconds'].items():
+            output += f"\n{step:<20}: {seconds * 1000:8.1f} ms"
+        output += "\n\nModel Backends:"
+        for name, info in report['backends'].items():
+            load_time = f"{info['load_time'] * 1000:8.1f} ms" if info['load_time'] is not None else "not loaded"
+            output += f"\n{name:<20}: {info['status']:<10} {load_time}"
+        return output
 
     def _get_advisor_prompt(self):
         return """You are FinWise (फाइनवाइज़), a professional AI-powered financial guide specializing in Indian markets.
@@ -238,13 +292,14 @@ Guidelines:
 4. Include practice exercises
 5. Suggest next steps"""
 
-    def _get_enhanced_response(self, query, mode='advisor'):
-        """Get enhanced response using multiple AI models with better handling"""
-        try:
-            # Get and enhance the system prompt
-            base_prompt = self.conversation_context['system_prompts'][mode]
-            enhanced_prompt = f"""
-{base_prompt}
+    def _build_response_prompt(self, query, mode, session=None):
+        """Split the request into the mode's static system prompt and the per-query prompt
+
+        The per-query prompt carries market context, the session's recent turns and the
+        summary of older ones, kept within the prompt builder's token budget.
+        """
+        base_prompt = self.conversation_context['system_prompts'][mode]
+        system_prompt = f"""{base_prompt}
 
 Guidelines for Response Format:
 1. Use clear, professional language
@@ -253,52 +308,66 @@ Guidelines for Response Format:
 4. Include relevant market data when available
 5. Always end with a clear disclaimer
 
-Current Mode: {mode}
-User Query: {query}
-
 Please provide a professional response following this structure:
 1. Brief introduction/summary
 2. Detailed explanation with data points
 3. Key takeaways or action items
-4. Professional disclaimer
-"""
+4. Professional disclaimer"""
+        # Market context is a snapshot refreshed in the background, never a fetch on the query path
+        context = f"""Current Market Context:
+{self.market_context.describe()}
+
+Current Mode: {mode}"""
+        history, summary = (session.history, session.summary) if self._uses_context(query, mode, session) else ((), '')
+        return system_prompt, self.prompt_builder.build(query, history, summary, context=context)
+
+    def _uses_context(self, query, mode, session):
+        """Whether the answer needs the session's earlier turns
+
+        Learning-mode questions and questions that stand on their own are answered without
+        them, so the same question gets the same answer for anyone and can be cached.
+        """
+        if session is None or not (session.history or session.summary):
+            return False
+        return mode not in self.CONTEXT_FREE_MODES and bool(self._FOLLOW_UP.search(query))
+
+    def _is_cacheable(self, query, mode, session):
+        """Only answers built without conversation context are cached, so no one's history leaks to another user"""
+        return not self._uses_context(query, mode, session)
+
+    def _get_system_model(self, mode, system_prompt):
+        """Gemini model with the mode's system prompt set server-side, or None if the SDK can't do that"""
+        if mode not in self._system_models:
+            self._system_models[mode] = gemini_with_system_instruction(system_prompt)
+        return self._system_models[mode]
+
+    def _gemini_request(self, model, mode, system_prompt, prompt):
+        """Model and contents to send to Gemini, with the system prompt inline only when it must be"""
+        system_model = self._get_system_model(mode, system_prompt)
+        if system_model is not None:
+            return system_model, prompt
+        return model, f"{system_prompt}\n\n{prompt}"
+
+    def _get_enhanced_response(self, query, mode='advisor', skip=(), session=None):
+        """Get enhanced response using multiple AI models with better handling"""
+        try:
+            cacheable = self._is_cacheable(query, mode, session)
+            cached = self.response_cache.get(mode, query) if cacheable else None
+            if cached is not None:
+                return cached
             
-            # Try models in order of priority
-            for model_name, model_info in sorted(
-                self.models.items(), 
-                key=lambda x: x[1].get('priority', 999) if x[1].get('status') == 'active' else 999
-            ):
-                if model_info.get('status') != 'active':
-                    continue
-                    
-                try:
-                    response = None
-                    if model_name == 'gemini':
-                        response = model_info['model'].generate_content(enhanced_prompt)
-                        if response and response.text:
-                            return self._format_response(response.text, mode)
-                    
-                    elif model_name == 'palm':
-                        response = model_info['model'].generate_text(
-                            prompt=enhanced_prompt,
-                            temperature=0.7,
-                            max_output_tokens=1024
-                        )
-                        if response and response.result:
-                            return self._format_response(response.result, mode)
-                    
-                    elif model_name == 'huggingface':
-                        response = model_info['model'](
-                            enhanced_prompt,
-                            max_length=500,
-                            num_return_sequences=1
-                        )
-                        if response:
-                            return self._format_response(response[0]['generated_text'], mode)
-                
-                except Exception as e:
-                    print(f"{model_name} error: {str(e)}")
-                    continue
+            system_prompt, prompt = self._build_response_prompt(query, mode, session)
+            
+            # Race the backends: fastest first, hedging to the next if it is slower than usual
+            model_name, text = self.scheduler.run(
+                lambda name, model: self._generate_text(name, model, mode, system_prompt, prompt), skip=skip
+            )
+            if text:
+                formatted = self._format_response(text, mode)
+                # Only real model answers are cached, never fallbacks or errors
+                if cacheable:
+                    self.response_cache.put(mode, query, formatted)
+                return formatted
 
             # If all models fail, use a fallback response
             return self._get_fallback_response(query, mode)
@@ -323,43 +392,122 @@ Technical Details:
 Note: For immediate market information, please visit the NSE website or use your trading platform.
 """
 
+    def _generate_text(self, model_name, model, mode, system_prompt, prompt):
+        """Ask one backend for a completion; returns the text or None"""
+        if model_name == 'gemini':
+            model, contents = self._gemini_request(model, mode, system_prompt, prompt)
+            response = model.generate_content(contents)
+            if response and response.text:
+                return response.text
+        
+        elif model_name == 'palm':
+            response = model.generate_text(
+                prompt=f"{system_prompt}\n\n{prompt}",
+                temperature=0.7,
+                max_output_tokens=1024
+            )
+            if response and response.result:
+                return response.result
+        
+        elif model_name == 'huggingface':
+            response = model(
+                f"{system_prompt}\n\n{prompt}",
+                max_length=500,
+                num_return_sequences=1
+            )
+            if response:
+                return response[0]['generated_text']
+        
+        return None
+
+    def _stream_enhanced_response(self, query, mode='advisor', session=None):
+        """Like _get_enhanced_response, but yields formatted text as Gemini generates it"""
+        cacheable = self._is_cacheable(query, mode, session)
+        cached = self.response_cache.get(mode, query) if cacheable else None
+        if cached is not None:
+            yield cached
+            return
+        
+        # Only Gemini can stream; if the scheduler currently prefers another backend, answer in one piece
+        ordered = self.scheduler.ordered()
+        backend = ordered[0] if ordered else None
+        model = backend.get() if backend is not None and backend.name == 'gemini' else None
+        if model is None or not backend.allow_request():
+            yield self._get_enhanced_response(query, mode, session=session)
+            return
+        
+        def texts():
+            header = f"{self._get_mode_header(mode)}\n\n"
+            for chunk in model.generate_content(contents, stream=True):
+                text = getattr(chunk, 'text', '')
+                if text:
+                    # The header goes out with the first chunk; it ends in a newline so it is sent at once
+                    yield header + text if header else text
+                    header = ''
+        
+        parts = []
+        started = time.perf_counter()
+        # Every way out of this block records an outcome or releases the breaker probe claimed above
+        try:
+            model, contents = self._gemini_request(model, mode, *self._build_response_prompt(query, mode, session))
+            # Formatted line by line, so a number or label split across chunks is never half-formatted
+            for formatted in finwise_formatter.stream(texts()):
+                parts.append(formatted)
+                yield formatted
+        except GeneratorExit:
+            # The client disconnected or timed out mid-stream. Chunks already received show Gemini
+            # was answering; with none the call was just abandoned and says nothing about Gemini
+            if parts:
+                backend.record(True, time.perf_counter() - started)
+            else:
+                backend.release()
+            raise
+        except Exception as e:
+            print(f"gemini streaming error: {str(e)}")
+            backend.record(False, time.perf_counter() - started)
+            if not parts:
+                # Nothing sent yet, so the other backends can still answer in full
+                yield self._get_enhanced_response(query, mode, skip=('gemini',), session=session)
+                return
+            yield "\n\n⚠️ The response was interrupted. Please try again."
+            return
+        except BaseException:
+            # Anything else (KeyboardInterrupt, ...) leaves the call without an outcome
+            backend.release()
+            raise
+        
+        backend.record(bool(parts), time.perf_counter() - started)
+        if not parts:
+            yield self._get_enhanced_response(query, mode, skip=('gemini',), session=session)
+            return
+        
+        streamed = ''.join(parts)
+        response = self._add_disclaimer(streamed)
+        # Cached before the last yield, so a client leaving now doesn't lose the complete answer
+        if cacheable:
+            self.response_cache.put(mode, query, response)
+        if len(response) > len(streamed):
+            yield response[len(streamed):]
+
     def _format_response(self, response, mode):
         """Enhanced response formatting with professional styling"""
-        # Clean up any random asterisks or unnecessary formatting
-        response = response.replace('**', '')
-        response = response.replace(':**', ':')
-        response = response.replace(':**', ':')
-        
-        # Add mode-specific prefixes
+        response = f"{self._get_mode_header(mode)}\n\n{self._format_text(response)}"
+        return self._add_disclaimer(response)
+
+    def _get_mode_header(self, mode):
         mode_headers = {
             'advisor': '💼 Financial Advisory',
             'analysis': '📊 Market Analysis',
             'portfolio': '📈 Portfolio Management',
             'learning': '📚 Investment Education'
         }
-        
-        response = f"{mode_headers.get(mode, '')}\n\n{response}"
-        
-        # Format numbers and percentages
-        import re
-        # Format numbers with commas
-        number_pattern = r'(?<!\d)(\d{4,})(?!\d)'
-        response = re.sub(number_pattern, lambda m: "{:,}".format(int(m.group(1))), response)
-        
-        # Format percentages to 2 decimal places
-        percentage_pattern = r'(\d+\.?\d*)%'
-        response = re.sub(percentage_pattern, lambda m: f"{float(m.group(1)):.2f}%", response)
-        
-        # Format currency amounts
-        currency_pattern = r'₹\s*(\d+\.?\d*)'
-        response = re.sub(currency_pattern, lambda m: f"₹{float(m.group(1)):,.2f}", response)
-        
-        # Add section formatting
-        response = response.replace('Summary:', '\n📋 Summary:')
-        response = response.replace('Key Points:', '\n🎯 Key Points:')
-        response = response.replace('Action Items:', '\n✅ Action Items:')
-        response = response.replace('Note:', '\n📝 Note:')
-        
+        return mode_headers.get(mode, '')
+
+    def _format_text(self, response):
+        """Strip bold markers, format numbers, percentages and ₹ amounts, and mark up section labels"""
+        return finwise_formatter.format(response)
+
+    def _add_disclaimer(self, response):
         # Ensure proper disclaimer
         if 'disclaimer' not in response.lower():
             response += """
@@ -424,6 +572,10 @@ Note: For real-time market data and critical trading decisions, please use your
 3. Calculator Commands:
    - 'calculate sip AMOUNT YEARS RETURN' - SIP calculator
    - 'calculate emi AMOUNT RATE YEARS' - EMI calculator
+   - 'calculate lumpsum AMOUNT YEARS RETURN' - Lumpsum calculator
+   - 'simulate sip AMOUNT YEARS [RETURN]' - SIP outcome range (Monte Carlo)
+   - 'simulate lumpsum AMOUNT YEARS [RETURN]' - Lumpsum outcome range
+   - 'simulate goal TARGET YEARS MONTHLY [RETURN]' - Chance of reaching a goal
    
 4. Mode Commands:
    - 'mode advisor' - Switch to advisor mode
@@ -438,38 +590,74 @@ Note: For real-time market data and critical trading decisions, please use your
    
 6. Market Commands:
    - 'market mood' - Get market sentiment
-   - 'top gainers' - Show top gaining stocks
-   - 'top losers' - Show top losing stocks
+   - 'top gainers [COUNT]' - Show top gaining Nifty 50 stocks
+   - 'top losers [COUNT]' - Show top losing Nifty 50 stocks
 
 Type 'quit' to exit
 """
         return help_text
     
-    def process_command(self, user_input):
+    def process_command(self, user_input, session=None):
         """Process user commands with enhanced AI responses"""
+        session = session or self.default_session
         input_lower = user_input.lower().strip()
         
-        # First check for special commands
-        special_response = self.financial_advisor.process_special_commands(user_input)
-        if special_response:
-            return special_response
+        with session.lock:
+            # Deterministic commands never need an AI model
+            routed = self.router.route(user_input)
+            if routed is not None:
+                return routed
             
-        # Check for mode change
-        if input_lower.startswith('mode '):
-            requested_mode = input_lower.split()[1]
-            if requested_mode in self.modes:
-                self.current_mode = requested_mode
-                return f"Switched to {self.modes[requested_mode]}"
-        
-        # Get AI response based on current mode
-        response = self._get_enhanced_response(user_input, self.current_mode)
-        
-        # Update conversation history
-        self.conversation_context['history'].append((user_input, response))
-        if len(self.conversation_context['history']) > self.conversation_context['max_history']:
-            self.conversation_context['history'].pop(0)
+            # First check for special commands
+            special_response = self.financial_advisor.process_special_commands(user_input, user_id=session.user_id)
+            if special_response:
+                return special_response
+                
+            # Check for mode change
+            if input_lower.startswith('mode '):
+                requested_mode = input_lower.split()[1]
+                if requested_mode in self.modes:
+                    session.mode = requested_mode
+                    return f"Switched to {self.modes[requested_mode]}"
+            
+            # Get AI response based on current mode
+            response = self._get_enhanced_response(user_input, session.mode, session=session)
+            
+            # Update conversation history (bounded by the session's deque)
+            session.summary = self.prompt_builder.remember(session.history, session.summary, user_input, response)
+            
+            return response
+    
+    def stream_command(self, user_input, session=None):
+        """Process a command like process_command, yielding the response in pieces as it is generated"""
+        session = session or self.default_session
+        input_lower = user_input.lower().strip()
         
-        return response
+        # The session stays locked until the stream is finished or closed
+        with session.lock:
+            routed = self.router.route(user_input)
+            if routed is not None:
+                yield routed
+                return
+            
+            special_response = self.financial_advisor.process_special_commands(user_input, user_id=session.user_id)
+            if special_response:
+                yield special_response
+                return
+            
+            if input_lower.startswith('mode '):
+                requested_mode = input_lower.split()[1]
+                if requested_mode in self.modes:
+                    session.mode = requested_mode
+                    yield f"Switched to {self.modes[requested_mode]}"
+                    return
+            
+            parts = []
+            for part in self._stream_enhanced_response(user_input, session.mode, session=session):
+                parts.append(part)
+                yield part
+            
+            session.summary = self.prompt_builder.remember(session.history, session.summary, user_input, ''.join(parts))
     
     def format_price_data(self, symbol, data):
         """Format price data with enhanced styling and structure"""
@@ -550,6 +738,34 @@ Please try:
 3. Checking your internet connection
 """
 
+    def format_top_movers(self, data):
+        """Format top gainers/losers with enhanced styling"""
+        if 'error' in data:
+            return f"""
+❌ Market Movers Unavailable
+{'='*50}
+{data['error']}
+
+Please try again in a few moments.
+"""
+        
+        title = "🚀 Top Gainers" if data['direction'] == 'gainers' else "🔻 Top Losers"
+        output = f"""
+{title}: {data['index']}
+{'='*50}
+{'Symbol':<14}{'Price':>12}{'Change':>10}
+{'─'*50}"""
+        for stock in data['stocks']:
+            arrow = "↗️" if stock['change_percent'] >= 0 else "↘️"
+            price = f"₹{stock['price']:,.2f}" if isinstance(stock['price'], (int, float)) else "N/A"
+            output += f"\n{stock['symbol']:<14}{price:>12}{stock['change_percent']:>9.2f}% {arrow}"
+        
+        output += f"""
+
+Last Updated: {data['timestamp']}
+"""
+        return output
+
     def format_technical_analysis(self, symbol, data):
         """Format technical analysis with enhanced styling and structure"""
         try:
@@ -668,6 +884,14 @@ Overall Profit/Loss  : {total_pl_color} ₹{abs(data['total_profit_loss']):,.2f}
                 output += f"""
 Diversification Score: {data['metrics']['diversification_score']}/10
 Risk Level          : {data['metrics']['risk_level']}
+"""
+                if 'volatility' in data['metrics']:
+                    metrics = data['metrics']
+                    output += f"""Volatility (annual) : {metrics['volatility']:.2f}%
+Beta vs Nifty 50    : {metrics['beta']:.2f}
+Sharpe / Sortino    : {metrics['sharpe_ratio']:.2f} / {metrics['sortino_ratio']:.2f}
+Max Drawdown        : {metrics['max_drawdown']:.2f}%
+1-Day VaR (95%)     : {metrics['var_historical']:.2f}% (₹{metrics['var_amount']:,.2f})
 """
                 if data['metrics'].get('suggested_actions'):
                     output += "\n🎯 Suggested Actions:"
@@ -705,8 +929,8 @@ Please try:
 3. Contacting support if the issue persists
 """
 
-    def get_learning_content(self, topic):
-        """Get educational content based on topic"""
+    def get_learning_content(self, topic, default="Topic not found in learning database"):
+        """Get educational content based on topic, or default if there is none"""
         topics = {
             'stocks': """
 📚 Introduction to Stocks
@@ -792,7 +1016,7 @@ Volume Analysis:
 """
         }
         
-        return topics.get(topic, "Topic not found in learning database")
+        return topics.get(topic, default)
 
     def format_market_analysis(self, symbol, data):
         """Format comprehensive market analysis with enhanced styling"""
@@ -1066,6 +1290,9 @@ Please try:
 def main():
     bot = FinWiseBot()
     
+    if os.getenv('FINWISE_STARTUP_REPORT'):
+        print(bot.show_startup_report())
+    
     print("🤖 Welcome to FinWise - Your Comprehensive Financial Assistant!")
     print("\nAvailable Modes:")
     for mode, description in bot.modes.items():
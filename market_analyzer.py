@@ -1,17 +1,85 @@
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
-import yfinance as yf
-import requests
-from bs4 import BeautifulSoup
-import plotly.graph_objects as go
-from textblob import TextBlob
-import pandas_ta as ta
+from datetime import datetime
 import json
 from pathlib import Path
 import time
 import os
-from plotly.subplots import make_subplots
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FutureTimeoutError
+from lazy_imports import lazy_import
+from ohlcv_cache import OHLCVCache, download_batch
+from nse_client import NSEClient
+
+# Heavy data, charting and NLP libraries load on the code paths that use them
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+yf = lazy_import('yfinance')
+requests = lazy_import('requests')
+bs4 = lazy_import('bs4')
+go = lazy_import('plotly.graph_objects')
+plotly_subplots = lazy_import('plotly.subplots')
+textblob = lazy_import('textblob')
+ta = lazy_import('pandas_ta')
+
+# One pooled NSE client shared by every analyzer, so the cookie and connections are reused
+nse_client = NSEClient()
+
+# One bounded pool for comprehensive report sections, shared by every analyzer; sections beyond it queue
+report_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('FINWISE_REPORT_WORKERS', '8')), thread_name_prefix='report-section'
+)
+
+# Indian market hours (9:15 AM to 3:30 PM IST, Monday to Friday)
+MARKET_OPEN = (9, 15)
+MARKET_CLOSE = (15, 30)
+
+def is_market_open(now=None):
+    """Whether NSE is in its regular trading session"""
+    now = now or datetime.now()
+    market_open = now.replace(hour=MARKET_OPEN[0], minute=MARKET_OPEN[1], second=0, microsecond=0)
+    market_close = now.replace(hour=MARKET_CLOSE[0], minute=MARKET_CLOSE[1], second=0, microsecond=0)
+    return now.weekday() < 5 and market_open <= now <= market_close
+
+class AnalysisContext:
+    """Data for one symbol shared by every analysis in a request, each piece fetched at most once"""
+    
+    def __init__(self, analyzer, symbol, period='1y'):
+        self.analyzer = analyzer
+        self.symbol = symbol
+        self.period = period
+        self._values = {}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+    
+    def _memoize(self, name, loader):
+        """Load a value once; other threads asking for it meanwhile wait for the same result"""
+        with self._locks_guard:
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            if name not in self._values:
+                self._values[name] = loader()
+            return self._values[name]
+    
+    @property
+    def ticker(self):
+        return self._memoize('ticker', lambda: yf.Ticker(f"{self.symbol}.NS"))
+    
+    @property
+    def info(self):
+        return self._memoize('info', lambda: self.ticker.info or {})
+    
+    @property
+    def history(self):
+        return self._memoize('history', lambda: self.analyzer.history_cache.get_history(
+            f"{self.symbol}.NS", period=self.period))
+    
+    @property
+    def indicators(self):
+        """History with the full indicator set appended; treat as read-only"""
+        return self._memoize('indicators', lambda: self.analyzer._compute_indicators(self.history))
+    
+    @property
+    def price_verification(self):
+        return self._memoize('price_verification', lambda: self.analyzer.verify_price(self.symbol))
 
 class MarketAnalyzer:
     def __init__(self):
@@ -19,6 +87,7 @@ class MarketAnalyzer:
         self.analysis_dir.mkdir(exist_ok=True)
         self.cache_dir = self.analysis_dir / "cache"
         self.cache_dir.mkdir(exist_ok=True)
+        self.history_cache = OHLCVCache(self.cache_dir)
         
         # Initialize technical indicators
         self.indicators = {
@@ -27,17 +96,40 @@ class MarketAnalyzer:
             'MACD': [12, 26, 9],   # MACD parameters
             'BB': [20, 2],         # Bollinger Bands parameters
         }
+        
+        # Price sources are queried concurrently; each gets its own deadline in seconds
+        self.price_sources = {
+            'yahoo': self._fetch_yahoo_quote,
+            'nse': self._fetch_nse_quote
+        }
+        self.price_source_timeouts = {'yahoo': 4, 'nse': 3}
+        # With only two sources a quorum of 2 would always wait for the slower one. A source's last
+        # quote up to price_reference_ttl old may stand in for it, so a recently checked symbol returns
+        # on the first current answer that agrees with it; a symbol nobody checked lately still waits
+        # for both (or for a source to fail or time out, which lowers the quorum to what is left)
+        self.price_quorum = 2              # Sources that must agree before returning early
+        self.price_tolerance = 0.5         # Max spread (%) for sources to count as agreeing
+        self.quote_ttl = 15                # Seconds a fetched quote can be reused
+        self.price_reference_ttl = 300     # Seconds a quote can still confirm a current one
+        self.batch_price_timeout = 15  # Seconds verify_prices waits for NSE quotes
+        self._price_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='price-source')
+        self._quote_cache = {}
+        self._quote_lock = threading.Lock()
+        
+        # Comprehensive report sections run side by side, each with its own timeout in seconds
+        self.report_section_timeouts = {
+            'technical_analysis': 30,
+            'fundamental_analysis': 30,
+            'sentiment_analysis': 15,
+            'sector_analysis': 30
+        }
+        self._report_executor = report_executor
 
     def get_nse_price(self, symbol):
         """Get price from NSE website"""
         try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            url = f"https://www.nseindia.com/api/quote-equity?symbol={symbol}"
-            response = requests.get(url, headers=headers)
-            if response.status_code == 200:
-                data = response.json()
+            data = nse_client.get_json('/api/quote-equity', params={'symbol': symbol})
+            if data:
                 return {
                     'price': data['priceInfo']['lastPrice'],
                     'change': data['priceInfo']['change'],
@@ -54,189 +146,320 @@ class MarketAnalyzer:
             url = f"https://www.moneycontrol.com/india/stockpricequote/{symbol}"
             response = requests.get(url)
             if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
+                soup = bs4.BeautifulSoup(response.text, 'html.parser')
                 price_div = soup.find('div', {'class': 'inprice1'})
                 if price_div:
                     return float(price_div.text.strip().replace(',', ''))
         except:
             return None
     
-    def verify_price(self, symbol):
-        """Verify stock price from multiple sources"""
+    def verify_price(self, symbol, quorum=None):
+        """Verify stock price from multiple sources queried concurrently"""
         try:
             # Clean up the symbol and ensure proper format for NSE
             symbol = symbol.upper().strip().replace('.NS', '').replace('&', '%26')
-            nse_symbol = f"{symbol}.NS"
-            
-            sources = {}
-            max_retries = 3
-            retry_delay = 1
-            
-            # Get Yahoo Finance price with retries
-            for attempt in range(max_retries):
-                try:
-                    yf_stock = yf.Ticker(nse_symbol)
-                    # Get today's data
-                    today_data = yf_stock.history(period='1d')
-                    if not today_data.empty:
-                        sources['yahoo'] = {
-                            'price': float(today_data['Close'].iloc[-1]),
-                            'open': float(today_data['Open'].iloc[-1]),
-                            'high': float(today_data['High'].iloc[-1]),
-                            'low': float(today_data['Low'].iloc[-1]),
-                            'volume': int(today_data['Volume'].iloc[-1]),
-                            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        }
-                        break
-                except Exception as e:
-                    if attempt == max_retries - 1:  # Last attempt
-                        print(f"Yahoo Finance error for {symbol} after {max_retries} attempts: {str(e)}")
-                    else:
-                        time.sleep(retry_delay)
-            
-            # Try alternative Yahoo Finance method if first method failed
-            if 'yahoo' not in sources:
-                try:
-                    info = yf_stock.info
-                    if info and 'regularMarketPrice' in info and info['regularMarketPrice'] is not None:
-                        sources['yahoo'] = {
-                            'price': float(info['regularMarketPrice']),
-                            'open': float(info.get('regularMarketOpen', info['regularMarketPrice'])),
-                            'high': float(info.get('regularMarketDayHigh', info['regularMarketPrice'])),
-                            'low': float(info.get('regularMarketDayLow', info['regularMarketPrice'])),
-                            'volume': int(info.get('regularMarketVolume', 0)),
-                            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        }
-                except Exception as e:
-                    print(f"Yahoo Finance info error for {symbol}: {str(e)}")
-            
-            # Try NSE direct API
-            try:
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                    'Accept-Language': 'en-US,en;q=0.5',
-                    'Connection': 'keep-alive',
-                }
-                
-                # First get the cookie
-                session = requests.Session()
-                session.get("https://www.nseindia.com", headers=headers, timeout=5)
-                
-                # Then get the stock data
-                url = f"https://www.nseindia.com/api/quote-equity?symbol={symbol}"
-                response = session.get(url, headers=headers, timeout=5)
+            quorum = quorum or self.price_quorum
+            
+            # Quotes fetched recently (including by stragglers of earlier calls) are reused
+            sources = self._get_cached_quotes(symbol)
+            references = self._get_cached_quotes(symbol, max_age=self.price_reference_ttl)
+            
+            pending = {}
+            deadlines = {}
+            started = time.monotonic()
+            for name, fetcher in self.price_sources.items():
+                if name in sources:
+                    continue
+                future = self._price_executor.submit(self._fetch_quote, name, fetcher, symbol)
+                pending[future] = name
+                deadlines[future] = started + self.price_source_timeouts.get(name, 5)
+            
+            # Collect results until enough sources agree or every source has hit its deadline
+            while pending and not self._has_price_quorum(sources, min(quorum, len(sources) + len(pending)), references):
+                now = time.monotonic()
+                for future in [f for f in pending if deadlines[f] <= now]:
+                    # Leave the straggler running; its result still lands in the quote cache
+                    print(f"{pending.pop(future)} price source timed out for {symbol}")
+                if not pending:
+                    break
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    sources['nse'] = {
-                        'price': float(data['priceInfo']['lastPrice']),
-                        'open': float(data['priceInfo']['open']),
-                        'high': float(data['priceInfo']['intraDayHighLow']['max']),
-                        'low': float(data['priceInfo']['intraDayHighLow']['min']),
-                        'volume': int(data['preOpenMarket']['totalTradedVolume']),
-                        'timestamp': data['metadata']['lastUpdateTime']
-                    }
-            except Exception as e:
-                print(f"NSE API error for {symbol}: {str(e)}")
+                done, _ = wait(list(pending), timeout=min(deadlines[f] for f in pending) - now,
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = pending.pop(future)
+                    quote = future.result()
+                    if quote:
+                        sources[name] = quote
             
             # If no data available from any source
             if not sources:
-                return {
-                    'error': f"Could not fetch data for {symbol}. Please verify the stock symbol.",
-                    'sources': {},
-                    'average_price': 'N/A',
-                    'variance': 'N/A',
-                    'reliability': 'N/A',
-                    'market_status': 'Unknown',
-                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    'price_range': {
-                        'min': 'N/A',
-                        'max': 'N/A'
-                    }
-                }
-                
-            # Calculate average price and variance
-            prices = []
-            for source_data in sources.values():
-                if isinstance(source_data, dict) and 'price' in source_data:
-                    if isinstance(source_data['price'], (int, float)) and source_data['price'] > 0:
-                        prices.append(source_data['price'])
-            
-            if prices:
-                avg_price = np.mean(prices)
-                variance = np.std(prices) if len(prices) > 1 else 0
-                price_reliability = "High" if variance < 1 else "Medium" if variance < 5 else "Low"
-                
-                # Get market status based on Indian market hours (9:15 AM to 3:30 PM IST)
-                now = datetime.now()
-                market_open = now.replace(hour=9, minute=15, second=0, microsecond=0)
-                market_close = now.replace(hour=15, minute=30, second=0, microsecond=0)
-                market_status = "Open" if market_open <= now <= market_close and now.weekday() < 5 else "Closed"
+                return self._price_error(f"Could not fetch data for {symbol}. Please verify the stock symbol.")
+            
+            return self._summarize_prices(sources)
                 
-                return {
-                    'sources': sources,
-                    'average_price': avg_price,
-                    'variance': variance,
-                    'reliability': price_reliability,
-                    'market_status': market_status,
-                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    'price_range': {
-                        'min': min(prices),
-                        'max': max(prices)
+        except Exception as e:
+            return self._price_error(f"Error verifying price: {str(e)}")
+
+    def _fetch_quote(self, name, fetcher, symbol):
+        """Run one price source and remember its quote for later calls"""
+        try:
+            quote = fetcher(symbol)
+        except Exception as e:
+            print(f"{name} price source error for {symbol}: {str(e)}")
+            return None
+        if quote:
+            with self._quote_lock:
+                self._quote_cache[(symbol, name)] = (time.monotonic(), quote)
+        return quote
+
+    def _get_cached_quotes(self, symbol, max_age=None):
+        """Get quotes for a symbol keyed by source name, no older than max_age (default quote_ttl)"""
+        max_age = self.quote_ttl if max_age is None else max_age
+        now = time.monotonic()
+        quotes = {}
+        with self._quote_lock:
+            for name in self.price_sources:
+                cached = self._quote_cache.get((symbol, name))
+                if cached and now - cached[0] <= max_age:
+                    quotes[name] = cached[1]
+        return quotes
+
+    def _has_price_quorum(self, sources, quorum, references=None):
+        """Check whether at least `quorum` sources agree within the price tolerance
+
+        references are older quotes that count for sources without a current one, but only
+        alongside at least one current quote.
+        """
+        if not sources:
+            return False
+        quotes = dict(references or {})
+        quotes.update(sources)
+        prices = sorted(
+            source['price'] for source in quotes.values()
+            if isinstance(source.get('price'), (int, float)) and source['price'] > 0
+        )
+        if len(prices) < quorum:
+            return False
+        for i in range(len(prices) - quorum + 1):
+            low, high = prices[i], prices[i + quorum - 1]
+            if (high - low) / low * 100 <= self.price_tolerance:
+                return True
+        return False
+
+    def _fetch_yahoo_quote(self, symbol):
+        """Get price from Yahoo Finance, falling back to the info endpoint"""
+        nse_symbol = f"{symbol.replace('%26', '&')}.NS"
+        max_retries = 3
+        retry_delay = 1
+        yf_stock = yf.Ticker(nse_symbol)
+        
+        for attempt in range(max_retries):
+            try:
+                # Get today's data
+                today_data = yf_stock.history(period='1d')
+                if not today_data.empty:
+                    return {
+                        'price': float(today_data['Close'].iloc[-1]),
+                        'open': float(today_data['Open'].iloc[-1]),
+                        'high': float(today_data['High'].iloc[-1]),
+                        'low': float(today_data['Low'].iloc[-1]),
+                        'volume': int(today_data['Volume'].iloc[-1]),
+                        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                     }
-                }
-            
+                break
+            except Exception as e:
+                if attempt == max_retries - 1:  # Last attempt
+                    print(f"Yahoo Finance error for {symbol} after {max_retries} attempts: {str(e)}")
+                else:
+                    time.sleep(retry_delay)
+        
+        # Try alternative Yahoo Finance method if first method failed
+        info = yf_stock.info
+        if info and 'regularMarketPrice' in info and info['regularMarketPrice'] is not None:
             return {
-                'error': 'No valid price data available',
-                'sources': sources,
-                'average_price': 'N/A',
-                'variance': 'N/A',
-                'reliability': 'N/A',
-                'market_status': 'Unknown',
-                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'price_range': {
-                    'min': 'N/A',
-                    'max': 'N/A'
-                }
+                'price': float(info['regularMarketPrice']),
+                'open': float(info.get('regularMarketOpen', info['regularMarketPrice'])),
+                'high': float(info.get('regularMarketDayHigh', info['regularMarketPrice'])),
+                'low': float(info.get('regularMarketDayLow', info['regularMarketPrice'])),
+                'volume': int(info.get('regularMarketVolume', 0)),
+                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }
-                
-        except Exception as e:
+        return None
+
+    def _fetch_nse_quote(self, symbol):
+        """Get price from the NSE quote API"""
+        data = nse_client.get_json('/api/quote-equity', params={'symbol': symbol.replace('%26', '&')})
+        if data:
             return {
-                'error': f"Error verifying price: {str(e)}",
-                'sources': {},
-                'average_price': 'N/A',
-                'variance': 'N/A',
-                'reliability': 'N/A',
-                'market_status': 'Unknown',
-                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'price_range': {
-                    'min': 'N/A',
-                    'max': 'N/A'
+                'price': float(data['priceInfo']['lastPrice']),
+                'open': float(data['priceInfo']['open']),
+                'high': float(data['priceInfo']['intraDayHighLow']['max']),
+                'low': float(data['priceInfo']['intraDayHighLow']['min']),
+                'volume': int(data['preOpenMarket']['totalTradedVolume']),
+                'timestamp': data['metadata']['lastUpdateTime']
+            }
+        return None
+
+    def verify_prices(self, symbols):
+        """Verify prices for many symbols with one Yahoo download and parallel NSE quotes"""
+        cleaned = []
+        for symbol in symbols:
+            symbol = symbol.upper().strip().replace('.NS', '').replace('&', '%26')
+            if symbol and symbol not in cleaned:
+                cleaned.append(symbol)
+        if not cleaned:
+            return {}
+        
+        sources = {symbol: self._get_cached_quotes(symbol) for symbol in cleaned}
+        
+        # NSE quotes run in the background over the shared NSE client
+        nse_futures = {}
+        for symbol in cleaned:
+            if 'nse' not in sources[symbol]:
+                future = self._price_executor.submit(self._fetch_quote, 'nse', self._fetch_nse_quote, symbol)
+                nse_futures[future] = symbol
+        
+        # Meanwhile fetch every missing Yahoo quote in a single download
+        yahoo_missing = [symbol for symbol in cleaned if 'yahoo' not in sources[symbol]]
+        for symbol, quote in self._fetch_yahoo_quotes(yahoo_missing).items():
+            sources[symbol]['yahoo'] = quote
+        
+        # NSE requests are rate limited, so allow for the ones queued behind the limit too.
+        # Stragglers are left running; their quotes still land in the quote cache
+        timeout = max(self.batch_price_timeout, nse_client.queue_time(len(nse_futures)) + self.price_source_timeouts['nse'])
+        done, _ = wait(list(nse_futures), timeout=timeout)
+        for future in done:
+            quote = future.result()
+            if quote:
+                sources[nse_futures[future]]['nse'] = quote
+        
+        # Results are keyed by the plain symbol, without the NSE URL encoding
+        results = {}
+        for symbol in cleaned:
+            key = symbol.replace('%26', '&')
+            if sources[symbol]:
+                results[key] = self._summarize_prices(sources[symbol])
+            else:
+                results[key] = self._price_error(f"Could not fetch data for {symbol}. Please verify the stock symbol.")
+        return results
+
+    def _fetch_yahoo_quotes(self, symbols):
+        """Get today's Yahoo Finance quotes for many symbols in one download"""
+        if not symbols:
+            return {}
+        tickers = {f"{symbol.replace('%26', '&')}.NS": symbol for symbol in symbols}
+        frames = download_batch(tickers, period='1d')
+        
+        quotes = {}
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        fetched_at = time.monotonic()
+        for ticker, today_data in frames.items():
+            symbol = tickers[ticker]
+            try:
+                quote = {
+                    'price': float(today_data['Close'].iloc[-1]),
+                    'open': float(today_data['Open'].iloc[-1]),
+                    'high': float(today_data['High'].iloc[-1]),
+                    'low': float(today_data['Low'].iloc[-1]),
+                    'volume': int(today_data['Volume'].iloc[-1]),
+                    'timestamp': timestamp
                 }
+            except Exception as e:
+                print(f"Yahoo Finance batch error for {symbol}: {str(e)}")
+                continue
+            quotes[symbol] = quote
+            with self._quote_lock:
+                self._quote_cache[(symbol, 'yahoo')] = (fetched_at, quote)
+        return quotes
+
+    def _summarize_prices(self, sources):
+        """Combine per-source quotes into average price, variance and reliability"""
+        prices = []
+        for source_data in sources.values():
+            if isinstance(source_data, dict) and 'price' in source_data:
+                if isinstance(source_data['price'], (int, float)) and source_data['price'] > 0:
+                    prices.append(source_data['price'])
+        
+        if not prices:
+            return self._price_error('No valid price data available', sources)
+        
+        avg_price = np.mean(prices)
+        variance = np.std(prices) if len(prices) > 1 else 0
+        price_reliability = "High" if variance < 1 else "Medium" if variance < 5 else "Low"
+        
+        market_status = "Open" if is_market_open() else "Closed"
+        
+        return {
+            'sources': sources,
+            'average_price': avg_price,
+            'variance': variance,
+            'reliability': price_reliability,
+            'market_status': market_status,
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'price_range': {
+                'min': min(prices),
+                'max': max(prices)
             }
+        }
 
-    def get_technical_analysis(self, symbol, period='1y'):
+    def _price_error(self, message, sources=None):
+        """Price verification result for when no usable price was found"""
+        return {
+            'error': message,
+            'sources': sources or {},
+            'average_price': 'N/A',
+            'variance': 'N/A',
+            'reliability': 'N/A',
+            'market_status': 'Unknown',
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'price_range': {
+                'min': 'N/A',
+                'max': 'N/A'
+            }
+        }
+
+    def get_context(self, symbol, period='1y'):
+        """Create an analysis context so several analyses of a symbol share one fetch"""
+        return AnalysisContext(self, symbol, period)
+
+    def _compute_indicators(self, hist):
+        """Compute the configured indicator set on a copy of the price history"""
+        if hist.empty:
+            return hist
+        frame = hist.copy()
+        close = frame['Close']
+        
+        # Moving Averages
+        for period in self.indicators['SMA']:
+            frame[f'SMA_{period}'] = close.rolling(window=period).mean()
+        
+        # RSI
+        frame[f"RSI_{self.indicators['RSI']}"] = ta.rsi(close, length=self.indicators['RSI'])
+        
+        # MACD
+        fast, slow, signal = self.indicators['MACD']
+        macd = ta.macd(close, fast=fast, slow=slow, signal=signal)
+        
+        # Bollinger Bands
+        length, std = self.indicators['BB']
+        bb = ta.bbands(close, length=length, std=std)
+        frame = pd.concat([frame, macd, bb], axis=1)
+        
+        # Volume Analysis
+        frame['Volume_MA'] = frame['Volume'].rolling(window=20).mean()
+        return frame
+
+    def get_technical_analysis(self, symbol, period='1y', context=None):
         """Get technical analysis for a stock"""
         try:
-            # Verify current price first
-            price_data = self.verify_price(symbol)
-            
-            # Get historical data
-            stock = yf.Ticker(f"{symbol}.NS")
-            hist = stock.history(period=period)
+            context = context or self.get_context(symbol, period)
             
-            # Calculate technical indicators using pandas_ta
-            hist.ta.sma(length=20, append=True)
-            hist.ta.sma(length=50, append=True)
-            hist.ta.rsi(length=14, append=True)
-            hist.ta.macd(append=True)
+            # Verify current price first
+            price_data = context.price_verification
             
-            # Add Bollinger Bands
-            hist.ta.bbands(length=20, append=True)
+            # Get historical data with technical indicators
+            hist = context.indicators
             
-            # Add Volume Analysis
-            hist['Volume_MA'] = hist['Volume'].rolling(window=20).mean()
             volume_trend = "High" if hist['Volume'].iloc[-1] > hist['Volume_MA'].iloc[-1] else "Low"
             
             # Generate signals
@@ -330,7 +553,7 @@ class MarketAnalyzer:
                     articles = response.json().get('articles', [])
                     for article in articles:
                         # Analyze sentiment
-                        blob = TextBlob(article['title'] + " " + article['description'])
+                        blob = textblob.TextBlob(article['title'] + " " + article['description'])
                         sentiment = blob.sentiment.polarity
                         sentiments.append(sentiment)
                         
@@ -355,11 +578,12 @@ class MarketAnalyzer:
         except Exception as e:
             return f"Error in sentiment analysis: {str(e)}"
     
-    def get_fundamental_analysis(self, symbol):
+    def get_fundamental_analysis(self, symbol, context=None):
         """Get fundamental analysis of a stock"""
         try:
-            stock = yf.Ticker(f"{symbol}.NS")
-            info = stock.info
+            context = context or self.get_context(symbol)
+            stock = context.ticker
+            info = context.info
             
             # Calculate key ratios
             pe_ratio = info.get('trailingPE', 'N/A')
@@ -401,23 +625,26 @@ class MarketAnalyzer:
         except Exception as e:
             return f"Error in fundamental analysis: {str(e)}"
     
-    def get_sector_analysis(self, symbol):
+    def get_sector_analysis(self, symbol, context=None):
         """Get sector performance and comparison"""
         try:
-            stock = yf.Ticker(f"{symbol}.NS")
-            sector = stock.info.get('sector', '')
+            context = context or self.get_context(symbol)
+            sector = context.info.get('sector', '')
             
             # Get sector peers
-            peers = stock.info.get('recommendedSymbols', [])
+            peers = context.info.get('recommendedSymbols', [])
+            histories = self.history_cache.get_histories([f"{peer}.NS" for peer in peers], period='1y')
+            
+            # Yearly returns computed over a wide close-price matrix, one column per peer
+            closes = pd.DataFrame({
+                peer: histories[f"{peer}.NS"]['Close']
+                for peer in peers if not histories[f"{peer}.NS"].empty
+            })
             peer_performance = {}
-            
-            for peer in peers:
-                peer_stock = yf.Ticker(f"{peer}.NS")
-                hist = peer_stock.history(period='1y')
-                if not hist.empty:
-                    yearly_return = ((hist['Close'].iloc[-1] - hist['Close'].iloc[0]) / 
-                                   hist['Close'].iloc[0] * 100)
-                    peer_performance[peer] = yearly_return
+            if not closes.empty:
+                first_close = closes.bfill().iloc[0]
+                last_close = closes.ffill().iloc[-1]
+                peer_performance = ((last_close - first_close) / first_close * 100).dropna().to_dict()
             
             # Create sector comparison chart
             fig = go.Figure([go.Bar(x=list(peer_performance.keys()), 
@@ -437,21 +664,48 @@ class MarketAnalyzer:
             return f"Error in sector analysis: {str(e)}"
     
     def generate_comprehensive_report(self, symbol):
-        """Generate a comprehensive analysis report"""
-        technical = self.get_technical_analysis(symbol)
-        fundamental = self.get_fundamental_analysis(symbol)
-        sentiment = self.get_news_sentiment(symbol)
-        sector = self.get_sector_analysis(symbol)
+        """Generate a comprehensive analysis report, running its sections concurrently"""
+        context = self.get_context(symbol)
+        sections = {
+            'technical_analysis': ('technical analysis', lambda: self.get_technical_analysis(symbol, context=context)),
+            'fundamental_analysis': ('fundamental analysis', lambda: self.get_fundamental_analysis(symbol, context=context)),
+            'sentiment_analysis': ('sentiment analysis', lambda: self.get_news_sentiment(symbol)),
+            'sector_analysis': ('sector analysis', lambda: self.get_sector_analysis(symbol, context=context))
+        }
+        
+        # Queue time doesn't count: each section gets its full timeout from when it starts running.
+        # A section still waiting for a worker once its timeout has passed is cancelled instead
+        submitted = time.monotonic()
+        started = {key: threading.Event() for key in sections}
+        started_at = {}
+        
+        def run_section(key, func):
+            started_at[key] = time.monotonic()
+            started[key].set()
+            return func()
+        
+        futures = {key: self._report_executor.submit(run_section, key, func) for key, (_, func) in sections.items()}
         
         report = {
             'symbol': symbol,
-            'analysis_date': datetime.now().isoformat(),
-            'technical_analysis': technical,
-            'fundamental_analysis': fundamental,
-            'sentiment_analysis': sentiment,
-            'sector_analysis': sector
+            'analysis_date': datetime.now().isoformat()
         }
         
+        # A slow or failing section only costs its own entry, never the whole report
+        for key, future in futures.items():
+            label = sections[key][0]
+            timeout = self.report_section_timeouts.get(key, 30)
+            if not started[key].wait(timeout=max(0, submitted + timeout - time.monotonic())) and future.cancel():
+                report[key] = f"Error in {label}: not started within {timeout}s, the server is busy"
+                continue
+            started[key].wait()  # Only waits if it started just as cancelling failed
+            try:
+                report[key] = future.result(timeout=max(0, started_at[key] + timeout - time.monotonic()))
+            except FutureTimeoutError:
+                report[key] = f"Error in {label}: timed out after {timeout}s"
+            except Exception as e:
+                report[key] = f"Error in {label}: {str(e)}"
+        
         # Save report
         report_path = self.analysis_dir / f"{symbol}_comprehensive_report.json"
         with open(report_path, 'w') as f:
@@ -480,7 +734,7 @@ class MarketAnalyzer:
             volume_trend = "High" if current_volume > avg_volume else "Low"
             
             # Get market breadth (can add more indicators here)
-            market_status = "Open" if 9 <= datetime.now().hour < 15 or (datetime.now().hour == 15 and datetime.now().minute <= 30) else "Closed"
+            market_status = "Open" if is_market_open() else "Closed"
             
             # Determine mood based on price change
             mood = ""
@@ -533,43 +787,77 @@ Please try:
 Error details: {str(e)}
 """
 
-    def get_real_time_indicators(self, symbol):
-        """Get comprehensive real-time market indicators"""
-        try:
-            stock = yf.Ticker(f"{symbol}.NS")
-            hist = stock.history(period='1y')
-            
-            if hist.empty:
-                return "No data available for the symbol"
+    def _get_index_data(self, index):
+        """NSE index snapshot; returns (payload, constituent rows) or (None, None)"""
+        data = nse_client.get_json('/api/equity-stockIndices', params={'index': index})
+        if not data:
+            return None, None
+        # The first row is the index itself, the rest are its constituents
+        return data, [row for row in data.get('data', []) if row.get('symbol') != index]
 
-            # Calculate all technical indicators
-            indicators = {}
+    def get_market_breadth(self, index='NIFTY 50'):
+        """Advancing vs declining stocks in an NSE index"""
+        try:
+            data, stocks = self._get_index_data(index)
+            if not data:
+                return {'error': 'Unable to fetch market breadth from NSE'}
             
-            # Moving Averages
-            for period in self.indicators['SMA']:
-                hist[f'SMA_{period}'] = hist['Close'].rolling(window=period).mean()
+            counts = data.get('advance') or {}
+            advances = int(counts.get('advances', sum(1 for row in stocks if row.get('pChange', 0) > 0)))
+            declines = int(counts.get('declines', sum(1 for row in stocks if row.get('pChange', 0) < 0)))
+            unchanged = int(counts.get('unchanged', len(stocks) - advances - declines))
             
-            # RSI
-            hist['RSI'] = ta.rsi(hist['Close'], length=self.indicators['RSI'])
+            return {
+                'index': index,
+                'advances': advances,
+                'declines': declines,
+                'unchanged': unchanged,
+                'advance_decline_ratio': advances / declines if declines else float(advances),
+                'timestamp': data.get('timestamp') or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            }
+        except Exception as e:
+            return {'error': f"Error fetching market breadth: {str(e)}"}
+
+    def get_top_movers(self, direction='gainers', count=5, index='NIFTY 50'):
+        """Biggest gainers or losers in an NSE index today"""
+        try:
+            data, stocks = self._get_index_data(index)
+            if not data:
+                return {'error': f'Unable to fetch {index} data from NSE'}
             
-            # MACD
-            macd = ta.macd(hist['Close'], 
-                          fast=self.indicators['MACD'][0],
-                          slow=self.indicators['MACD'][1],
-                          signal=self.indicators['MACD'][2])
-            hist = pd.concat([hist, macd], axis=1)
+            stocks = [row for row in stocks if isinstance(row.get('pChange'), (int, float))]
+            stocks.sort(key=lambda row: row['pChange'], reverse=(direction == 'gainers'))
             
-            # Bollinger Bands
-            bb = ta.bbands(hist['Close'], 
-                          length=self.indicators['BB'][0],
-                          std=self.indicators['BB'][1])
-            hist = pd.concat([hist, bb], axis=1)
+            return {
+                'index': index,
+                'direction': direction,
+                'stocks': [{
+                    'symbol': row['symbol'],
+                    'price': row.get('lastPrice'),
+                    'change': row.get('change'),
+                    'change_percent': row['pChange']
+                } for row in stocks[:count]],
+                'timestamp': data.get('timestamp') or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            }
+        except Exception as e:
+            return {'error': f"Error fetching top {direction}: {str(e)}"}
+
+    def get_real_time_indicators(self, symbol, context=None):
+        """Get comprehensive real-time market indicators"""
+        try:
+            context = context or self.get_context(symbol)
+            if context.history.empty:
+                return "No data available for the symbol"
+
+            # All technical indicators are computed once per context
+            hist = context.indicators
+            rsi_column = f"RSI_{self.indicators['RSI']}"
 
             # Support and Resistance Levels
             support, resistance = self._calculate_support_resistance(hist)
             
             # Volume Analysis
-            volume_sma = hist['Volume'].rolling(window=20).mean()
+            volume_sma = hist['Volume_MA']
             volume_trend = "High" if hist['Volume'].iloc[-1] > volume_sma.iloc[-1] else "Low"
 
             # Get current values
@@ -583,8 +871,8 @@ Error details: {str(e)}
                     } for period in self.indicators['SMA']
                 },
                 'rsi': {
-                    'value': hist['RSI'].iloc[-1],
-                    'signal': 'Overbought' if hist['RSI'].iloc[-1] > 70 else 'Oversold' if hist['RSI'].iloc[-1] < 30 else 'Neutral'
+                    'value': hist[rsi_column].iloc[-1],
+                    'signal': 'Overbought' if hist[rsi_column].iloc[-1] > 70 else 'Oversold' if hist[rsi_column].iloc[-1] < 30 else 'Neutral'
                 },
                 'macd': {
                     'macd': hist['MACD_12_26_9'].iloc[-1],
@@ -617,26 +905,49 @@ Error details: {str(e)}
         except Exception as e:
             return f"Error calculating real-time indicators: {str(e)}"
 
-    def _calculate_support_resistance(self, data, window=20):
-        """Calculate support and resistance levels using pivot points"""
-        pivots = []
-        supports = []
-        resistances = []
+    def _calculate_support_resistance(self, data, window=20, cluster_tolerance=None):
+        """Calculate support and resistance levels using pivot points
         
-        for i in range(window, len(data)-window):
-            max_val = data['High'].iloc[i-window:i+window].max()
-            min_val = data['Low'].iloc[i-window:i+window].min()
-            
-            if data['High'].iloc[i] == max_val:
-                resistances.append(max_val)
-            if data['Low'].iloc[i] == min_val:
-                supports.append(min_val)
+        A bar is a pivot when its high (low) is the extreme of the 2*window bars
+        from i-window to i+window-1. Passing cluster_tolerance (in percent) merges
+        levels that lie within that distance of each other.
+        """
+        n = len(data)
+        if n <= 2 * window:
+            return [], []
+        
+        highs = data['High'].to_numpy(dtype=float)
+        lows = data['Low'].to_numpy(dtype=float)
+        
+        # Rolling extremes end at i+window-1, so shift them back to line up with bar i
+        span = 2 * window
+        rolling_max = pd.Series(highs).rolling(span, min_periods=1).max().to_numpy()
+        rolling_min = pd.Series(lows).rolling(span, min_periods=1).min().to_numpy()
+        
+        idx = np.arange(window, n - window)
+        resistances = highs[idx][highs[idx] == rolling_max[idx + window - 1]]
+        supports = lows[idx][lows[idx] == rolling_min[idx + window - 1]]
+        
+        supports = np.unique(np.round(supports, 2))
+        resistances = np.unique(np.round(resistances, 2))
+        if cluster_tolerance:
+            supports = self._cluster_levels(supports, cluster_tolerance)
+            resistances = self._cluster_levels(resistances, cluster_tolerance)
         
         # Get most recent levels
-        supports = sorted(list(set([round(s, 2) for s in supports])))[-3:]
-        resistances = sorted(list(set([round(r, 2) for r in resistances])))[-3:]
+        return supports[-3:].tolist(), resistances[-3:].tolist()
+
+    def _cluster_levels(self, levels, tolerance):
+        """Merge sorted price levels that lie within tolerance percent of each other"""
+        if len(levels) == 0:
+            return levels
         
-        return supports, resistances
+        # A new cluster starts wherever the gap to the previous level exceeds the tolerance
+        gaps = np.diff(levels) / levels[:-1] * 100
+        cluster_ids = np.concatenate([[0], np.cumsum(gaps > tolerance)])
+        sums = np.bincount(cluster_ids, weights=levels)
+        counts = np.bincount(cluster_ids)
+        return np.round(sums / counts, 2)
 
     def _get_bb_position(self, price, data):
         """Get position relative to Bollinger Bands"""
@@ -653,7 +964,7 @@ Error details: {str(e)}
     def _generate_advanced_charts(self, data, symbol, indicators):
         """Generate advanced technical analysis charts"""
         # Create main figure with subplots
-        fig = make_subplots(rows=3, cols=1, 
+        fig = plotly_subplots.make_subplots(rows=3, cols=1, 
                            shared_xaxes=True,
                            vertical_spacing=0.05,
                            row_heights=[0.5, 0.25, 0.25])
@@ -705,7 +1016,7 @@ Error details: {str(e)}
         # Add RSI
         fig.add_trace(go.Scatter(
             x=data.index,
-            y=data['RSI'],
+            y=data[f"RSI_{self.indicators['RSI']}"],
             name='RSI'
         ), row=3, col=1)
 
@@ -727,21 +1038,22 @@ Error details: {str(e)}
         chart_path = self.analysis_dir / f"{symbol}_advanced_technical.html"
         fig.write_html(str(chart_path))
 
-    def get_market_sentiment(self, symbol):
+    def get_market_sentiment(self, symbol, context=None):
         """Get comprehensive market sentiment analysis"""
         try:
+            context = context or self.get_context(symbol)
+            
             # Get news sentiment
             news_sentiment = self.get_news_sentiment(symbol)
             
             # Get technical sentiment
-            technical = self.get_technical_analysis(symbol)
+            technical = self.get_technical_analysis(symbol, context=context)
             
             # Get sector performance
-            sector = self.get_sector_analysis(symbol)
+            sector = self.get_sector_analysis(symbol, context=context)
             
             # Get institutional holdings
-            stock = yf.Ticker(f"{symbol}.NS")
-            inst_holders = stock.institutional_holders
+            inst_holders = context.ticker.institutional_holders
             
             sentiment_data = {
                 'news': news_sentiment,
@@ -808,7 +1120,7 @@ Error details: {str(e)}
                     articles = response.json().get('articles', [])
                     for article in articles:
                         # Generate summary using TextBlob
-                        blob = TextBlob(article['description'] or '')
+                        blob = textblob.TextBlob(article['description'] or '')
                         summary = ' '.join([str(sent) for sent in blob.sentences[:2]])
                         
                         # Calculate sentiment
@@ -833,7 +1145,7 @@ Error details: {str(e)}
                 }
                 response = requests.get(mc_url, headers=headers)
                 if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'html.parser')
+                    soup = bs4.BeautifulSoup(response.text, 'html.parser')
                     articles = soup.find_all('li', class_='clearfix')
                     
                     for article in articles[:5]:  # Get top 5 articles
@@ -845,7 +1157,7 @@ Error details: {str(e)}
                             description = desc_elem.text.strip() if desc_elem else ''
                             
                             # Generate summary and sentiment
-                            blob = TextBlob(description)
+                            blob = textblob.TextBlob(description)
                             summary = ' '.join([str(sent) for sent in blob.sentences[:2]])
                             sentiment = blob.sentiment.polarity
                             sentiment_label = 'Positive' if sentiment > 0.1 else 'Negative' if sentiment < -0.1 else 'Neutral'
@@ -0,0 +1,79 @@
+import threading
+from datetime import datetime
+from market_analyzer import is_market_open
+
+class MarketContextService:
+    """Keeps a recent Nifty mood and breadth snapshot refreshed in the background
+
+    Prompt building reads the snapshot instead of fetching market data itself, so no
+    user query waits on these network calls. The refresher thread starts on first use.
+    """
+
+    PLACEHOLDER = "Market context is loading; live Nifty data is not available yet."
+
+    def __init__(self, analyzer, open_interval=30, closed_interval=3600):
+        self.analyzer = analyzer
+        self.open_interval = open_interval      # Seconds between refreshes while the market is open
+        self.closed_interval = closed_interval  # ... and while it is closed
+        self._snapshot = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stop = None  # Stop event of the current refresher; each thread gets its own
+
+    def start(self):
+        """Start the refresher thread if it isn't running yet"""
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._stop = threading.Event()
+                    self._thread = threading.Thread(target=self._run, args=(self._stop,),
+                                                    name='market-context', daemon=True)
+                    self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the refresher without waiting for a refresh in progress to finish"""
+        with self._start_lock:
+            if self._thread is not None:
+                # A later start() makes a new event, so this thread still sees its own one set
+                self._stop.set()
+                self._thread = None
+
+    def snapshot(self):
+        """Latest market context; None until the first refresh has finished"""
+        self.start()
+        return self._snapshot
+
+    def describe(self):
+        """Market context as prompt text"""
+        snapshot = self.snapshot()
+        if snapshot is None:
+            return self.PLACEHOLDER
+
+        text = snapshot['mood'].strip()
+        breadth = snapshot['breadth']
+        if 'error' not in breadth:
+            text += (f"\nNifty 50 Breadth: {breadth['advances']} advancing, {breadth['declines']} declining, "
+                     f"{breadth['unchanged']} unchanged")
+        text += f"\n(As of {snapshot['updated_at']})"
+        return text
+
+    def refresh(self):
+        """Fetch mood and breadth now and replace the snapshot"""
+        # Built in full before being swapped in, so readers never see a half-updated snapshot
+        self._snapshot = {
+            'mood': self.analyzer.get_market_mood(),
+            'breadth': self.analyzer.get_market_breadth(),
+            'market_open': is_market_open(),
+            'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        return self._snapshot
+
+    def _run(self, stop):
+        while not stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Market context refresh error: {str(e)}")
+            interval = self.open_interval if is_market_open() else self.closed_interval
+            stop.wait(interval)
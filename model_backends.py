@@ -0,0 +1,342 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+class ModelBackend:
+    """An AI model backend that is imported and instantiated the first time it is needed
+
+    Calls go through a circuit breaker: once `failure_threshold` of the last `breaker_window`
+    calls fail, the backend is skipped for `cooldown` seconds, then a single probe call decides
+    whether it is closed again or stays open for twice as long (up to `max_cooldown`).
+    """
+
+    def __init__(self, name, loader, priority, window=50, breaker_window=20, min_calls=5,
+                 failure_threshold=0.5, cooldown=30, max_cooldown=300):
+        self.name = name
+        self.loader = loader
+        self.priority = priority
+        self.model = None
+        self.status = 'registered'  # registered -> active | error
+        self.error = None
+        self.load_time = None
+        self.failed_at = None
+        self.latencies = deque(maxlen=window)  # Seconds per successful call, most recent last
+        self.outcomes = deque(maxlen=window)   # True/False per call
+
+        # Circuit breaker: closed -> open -> half_open -> closed | open
+        self.circuit = 'closed'
+        self.opened_at = None
+        self.min_calls = min_calls
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._breaker_outcomes = deque(maxlen=breaker_window)
+        self._probing = False
+
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+    def get(self):
+        """Load the backend on first use; returns the model, or None if it could not be loaded"""
+        if self.status != 'active' and self._load_due():
+            with self._lock:
+                # Another thread may have finished loading while we waited
+                if self.status != 'active' and self._load_due():
+                    started = time.perf_counter()
+                    try:
+                        self.model = self.loader()
+                        self.status = 'active'
+                        self.error = None
+                    except Exception as e:
+                        print(f"{self.name} initialization error: {str(e)}")
+                        self.status = 'error'
+                        self.error = str(e)
+                        self.failed_at = time.monotonic()
+                    self.load_time = time.perf_counter() - started
+        return self.model if self.status == 'active' else None
+
+    def _load_due(self):
+        # A failed load is retried after max_cooldown, e.g. once a missing key has been configured
+        if self.status == 'registered':
+            return True
+        return self.status == 'error' and time.monotonic() - self.failed_at >= self.max_cooldown
+
+    @property
+    def available(self):
+        """True if a call would be allowed right now (loaded or loadable, and circuit not open)"""
+        if self.status == 'error' and not self._load_due():
+            return False
+        with self._stats_lock:
+            if self.circuit == 'open':
+                return time.monotonic() - self.opened_at >= self.cooldown
+            if self.circuit == 'half_open':
+                return not self._probing
+        return True
+
+    def allow_request(self):
+        """Circuit breaker check before a call; while half-open only one probe call goes through"""
+        with self._stats_lock:
+            if self.circuit == 'open':
+                if time.monotonic() - self.opened_at < self.cooldown:
+                    return False
+                self.circuit = 'half_open'
+                self._probing = False
+            if self.circuit == 'half_open':
+                if self._probing:
+                    return False
+                self._probing = True
+            return True
+
+    def record(self, success, latency):
+        """Record the outcome of one call to this backend"""
+        with self._stats_lock:
+            self.outcomes.append(success)
+            if success:
+                self.latencies.append(latency)
+
+            if self.circuit == 'half_open':
+                self._probing = False
+                if success:
+                    self.circuit = 'closed'
+                    self.cooldown = self.base_cooldown
+                    self._breaker_outcomes.clear()
+                else:
+                    self._open(min(self.cooldown * 2, self.max_cooldown))
+                return
+
+            self._breaker_outcomes.append(success)
+            recent = list(self._breaker_outcomes)
+            if (self.circuit == 'closed' and len(recent) >= self.min_calls
+                    and recent.count(False) / len(recent) >= self.failure_threshold):
+                print(f"{self.name} circuit opened after {recent.count(False)}/{len(recent)} failed calls")
+                self._open(self.cooldown)
+
+    def release(self):
+        """Give back a half-open probe for a call that was abandoned before it had an outcome"""
+        with self._stats_lock:
+            if self.circuit == 'half_open':
+                self._probing = False
+
+    def _open(self, cooldown):
+        self.circuit = 'open'
+        self.opened_at = time.monotonic()
+        self.cooldown = cooldown
+
+    def latency_percentile(self, percentile):
+        """Latency (seconds) below which `percentile` of recent successful calls finished, or None"""
+        with self._stats_lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return None
+        index = min(int(percentile * len(latencies)), len(latencies) - 1)
+        return latencies[index]
+
+    @property
+    def error_rate(self):
+        with self._stats_lock:
+            outcomes = list(self.outcomes)
+        return outcomes.count(False) / len(outcomes) if outcomes else 0.0
+
+    def report(self):
+        with self._stats_lock:
+            circuit = self.circuit
+            retry_in = None
+            if circuit == 'open':
+                retry_in = max(self.cooldown - (time.monotonic() - self.opened_at), 0)
+        return {
+            'status': self.status,
+            'circuit': circuit,
+            'available': self.available,
+            'retry_in': retry_in,
+            'priority': self.priority,
+            'load_time': self.load_time,
+            'error': self.error,
+            'calls': len(self.outcomes),
+            'error_rate': self.error_rate,
+            'p50_latency': self.latency_percentile(0.5),
+            'p90_latency': self.latency_percentile(0.9)
+        }
+
+class BackendScheduler:
+    """Run a model call across backends, hedging to the next backend when one is slower than usual
+
+    Backends are tried fastest-first by their recent latency and error rate (falling back to
+    `priority` until there are enough samples). If the current backend hasn't answered within
+    its `hedge_percentile` latency, the next one is started too; the first good answer wins.
+    """
+
+    def __init__(self, backends, hedge_percentile=0.9, default_hedge_delay=4.0,
+                 min_hedge_delay=0.5, deadline=45, min_samples=3, max_workers=None):
+        self.backends = backends
+        self.hedge_percentile = hedge_percentile
+        self.default_hedge_delay = default_hedge_delay  # Used until a backend has min_samples calls
+        self.min_hedge_delay = min_hedge_delay
+        self.deadline = deadline                        # Seconds before giving up on every backend
+        self.min_samples = min_samples
+        # Every concurrent request may have all backends in flight; a smaller pool queues attempts
+        if max_workers is None:
+            max_workers = int(os.getenv('FINWISE_MAX_CONCURRENCY', '16')) * max(len(backends), 1)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='model-call')
+
+    def expected_latency(self, backend):
+        """Typical latency inflated by the error rate, so flaky backends sort after reliable ones"""
+        median = backend.latency_percentile(0.5)
+        if median is None or len(backend.outcomes) < self.min_samples:
+            # Not enough history yet: keep the configured priority order
+            median = self.default_hedge_delay * backend.priority
+        return median / max(1 - backend.error_rate, 0.1)
+
+    def ordered(self, skip=()):
+        candidates = [b for b in self.backends.values() if b.name not in skip and b.available]
+        return sorted(candidates, key=lambda b: (self.expected_latency(b), b.priority))
+
+    def hedge_delay(self, backend):
+        """How long to wait on a backend before also starting the next one"""
+        delay = None
+        if len(backend.outcomes) >= self.min_samples:
+            delay = backend.latency_percentile(self.hedge_percentile)
+        if delay is None:
+            delay = self.default_hedge_delay
+        return min(max(delay, self.min_hedge_delay), self.deadline)
+
+    def run(self, call, skip=()):
+        """Call call(name, model) on backends until one returns text; returns (name, text) or (None, None)
+
+        Hedge delays and the deadline are measured from when an attempt starts running, so time
+        spent waiting for a free worker doesn't count against a backend.
+        """
+        pending = self.ordered(skip)
+        running = {}
+        current = None
+        queued_until = time.monotonic() + self.deadline  # Give up if nothing even starts by then
+
+        def launch():
+            attempt = Attempt(pending.pop(0))
+            running[self._executor.submit(self._attempt, attempt, call)] = attempt
+            return attempt
+
+        while running or pending:
+            now = time.monotonic()
+            started = [attempt.started_at for attempt in running.values() if attempt.started_at is not None]
+            deadline = min(started) + self.deadline if started else queued_until
+            if now >= deadline:
+                break
+            if not running:
+                current = launch()
+                continue
+
+            # No hedging while the current attempt is still waiting for a worker
+            hedge_at = None
+            if pending and current.started_at is not None:
+                hedge_at = current.started_at + self.hedge_delay(current.backend)
+                if now >= hedge_at:
+                    current = launch()
+                    continue
+
+            timeout = deadline - now
+            if hedge_at is not None:
+                timeout = min(timeout, hedge_at - now)
+            elif pending:
+                timeout = min(timeout, 0.05)  # Poll until the current attempt starts
+            done, _ = wait(running, timeout=max(timeout, 0), return_when=FIRST_COMPLETED)
+            for future in done:
+                attempt = running.pop(future)
+                text = future.result()
+                if text:
+                    # Slower backends still running finish in the background and only update their stats
+                    return attempt.backend.name, text
+                # That backend failed, so don't wait out its hedge delay before trying the next
+                if pending and not running:
+                    current = launch()
+                elif pending and attempt is current:
+                    current = launch()
+
+        # Still running at the deadline counts as a failure now, so the breaker doesn't wait for a hung call;
+        # attempts still queued for a worker never reached the backend and say nothing about it
+        now = time.monotonic()
+        for attempt in running.values():
+            attempt.abandoned.set()
+            if attempt.started_at is not None:
+                attempt.backend.record(False, now - attempt.started_at)
+        return None, None
+
+    def _attempt(self, attempt, call):
+        if attempt.abandoned.is_set():
+            return None
+        attempt.started_at = time.monotonic()
+        backend = attempt.backend
+        model = backend.get()
+        if model is None or not backend.allow_request():
+            return None
+        started = time.perf_counter()
+        try:
+            text = call(backend.name, model)
+        except Exception as e:
+            print(f"{backend.name} error: {str(e)}")
+            text = None
+        if not attempt.abandoned.is_set():
+            backend.record(bool(text), time.perf_counter() - started)
+        return text
+
+class Attempt:
+    """One backend call launched by BackendScheduler.run"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.abandoned = threading.Event()  # Set when run() stops waiting; the result is then ignored
+        self.started_at = None              # time.monotonic() when a worker picked the attempt up
+
+GEMINI_MODEL = os.getenv('FINWISE_GEMINI_MODEL', 'gemini-pro')
+
+def load_gemini():
+    import google.generativeai as genai
+    genai.configure(api_key=os.getenv('GOOGLE_API_KEY'))
+    return genai.GenerativeModel(GEMINI_MODEL)
+
+def gemini_with_system_instruction(system_instruction):
+    """Gemini model that keeps a system prompt server-side, or None if the installed SDK can't
+
+    google-generativeai added system_instruction in 0.5; older versions (and callers that get
+    None back) should send the system prompt as part of each request instead.
+    """
+    try:
+        import google.generativeai as genai
+        return genai.GenerativeModel(GEMINI_MODEL, system_instruction=system_instruction)
+    except (ImportError, TypeError):
+        return None
+
+def load_palm():
+    import google.generativeai as palm
+    palm.configure(api_key=os.getenv('GOOGLE_API_KEY'))
+    return palm
+
+def load_huggingface():
+    # torch and transformers are only imported if we actually fall back this far
+    import torch
+    from transformers import pipeline
+    return pipeline('text-generation',
+                    model='facebook/opt-350m',
+                    device='cuda' if torch.cuda.is_available() else 'cpu')
+
+def create_default_backends():
+    """Register the built-in backends without loading any of them"""
+    return {
+        'gemini': ModelBackend('gemini', load_gemini, priority=1),
+        'palm': ModelBackend('palm', load_palm, priority=2),
+        'huggingface': ModelBackend('huggingface', load_huggingface, priority=3)
+    }
+
+def warm_up(backends, names=None):
+    """Load backends on a daemon thread so the first query doesn't pay for it"""
+    selected = [backends[name] for name in (names or backends) if name in backends]
+
+    def run():
+        for backend in sorted(selected, key=lambda b: b.priority):
+            backend.get()
+
+    thread = threading.Thread(target=run, name='model-warmup', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,133 @@
+import threading
+import time
+
+class NSEClient:
+    """Shared HTTP client for the NSE website with pooled connections and cookie reuse"""
+
+    BASE_URL = "https://www.nseindia.com"
+    HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.5',
+        'Connection': 'keep-alive',
+    }
+
+    def __init__(self, timeout=5, cookie_ttl=300, rate=5, burst=20, pool_size=10):
+        self.timeout = timeout
+        self.cookie_ttl = cookie_ttl  # Used when NSE cookies carry no expiry of their own
+        self.rate = rate              # Sustained requests per second across all threads, to avoid throttling
+        self.burst = burst            # Requests that may go out at once after a quiet spell
+        self.pool_size = pool_size
+        self._session = None
+        self._cookie_expires = 0
+        self._cookie_fetched = 0
+        self._cookie_refresh = None   # Event set when the in-flight cookie refresh finishes
+        self._session_lock = threading.Lock()
+        self._cookie_lock = threading.Lock()
+        self._rate_lock = threading.Lock()
+        self._tokens = burst
+        self._tokens_at = time.monotonic()
+
+    def get(self, path, params=None):
+        """GET a path on the NSE website, refreshing the cookie if it is rejected"""
+        session = self._get_session()
+        self._ensure_cookie()
+        requested_at = time.time()
+        response = self._request(session, path, params)
+        if response.status_code in (401, 403):
+            # Cookie expired early or was revoked; refresh once and retry
+            self._ensure_cookie(stale_before=requested_at)
+            response = self._request(session, path, params)
+        return response
+
+    def get_json(self, path, params=None):
+        """GET a path and decode the JSON body, or return None on a non-200 response"""
+        response = self.get(path, params=params)
+        if response.status_code == 200:
+            return response.json()
+        return None
+
+    def _request(self, session, path, params):
+        self._throttle()
+        return session.get(f"{self.BASE_URL}{path}", params=params, timeout=self.timeout)
+
+    def _get_session(self):
+        """Create the pooled session on first use"""
+        with self._session_lock:
+            if self._session is None:
+                # requests is imported here so importing the module stays cheap
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+                
+                session = requests.Session()
+                session.headers.update(self.HEADERS)
+                retries = Retry(total=2, backoff_factor=0.3,
+                                status_forcelist=(429, 500, 502, 503, 504),
+                                allowed_methods=('GET',))
+                adapter = HTTPAdapter(pool_connections=self.pool_size,
+                                      pool_maxsize=self.pool_size,
+                                      max_retries=retries)
+                session.mount('https://', adapter)
+                self._session = session
+            return self._session
+
+    def _ensure_cookie(self, stale_before=None):
+        """Fetch the NSE homepage for a cookie when there is none or it has expired
+
+        Only one thread fetches at a time, without holding any lock other callers need. While an
+        expiring cookie is refreshed the others carry on with it; they only wait when there is
+        no cookie yet or it was rejected.
+        """
+        with self._cookie_lock:
+            now = time.time()
+            if stale_before is not None:
+                # Forced refresh, unless another thread already refreshed since the rejection
+                if self._cookie_fetched > stale_before:
+                    return
+            elif now < self._cookie_expires:
+                return
+            refresh = self._cookie_refresh
+            if refresh is None:
+                refresh = self._cookie_refresh = threading.Event()
+                fetching = True
+            else:
+                fetching = False
+
+        if not fetching:
+            if stale_before is not None or not self._cookie_fetched:
+                refresh.wait(self.timeout)
+            return
+
+        try:
+            self._throttle()
+            self._session.get(self.BASE_URL, timeout=self.timeout)
+            expiries = [cookie.expires for cookie in self._session.cookies if cookie.expires]
+            with self._cookie_lock:
+                self._cookie_fetched = time.time()
+                if expiries:
+                    # Refresh a little before the earliest cookie actually expires
+                    self._cookie_expires = min(min(expiries) - 10, now + self.cookie_ttl)
+                else:
+                    self._cookie_expires = now + self.cookie_ttl
+        finally:
+            with self._cookie_lock:
+                self._cookie_refresh = None
+            refresh.set()
+
+    def queue_time(self, requests=1):
+        """Seconds until `requests` more requests could be sent at the current rate limit"""
+        with self._rate_lock:
+            tokens = min(self.burst, self._tokens + (time.monotonic() - self._tokens_at) * self.rate)
+        return max(0, requests - tokens) / self.rate
+
+    def _throttle(self):
+        """Token bucket shared by all threads: bursts of up to `burst` requests, then `rate` per second"""
+        with self._rate_lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._tokens_at) * self.rate)
+            self._tokens_at = now
+            self._tokens -= 1  # May go negative: later callers queue behind this one
+            delay = -self._tokens / self.rate
+        if delay > 0:
+            time.sleep(delay)
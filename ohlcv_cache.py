@@ -0,0 +1,281 @@
+import importlib.util
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+
+from lazy_imports import lazy_import
+
+pd = lazy_import('pandas')
+yf = lazy_import('yfinance')
+
+def download_batch(tickers, **options):
+    """Download many tickers with one yf.download call; returns {ticker: frame} for tickers with data
+
+    options go to yf.download (period, interval, auto_adjust, ...). Errors are printed and
+    give an empty result, so callers can fall back to other sources.
+    """
+    tickers = list(tickers)
+    try:
+        data = yf.download(tickers, group_by='ticker', progress=False, threads=True, **options)
+    except Exception as e:
+        print(f"Yahoo Finance batch download error: {str(e)}")
+        return {}
+    if data is None or data.empty:
+        return {}
+
+    if isinstance(data.columns, pd.MultiIndex):
+        available = set(data.columns.get_level_values(0))
+        frames = {ticker: data[ticker].dropna(how='all') for ticker in tickers if ticker in available}
+    elif len(tickers) == 1:
+        frames = {tickers[0]: data.dropna(how='all')}
+    else:
+        return {}
+    return {ticker: frame for ticker, frame in frames.items() if not frame.empty}
+
+class OHLCVCache:
+    """Two-tier OHLCV history cache: in-memory LRU in front of on-disk columnar files"""
+
+    # Approximate calendar length of the yfinance period strings we use
+    PERIOD_DAYS = {
+        '1mo': 31, '3mo': 92, '6mo': 183,
+        '1y': 366, '2y': 731, '5y': 1827, '10y': 3653
+    }
+
+    def __init__(self, cache_dir, max_memory_items=64, refresh_interval=900):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_memory_items = max_memory_items
+        self.refresh_interval = refresh_interval  # seconds before cached bars are considered stale
+        self._memory = OrderedDict()  # (symbol, interval) -> (frame, fetched_at)
+        self._lock = threading.RLock()
+        self._symbol_locks = {}
+
+        # Parquet needs pyarrow; fall back to pickle so the cache still works without it
+        self.file_format = 'parquet' if importlib.util.find_spec('pyarrow') else 'pickle'
+
+    def get_history(self, symbol, period='1y', interval='1d'):
+        """Get OHLCV history for a symbol, fetching only bars missing from the cache"""
+        start = self._period_start(period)
+        key = (symbol, interval)
+
+        with self._get_symbol_lock(key):
+            frame, fetched_at = self._load(key)
+
+            if frame is None or frame.empty or not self._covers(frame, start):
+                # Nothing cached, or the cache does not reach back far enough
+                frame = self._download(symbol, period=period, interval=interval)
+                frame.attrs['covered_from'] = 'max' if start is None else start.isoformat()
+                fetched_at = time.time()
+                self._store(key, frame, fetched_at)
+            elif time.time() - fetched_at > self.refresh_interval:
+                # Fetch only from the last complete cached bar onwards and merge
+                new_bars = self._download(symbol, start=frame.index[max(len(frame) - 2, 0)].to_pydatetime(),
+                                          interval=interval)
+                if self._adjustments_changed(frame, new_bars):
+                    frame = self._refetch(symbol, frame, interval)
+                else:
+                    frame = self._merge(frame, new_bars)
+                fetched_at = time.time()
+                self._store(key, frame, fetched_at)
+
+        return self._slice(frame, period, start, interval)
+
+    def get_histories(self, symbols, period='1y', interval='1d'):
+        """Get OHLCV history for many symbols, fetching whatever is missing in one batched download"""
+        start = self._period_start(period)
+        frames = {}
+        stale = []
+        for symbol in symbols:
+            frame, fetched_at = self._load((symbol, interval))
+            if (frame is None or frame.empty or not self._covers(frame, start)
+                    or time.time() - fetched_at > self.refresh_interval):
+                stale.append(symbol)
+            else:
+                frames[symbol] = frame
+
+        if stale:
+            # One download for every stale symbol; incremental merging would need a call per start date
+            downloaded = self._download_many(stale, period=period, interval=interval)
+            fetched_at = time.time()
+            for symbol in stale:
+                frame = downloaded.get(symbol, pd.DataFrame())
+                cached, _ = self._load((symbol, interval))
+                if (cached is not None and not cached.empty and self._covers(cached, start)
+                        and not self._adjustments_changed(cached, frame)):
+                    frame = self._merge(cached, frame)
+                else:
+                    frame.attrs['covered_from'] = 'max' if start is None else start.isoformat()
+                self._store((symbol, interval), frame, fetched_at)
+                frames[symbol] = frame
+
+        return {symbol: self._slice(frames.get(symbol), period, start, interval) for symbol in symbols}
+
+    def _slice(self, frame, period, start, interval):
+        """Cut a cached frame down to the requested period"""
+        if frame is None or frame.empty:
+            return pd.DataFrame()
+        if interval == '1d' and period.endswith('d') and period[:-1].isdigit():
+            # yfinance counts day periods in trading sessions, not calendar days
+            frame = frame.tail(int(period[:-1]))
+        elif start is not None:
+            frame = frame[frame.index >= start]
+        # Callers append indicator columns, so never hand out the cached object
+        return frame.copy()
+
+    def invalidate(self, symbol=None, interval='1d'):
+        """Drop cached history for one symbol, or everything when no symbol is given"""
+        with self._lock:
+            if symbol is None:
+                self._memory.clear()
+                for path in self.cache_dir.glob('*.ohlcv.*'):
+                    path.unlink(missing_ok=True)
+                return
+            self._memory.pop((symbol, interval), None)
+            self._cache_path((symbol, interval)).unlink(missing_ok=True)
+
+    def _get_symbol_lock(self, key):
+        """Per-symbol lock so concurrent callers don't download the same history twice"""
+        with self._lock:
+            if key not in self._symbol_locks:
+                self._symbol_locks[key] = threading.Lock()
+            return self._symbol_locks[key]
+
+    def _period_start(self, period):
+        """Convert a yfinance period string into a naive start timestamp"""
+        if period == 'max':
+            return None
+        if period == 'ytd':
+            return pd.Timestamp(datetime.now().year, 1, 1)
+        if period.endswith('d') and period[:-1].isdigit():
+            # Leave room for weekends and holidays when counting trading days
+            days = int(period[:-1]) * 2 + 4
+        else:
+            days = self.PERIOD_DAYS.get(period)
+        if days is None:
+            raise ValueError(f"Unsupported period: {period}")
+        return pd.Timestamp(datetime.now().date()) - pd.Timedelta(days=days)
+
+    @staticmethod
+    def _covers(frame, start):
+        """Check whether a cached frame was fetched far enough back for the requested start"""
+        covered_from = frame.attrs.get('covered_from')
+        if covered_from == 'max':
+            return True
+        if covered_from is None or start is None:
+            return False
+        return pd.Timestamp(covered_from) <= start
+
+    def _cache_path(self, key):
+        symbol, interval = key
+        safe_symbol = symbol.replace('^', '_').replace('/', '_').replace('&', '_')
+        return self.cache_dir / f"{safe_symbol}_{interval}.ohlcv.{self.file_format}"
+
+    def _load(self, key):
+        """Load from memory first, then from disk"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        path = self._cache_path(key)
+        if not path.exists():
+            return None, 0
+        try:
+            if self.file_format == 'parquet':
+                frame = pd.read_parquet(path)
+            else:
+                frame = pd.read_pickle(path)
+        except Exception as e:
+            print(f"OHLCV cache read error for {key[0]}: {str(e)}")
+            return None, 0
+
+        entry = (frame, path.stat().st_mtime)
+        self._remember(key, entry)
+        return entry
+
+    def _store(self, key, frame, fetched_at):
+        """Write through to memory and disk"""
+        if frame is None or frame.empty:
+            return
+        self._remember(key, (frame, fetched_at))
+        path = self._cache_path(key)
+        # A unique temp file per write, so concurrent writers never interleave in one file
+        fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                if self.file_format == 'parquet':
+                    frame.to_parquet(f)
+                else:
+                    frame.to_pickle(f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            os.unlink(tmp_path)
+            print(f"OHLCV cache write error for {key[0]}: {str(e)}")
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_items:
+                self._memory.popitem(last=False)
+
+    def _download(self, symbol, period=None, start=None, interval='1d'):
+        if start is not None:
+            hist = yf.Ticker(symbol).history(start=start, interval=interval)
+        else:
+            hist = yf.Ticker(symbol).history(period=period, interval=interval)
+        return self._normalize(hist)
+
+    def _download_many(self, symbols, period, interval='1d'):
+        """Download several symbols with a single yf.download call"""
+        frames = download_batch(symbols, period=period, interval=interval, auto_adjust=True)
+        return {symbol: self._normalize(frame) for symbol, frame in frames.items()}
+
+    @staticmethod
+    def _normalize(frame):
+        """Keep only OHLCV columns on a naive, sorted, de-duplicated index"""
+        if frame is None or frame.empty:
+            return pd.DataFrame()
+        frame = frame[[col for col in ['Open', 'High', 'Low', 'Close', 'Volume'] if col in frame.columns]]
+        if getattr(frame.index, 'tz', None) is not None:
+            frame = frame.tz_localize(None)
+        frame = frame[~frame.index.duplicated(keep='last')]
+        return frame.sort_index()
+
+    @staticmethod
+    def _adjustments_changed(cached, new_bars):
+        """Check whether a split or dividend re-adjusted past prices since the cached bars were fetched
+
+        Adjusted history is rescaled backwards, so a complete bar fetched again no longer has
+        the cached close. The last cached bar may have been partial, so it isn't compared.
+        """
+        overlap = cached.index[:-1].intersection(new_bars.index)
+        if len(overlap) == 0 or 'Close' not in cached or 'Close' not in new_bars:
+            return False
+        old_close, new_close = cached.at[overlap[-1], 'Close'], new_bars.at[overlap[-1], 'Close']
+        return abs(old_close - new_close) > 1e-4 * abs(new_close)
+
+    def _refetch(self, symbol, cached, interval):
+        """Download the whole window a cached frame covers, replacing its stale adjusted bars"""
+        covered_from = cached.attrs.get('covered_from')
+        if covered_from == 'max':
+            frame = self._download(symbol, period='max', interval=interval)
+        else:
+            frame = self._download(symbol, start=pd.Timestamp(covered_from).to_pydatetime(), interval=interval)
+        if frame.empty:
+            return cached
+        frame.attrs['covered_from'] = covered_from
+        return frame
+
+    def _merge(self, cached, new_bars):
+        if new_bars is None or new_bars.empty:
+            return cached
+        # The last cached bar may have been partial (intraday), so new data wins
+        merged = pd.concat([cached, new_bars])
+        merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+        merged.attrs['covered_from'] = cached.attrs.get('covered_from')
+        return merged
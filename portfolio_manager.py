@@ -1,130 +1,117 @@
-import pandas as pd
-import yfinance as yf
 from pathlib import Path
-import json
-from datetime import datetime
-import plotly.graph_objects as go
+import threading
+import time
+from lazy_imports import lazy_import
+from ohlcv_cache import OHLCVCache, download_batch
+from portfolio_store import create_store
+from portfolio_risk import PortfolioRiskEngine, assess_risk
+from portfolio_valuation import holdings_frame, portfolio_holdings, value_holdings, portfolio_totals, summary_dict
+
+go = lazy_import('plotly.graph_objects')
 
 class PortfolioManager:
-    def __init__(self):
+    def __init__(self, storage=None, history_cache=None):
         self.portfolio_dir = Path("portfolios")
         self.portfolio_dir.mkdir(exist_ok=True)
+        # SQLite by default (existing JSON portfolios are imported on first use)
+        self.storage = storage or create_store(directory=self.portfolio_dir)
+        self.quote_ttl = 60  # Seconds a batch of fetched prices is reused
+        self._quote_cache = {}
+        self._quote_lock = threading.Lock()
+        # Shares MarketAnalyzer's on-disk history cache, so charts and analysis warm it for us
+        self.risk_engine = PortfolioRiskEngine(history_cache or OHLCVCache(Path("market_analysis") / "cache"))
         
     def create_portfolio(self, user_id, portfolio_name="default"):
         """Create a new portfolio for a user"""
-        portfolio_file = self.portfolio_dir / f"{user_id}_{portfolio_name}.json"
-        if not portfolio_file.exists():
-            portfolio = {
-                "stocks": {},
-                "mutual_funds": {},
-                "created_at": datetime.now().isoformat(),
-                "last_updated": datetime.now().isoformat()
-            }
-            with open(portfolio_file, 'w') as f:
-                json.dump(portfolio, f, indent=4)
+        if self.storage.create(user_id, portfolio_name):
             return "Portfolio created successfully!"
         return "Portfolio already exists!"
     
     def add_stock(self, user_id, symbol, quantity, buy_price, portfolio_name="default"):
         """Add a stock to the portfolio"""
-        portfolio_file = self.portfolio_dir / f"{user_id}_{portfolio_name}.json"
-        if not portfolio_file.exists():
+        if not self.storage.exists(user_id, portfolio_name):
             return "Portfolio not found!"
             
         try:
-            # Verify stock exists
-            stock = yf.Ticker(f"{symbol}.NS")
-            current_price = stock.info.get('currentPrice', 0)
-            
-            with open(portfolio_file, 'r') as f:
-                portfolio = json.load(f)
-            
-            if symbol in portfolio["stocks"]:
-                # Update existing holding
-                old_quantity = portfolio["stocks"][symbol]["quantity"]
-                old_value = old_quantity * portfolio["stocks"][symbol]["buy_price"]
-                new_value = quantity * buy_price
-                avg_price = (old_value + new_value) / (old_quantity + quantity)
-                
-                portfolio["stocks"][symbol] = {
-                    "quantity": old_quantity + quantity,
-                    "buy_price": avg_price,
-                    "current_price": current_price,
-                    "last_updated": datetime.now().isoformat()
-                }
-            else:
-                # Add new holding
-                portfolio["stocks"][symbol] = {
-                    "quantity": quantity,
-                    "buy_price": buy_price,
-                    "current_price": current_price,
-                    "last_updated": datetime.now().isoformat()
-                }
+            current_price = self.get_quotes([symbol]).get(symbol, {}).get('price', 0)
             
-            portfolio["last_updated"] = datetime.now().isoformat()
-            
-            with open(portfolio_file, 'w') as f:
-                json.dump(portfolio, f, indent=4)
+            # One atomic upsert; an existing holding gets the averaged buy price
+            if not self.storage.add_holding(user_id, portfolio_name, symbol, quantity, buy_price, current_price):
+                return "Portfolio not found!"
                 
             return f"Added {quantity} shares of {symbol} at ₹{buy_price} per share"
             
         except Exception as e:
             return f"Error adding stock: {str(e)}"
     
+    def get_quotes(self, symbols):
+        """Last price and previous close for many symbols, fetched with one batched download
+
+        Quotes are reused for quote_ttl seconds, so a command that values the same
+        portfolio more than once only goes upstream once.
+        """
+        now = time.monotonic()
+        quotes = {}
+        with self._quote_lock:
+            for symbol in symbols:
+                cached = self._quote_cache.get(symbol)
+                if cached and now - cached[0] < self.quote_ttl:
+                    quotes[symbol] = cached[1]
+        missing = [symbol for symbol in dict.fromkeys(symbols) if symbol not in quotes]
+        if not missing:
+            return quotes
+
+        tickers = {f"{symbol}.NS": symbol for symbol in missing}
+        # A few days of daily bars give both the latest close and the one before it
+        frames = download_batch(tickers, period='5d', interval='1d', auto_adjust=False)
+        fetched_at = time.monotonic()  # Quotes are as old as the download's end, not its start
+
+        for ticker, frame in frames.items():
+            symbol = tickers[ticker]
+            try:
+                closes = frame['Close'].dropna()
+                if closes.empty:
+                    continue
+                quote = {
+                    'price': float(closes.iloc[-1]),
+                    'previous_close': float(closes.iloc[-2]) if len(closes) > 1 else float(closes.iloc[-1])
+                }
+            except Exception as e:
+                print(f"Portfolio price error for {symbol}: {str(e)}")
+                continue
+            quotes[symbol] = quote
+            with self._quote_lock:
+                self._quote_cache[symbol] = (fetched_at, quote)
+        return quotes
+    
     def get_portfolio_summary(self, user_id, portfolio_name="default"):
         """Get portfolio summary with current values"""
-        portfolio_file = self.portfolio_dir / f"{user_id}_{portfolio_name}.json"
-        if not portfolio_file.exists():
+        portfolio = self.storage.load(user_id, portfolio_name)
+        if portfolio is None:
             return "Portfolio not found!"
             
         try:
-            with open(portfolio_file, 'r') as f:
-                portfolio = json.load(f)
-            
-            total_investment = 0
-            current_value = 0
-            summary = []
-            
-            for symbol, data in portfolio["stocks"].items():
-                stock = yf.Ticker(f"{symbol}.NS")
-                current_price = stock.info.get('currentPrice', data["current_price"])
-                
-                investment = data["quantity"] * data["buy_price"]
-                current_stock_value = data["quantity"] * current_price
-                profit_loss = current_stock_value - investment
-                profit_loss_percent = (profit_loss / investment) * 100
-                
-                total_investment += investment
-                current_value += current_stock_value
-                
-                summary.append({
-                    "symbol": symbol,
-                    "quantity": data["quantity"],
-                    "buy_price": data["buy_price"],
-                    "current_price": current_price,
-                    "investment": investment,
-                    "current_value": current_stock_value,
-                    "profit_loss": profit_loss,
-                    "profit_loss_percent": profit_loss_percent
-                })
-            
-            total_profit_loss = current_value - total_investment
-            total_profit_loss_percent = (total_profit_loss / total_investment) * 100
-            
-            return {
-                "summary": summary,
-                "total_investment": total_investment,
-                "current_value": current_value,
-                "total_profit_loss": total_profit_loss,
-                "total_profit_loss_percent": total_profit_loss_percent
-            }
+            holdings = portfolio_holdings(portfolio, user_id, portfolio_name)
+            quotes = self.get_quotes(holdings['symbol'].tolist())
+            return summary_dict(value_holdings(holdings, quotes))
             
         except Exception as e:
             return f"Error getting portfolio summary: {str(e)}"
     
-    def generate_portfolio_chart(self, user_id, portfolio_name="default"):
+    def revalue_all(self):
+        """Value every stored portfolio at current prices with one price download
+
+        Returns a DataFrame indexed by (user_id, portfolio) with investment, value,
+        P&L and day change, for batch jobs such as a nightly revaluation.
+        """
+        holdings = holdings_frame(self.storage.all_holdings())
+        quotes = self.get_quotes(holdings['symbol'].unique().tolist())
+        return portfolio_totals(value_holdings(holdings, quotes))
+    
+    def generate_portfolio_chart(self, user_id, portfolio_name="default", summary=None):
         """Generate a pie chart of portfolio allocation"""
-        summary = self.get_portfolio_summary(user_id, portfolio_name)
+        if summary is None:
+            summary = self.get_portfolio_summary(user_id, portfolio_name)
         if isinstance(summary, str):
             return summary
             
@@ -139,18 +126,22 @@ class PortfolioManager:
         
         return str(chart_path)
     
-    def get_portfolio_metrics(self, user_id, portfolio_name="default"):
+    def get_portfolio_metrics(self, user_id, portfolio_name="default", summary=None):
         """Calculate portfolio metrics like Beta, Alpha, Sharpe Ratio"""
-        # This is a placeholder for more advanced portfolio metrics
-        summary = self.get_portfolio_summary(user_id, portfolio_name)
+        if summary is None:
+            summary = self.get_portfolio_summary(user_id, portfolio_name)
         if isinstance(summary, str):
             return summary
             
-        return {
-            "diversification_score": len(summary["summary"]),  # Simple score based on number of stocks
-            "risk_level": "High" if len(summary["summary"]) < 5 else "Medium" if len(summary["summary"]) < 10 else "Low",
-            "suggested_actions": [
-                "Consider adding more stocks for better diversification" if len(summary["summary"]) < 5 else
-                "Portfolio is well diversified"
-            ]
-        } 
\ No newline at end of file
+        try:
+            holdings = summary["summary"]
+            # Cached until the portfolio changes (or the day does)
+            key = (user_id, portfolio_name, self.storage.version(user_id, portfolio_name))
+            metrics = dict(self.risk_engine.get_metrics(
+                key, [item["symbol"] for item in holdings], [item["current_value"] for item in holdings]
+            ))
+            metrics["risk_level"], metrics["suggested_actions"] = assess_risk(metrics, len(holdings))
+            return metrics
+            
+        except Exception as e:
+            return f"Error calculating portfolio metrics: {str(e)}"
@@ -0,0 +1,136 @@
+import threading
+from collections import OrderedDict
+from datetime import date
+from statistics import NormalDist
+
+from lazy_imports import lazy_import
+
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+
+TRADING_DAYS = 252
+
+class PortfolioRiskEngine:
+    """Risk metrics for a portfolio from daily returns of its holdings against a benchmark
+
+    Histories come from an OHLCVCache, so only missing bars are downloaded. Results are
+    cached per (user, portfolio, version) and day; any write to the portfolio bumps its
+    version, so repeat views are instant and edits are never served stale metrics.
+    """
+
+    def __init__(self, history_cache, benchmark='^NSEI', period='1y', risk_free_rate=0.065,
+                 confidence=0.95, min_days=30, max_entries=256):
+        self.history_cache = history_cache
+        self.benchmark = benchmark
+        self.period = period
+        self.risk_free_rate = risk_free_rate  # Annual, roughly the 10-year G-Sec yield
+        self.confidence = confidence          # For Value at Risk
+        self.min_days = min_days              # Overlapping trading days needed for meaningful metrics
+        self.max_entries = max_entries
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_metrics(self, key, symbols, values):
+        """Metrics for holdings (NSE symbols) with the given current values, cached under key"""
+        key = (key, date.today().isoformat())
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                return self._results[key]
+
+        metrics = self.compute(self.returns_matrix(symbols), np.asarray(values, dtype=float))
+        with self._lock:
+            self._results[key] = metrics
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+        return metrics
+
+    def returns_matrix(self, symbols):
+        """Daily returns with one column per symbol plus the benchmark last, on their common dates"""
+        tickers = [f"{symbol}.NS" for symbol in symbols] + [self.benchmark]
+        histories = self.history_cache.get_histories(tickers, period=self.period)
+        closes = pd.DataFrame({
+            ticker: histories[ticker]['Close'] for ticker in tickers
+            if not histories[ticker].empty and 'Close' in histories[ticker]
+        })
+        closes.index = closes.index.normalize()
+        closes = closes[~closes.index.duplicated(keep='last')]
+        return closes.pct_change(fill_method=None).iloc[1:].dropna(how='any').reindex(columns=tickers)
+
+    def compute(self, returns, values):
+        """Beta, alpha, Sharpe, Sortino, volatility, drawdown and VaR in one pass over the returns matrix"""
+        total_value = values.sum()
+        weights = values / total_value if total_value > 0 else np.full(len(values), 1 / max(len(values), 1))
+        metrics = {
+            "diversification_score": round(min(10.0, 1 / np.square(weights).sum()), 1) if len(weights) else 0,
+            "max_weight": float(weights.max() * 100) if len(weights) else 0.0,
+            "days": 0
+        }
+
+        # Holdings without history (new listings, bad symbols) can't be included
+        usable = ~returns.isna().all().to_numpy()[:-1]
+        if returns.empty or not usable.any() or pd.isna(returns.iloc[:, -1]).all():
+            return metrics
+        matrix = returns.loc[:, list(returns.columns[:-1][usable]) + [returns.columns[-1]]].dropna().to_numpy()
+        if len(matrix) < self.min_days:
+            return metrics
+
+        holdings, market = matrix[:, :-1], matrix[:, -1]
+        weights = weights[usable] / weights[usable].sum()
+        portfolio = holdings @ weights
+        covariance = np.cov(matrix, rowvar=False)
+        market_variance = covariance[-1, -1]
+
+        daily_free = self.risk_free_rate / TRADING_DAYS
+        annual_return = portfolio.mean() * TRADING_DAYS
+        market_return = market.mean() * TRADING_DAYS
+        volatility = np.sqrt(weights @ covariance[:-1, :-1] @ weights * TRADING_DAYS)
+        downside = np.sqrt(np.mean(np.minimum(portfolio - daily_free, 0) ** 2) * TRADING_DAYS)
+        beta = weights @ covariance[:-1, -1] / market_variance if market_variance > 0 else 0.0
+
+        wealth = np.cumprod(1 + portfolio)
+        drawdown = wealth / np.maximum.accumulate(wealth) - 1
+
+        tail = 1 - self.confidence
+        daily_sd = portfolio.std(ddof=1)
+        metrics.update({
+            "days": len(matrix),
+            "annual_return": float(annual_return * 100),
+            "volatility": float(volatility * 100),
+            "beta": float(beta),
+            "alpha": float((annual_return - (self.risk_free_rate + beta * (market_return - self.risk_free_rate))) * 100),
+            "sharpe_ratio": float((annual_return - self.risk_free_rate) / volatility) if volatility > 0 else 0.0,
+            "sortino_ratio": float((annual_return - self.risk_free_rate) / downside) if downside > 0 else 0.0,
+            "max_drawdown": float(drawdown.min() * 100),
+            # One-day loss not exceeded with the given confidence, as a percent and in rupees
+            "var_historical": float(-np.percentile(portfolio, tail * 100) * 100),
+            "var_parametric": float(-(portfolio.mean() + NormalDist().inv_cdf(tail) * daily_sd) * 100),
+            "holding_betas": dict(zip(
+                [column[:-3] for column in returns.columns[:-1][usable]],
+                (covariance[:-1, -1] / market_variance).round(2).tolist() if market_variance > 0 else []
+            ))
+        })
+        metrics["var_amount"] = float(metrics["var_historical"] / 100 * total_value)
+        return metrics
+
+def assess_risk(metrics, holdings_count):
+    """Risk level and suggested actions for computed metrics"""
+    volatility = metrics.get("volatility")
+    if volatility is None:
+        # No usable price history; judge by concentration alone
+        risk_level = "High" if holdings_count < 5 else "Medium" if holdings_count < 10 else "Low"
+    else:
+        risk_level = "High" if volatility > 25 else "Medium" if volatility > 15 else "Low"
+
+    actions = []
+    if holdings_count < 5 or metrics["diversification_score"] < 5:
+        actions.append("Consider adding more stocks for better diversification")
+    if metrics["max_weight"] > 30:
+        actions.append(f"Largest holding is {metrics['max_weight']:.0f}% of the portfolio; consider trimming it")
+    if metrics.get("beta", 0) > 1.2:
+        actions.append("Portfolio swings more than the Nifty 50; add defensive or low-beta stocks")
+    if metrics.get("max_drawdown", 0) < -25:
+        actions.append("Deep past drawdowns; make sure this fits your risk tolerance")
+    if volatility is not None and metrics["sharpe_ratio"] < 0:
+        actions.append("Returns have not beaten the risk-free rate; review underperforming holdings")
+    return risk_level, actions or ["Portfolio is well diversified"]
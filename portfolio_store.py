@@ -0,0 +1,282 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+HOLDING_KINDS = ("stocks", "mutual_funds")
+
+def _empty_portfolio(now):
+    return {
+        "stocks": {},
+        "mutual_funds": {},
+        "created_at": now,
+        "last_updated": now,
+        "version": 0
+    }
+
+class SQLitePortfolioStore:
+    """Portfolios in one SQLite database, one row per holding
+
+    Adding to a holding is a single UPSERT that averages the buy price in SQL, so concurrent
+    writers (threads or processes) never lose each other's updates. Every write bumps the
+    portfolio's version, which callers can use as a cache key.
+    """
+
+    def __init__(self, db_path="portfolios/portfolios.db"):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")    # Readers don't block the writer
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS portfolios ("
+            "user_id TEXT, name TEXT, created_at TEXT, last_updated TEXT, version INTEGER DEFAULT 0, "
+            "PRIMARY KEY (user_id, name));"
+            "CREATE TABLE IF NOT EXISTS holdings ("
+            "user_id TEXT, name TEXT, kind TEXT, symbol TEXT, quantity REAL, buy_price REAL, "
+            "current_price REAL, last_updated TEXT, PRIMARY KEY (user_id, name, kind, symbol));"
+        )
+        self._db.commit()
+
+    def create(self, user_id, name="default", created_at=None):
+        """Create an empty portfolio; returns False if it already exists"""
+        now = created_at or datetime.now().isoformat()
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO portfolios (user_id, name, created_at, last_updated) VALUES (?, ?, ?, ?)",
+                (user_id, name, now, now)
+            )
+        return cursor.rowcount == 1
+
+    def exists(self, user_id, name="default"):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM portfolios WHERE user_id = ? AND name = ?", (user_id, name)
+            ).fetchone()
+        return row is not None
+
+    def add_holding(self, user_id, name, symbol, quantity, buy_price, current_price, kind="stocks"):
+        """Add to a holding, averaging the buy price; returns False if the portfolio doesn't exist"""
+        now = datetime.now().isoformat()
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "UPDATE portfolios SET version = version + 1, last_updated = ? WHERE user_id = ? AND name = ?",
+                (now, user_id, name)
+            )
+            if cursor.rowcount == 0:
+                return False
+            # Right-hand sides see the old row, so the average uses the previous quantity
+            self._db.execute(
+                "INSERT INTO holdings (user_id, name, kind, symbol, quantity, buy_price, current_price, last_updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (user_id, name, kind, symbol) DO UPDATE SET "
+                "buy_price = (quantity * buy_price + excluded.quantity * excluded.buy_price) "
+                "/ (quantity + excluded.quantity), "
+                "quantity = quantity + excluded.quantity, "
+                "current_price = excluded.current_price, "
+                "last_updated = excluded.last_updated",
+                (user_id, name, kind, symbol, quantity, buy_price, current_price, now)
+            )
+        return True
+
+    def version(self, user_id, name="default"):
+        """Number of writes to the portfolio so far, or None if it doesn't exist"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT version FROM portfolios WHERE user_id = ? AND name = ?", (user_id, name)
+            ).fetchone()
+        return row[0] if row else None
+
+    def load(self, user_id, name="default"):
+        """Portfolio in the same shape as the legacy JSON files, or None if it doesn't exist"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT created_at, last_updated, version FROM portfolios WHERE user_id = ? AND name = ?",
+                (user_id, name)
+            ).fetchone()
+            if row is None:
+                return None
+            holdings = self._db.execute(
+                "SELECT kind, symbol, quantity, buy_price, current_price, last_updated "
+                "FROM holdings WHERE user_id = ? AND name = ? ORDER BY rowid",
+                (user_id, name)
+            ).fetchall()
+
+        portfolio = _empty_portfolio(row[0])
+        portfolio["last_updated"], portfolio["version"] = row[1], row[2]
+        for kind, symbol, quantity, buy_price, current_price, last_updated in holdings:
+            portfolio.setdefault(kind, {})[symbol] = {
+                "quantity": quantity,
+                "buy_price": buy_price,
+                "current_price": current_price,
+                "last_updated": last_updated
+            }
+        return portfolio
+
+    def all_holdings(self, kind="stocks"):
+        """(user_id, name, symbol, quantity, buy_price, current_price) for every portfolio, e.g. for revaluation"""
+        with self._lock:
+            return self._db.execute(
+                "SELECT user_id, name, symbol, quantity, buy_price, current_price FROM holdings WHERE kind = ?",
+                (kind,)
+            ).fetchall()
+
+    def import_portfolio(self, user_id, name, portfolio):
+        """Copy a legacy portfolio dict in; returns False if one with that name is already stored"""
+        now = datetime.now().isoformat()
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO portfolios (user_id, name, created_at, last_updated, version) "
+                "VALUES (?, ?, ?, ?, 1)",
+                (user_id, name, portfolio.get("created_at", now), portfolio.get("last_updated", now))
+            )
+            if cursor.rowcount == 0:
+                return False
+            self._db.executemany(
+                "INSERT OR REPLACE INTO holdings "
+                "(user_id, name, kind, symbol, quantity, buy_price, current_price, last_updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (user_id, name, kind, symbol, data["quantity"], data["buy_price"],
+                     data.get("current_price", 0), data.get("last_updated", now))
+                    for kind in HOLDING_KINDS
+                    for symbol, data in portfolio.get(kind, {}).items()
+                ]
+            )
+        return True
+
+class JSONPortfolioStore:
+    """Portfolios as the original portfolios/{user}_{name}.json files
+
+    Writes hold an exclusive lock file for the read-modify-write and replace the file
+    atomically, so a crash never leaves half a portfolio behind. Each write still rewrites
+    the whole file; use SQLitePortfolioStore for large or busy portfolios.
+    """
+
+    def __init__(self, directory="portfolios"):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _path(self, user_id, name):
+        return self.directory / f"{user_id}_{name}.json"
+
+    @contextmanager
+    def _locked(self, user_id, name):
+        with self._lock, open(self.directory / f".{user_id}_{name}.lock", 'w') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _write(self, path, portfolio):
+        fd, tmp_path = tempfile.mkstemp(dir=str(self.directory), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(portfolio, f, indent=4)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def create(self, user_id, name="default", created_at=None):
+        with self._locked(user_id, name):
+            path = self._path(user_id, name)
+            if path.exists():
+                return False
+            self._write(path, _empty_portfolio(created_at or datetime.now().isoformat()))
+        return True
+
+    def exists(self, user_id, name="default"):
+        return self._path(user_id, name).exists()
+
+    def add_holding(self, user_id, name, symbol, quantity, buy_price, current_price, kind="stocks"):
+        with self._locked(user_id, name):
+            portfolio = self.load(user_id, name)
+            if portfolio is None:
+                return False
+
+            now = datetime.now().isoformat()
+            holdings = portfolio.setdefault(kind, {})
+            if symbol in holdings:
+                old = holdings[symbol]
+                total = old["quantity"] + quantity
+                buy_price = (old["quantity"] * old["buy_price"] + quantity * buy_price) / total
+                quantity = total
+            holdings[symbol] = {
+                "quantity": quantity,
+                "buy_price": buy_price,
+                "current_price": current_price,
+                "last_updated": now
+            }
+            portfolio["last_updated"] = now
+            portfolio["version"] = portfolio.get("version", 0) + 1
+            self._write(self._path(user_id, name), portfolio)
+        return True
+
+    def version(self, user_id, name="default"):
+        portfolio = self.load(user_id, name)
+        return portfolio.get("version", 0) if portfolio else None
+
+    def load(self, user_id, name="default"):
+        try:
+            with open(self._path(user_id, name), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def all_holdings(self, kind="stocks"):
+        rows = []
+        for path in sorted(self.directory.glob("*_*.json")):
+            user_id, _, name = path.stem.rpartition('_')
+            portfolio = self.load(user_id, name) or {}
+            rows.extend(
+                (user_id, name, symbol, data["quantity"], data["buy_price"], data.get("current_price", 0))
+                for symbol, data in portfolio.get(kind, {}).items()
+            )
+        return rows
+
+    def import_portfolio(self, user_id, name, portfolio):
+        with self._locked(user_id, name):
+            path = self._path(user_id, name)
+            if path.exists():
+                return False
+            self._write(path, portfolio)
+        return True
+
+def import_json_portfolios(store, directory="portfolios"):
+    """Copy legacy {user}_{name}.json portfolios into a store, skipping ones it already has
+
+    Returns the number imported. The JSON files are left in place.
+    """
+    imported = 0
+    for path in sorted(Path(directory).glob("*_*.json")):
+        user_id, _, name = path.stem.rpartition('_')
+        try:
+            with open(path, 'r') as f:
+                portfolio = json.load(f)
+            if store.import_portfolio(user_id, name, portfolio):
+                imported += 1
+        except Exception as e:
+            print(f"Error importing portfolio {path.name}: {str(e)}")
+    return imported
+
+def create_store(kind=None, directory="portfolios"):
+    """Storage backend named by kind or FINWISE_PORTFOLIO_STORE ('sqlite', the default, or 'json')"""
+    kind = (kind or os.getenv('FINWISE_PORTFOLIO_STORE', 'sqlite')).lower()
+    if kind == 'json':
+        return JSONPortfolioStore(directory)
+    if kind != 'sqlite':
+        raise ValueError(f"Unknown portfolio store: {kind}")
+    store = SQLitePortfolioStore(Path(directory) / "portfolios.db")
+    import_json_portfolios(store, directory)
+    return store
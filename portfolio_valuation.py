@@ -0,0 +1,110 @@
+from lazy_imports import lazy_import
+
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+
+HOLDING_COLUMNS = ['user_id', 'portfolio', 'symbol', 'quantity', 'buy_price', 'stored_price']
+
+def holdings_frame(rows):
+    """Holdings as one DataFrame from (user_id, portfolio, symbol, quantity, buy_price, stored_price) rows"""
+    columns = list(zip(*rows)) or [()] * len(HOLDING_COLUMNS)
+    # Categorical keys make grouping and price lookup integer operations instead of string hashing
+    return pd.DataFrame({
+        name: pd.Categorical(values) if name in ('user_id', 'portfolio', 'symbol') else np.array(values, dtype=float)
+        for name, values in zip(HOLDING_COLUMNS, columns)
+    })
+
+def portfolio_holdings(portfolio, user_id='', name=''):
+    """Holdings frame for one stored portfolio dict"""
+    return holdings_frame(
+        (user_id, name, symbol, data["quantity"], data["buy_price"], data.get("current_price", 0))
+        for symbol, data in portfolio["stocks"].items()
+    )
+
+def _percent(numerator, denominator):
+    """numerator / denominator * 100, or 0 where the denominator is 0"""
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    out = np.zeros_like(numerator)
+    np.divide(numerator, denominator, out=out, where=denominator != 0)
+    return out * 100
+
+def _portfolio_groups(holdings):
+    """Group number of each holding's (user_id, portfolio) and the first row of each group"""
+    users = holdings['user_id'].astype('category')
+    names = holdings['portfolio'].astype('category')
+    keys = users.cat.codes.to_numpy(dtype=np.int64) * max(len(names.cat.categories), 1) + names.cat.codes.to_numpy()
+    _, first, groups = np.unique(keys, return_index=True, return_inverse=True)
+    return groups.reshape(-1), first
+
+def value_holdings(holdings, quotes):
+    """Per-holding value, P&L, weight and day change in one vectorized pass
+
+    quotes maps symbol -> {'price', 'previous_close'}; holdings without a quote keep
+    their stored price and show no day change. Weights are within each portfolio.
+    """
+    symbols = holdings['symbol'].astype('category')
+    # Look prices up once per distinct symbol, then spread them to holdings by category code
+    missing = float('nan')
+    prices = np.array([
+        (quote.get('price', missing), quote.get('previous_close', missing)) for quote in quotes.values()
+    ] + [(missing, missing)], dtype=float)
+    positions = pd.Index(list(quotes)).get_indexer(symbols.cat.categories)  # -1 (the NaN row) if unquoted
+    prices = prices[positions][symbols.cat.codes.to_numpy()]
+    quantity = holdings['quantity'].to_numpy(dtype=float)
+    buy_price = holdings['buy_price'].to_numpy(dtype=float)
+
+    current_price = np.where(np.isnan(prices[:, 0]), holdings['stored_price'].to_numpy(dtype=float), prices[:, 0])
+    previous_close = np.where(np.isnan(prices[:, 1]), current_price, prices[:, 1])
+    investment = quantity * buy_price
+    current_value = quantity * current_price
+    groups, _ = _portfolio_groups(holdings)
+    portfolio_value = np.bincount(groups, weights=current_value)[groups]
+
+    frame = holdings.assign(
+        current_price=current_price,
+        investment=investment,
+        current_value=current_value,
+        profit_loss=current_value - investment,
+        profit_loss_percent=_percent(current_value - investment, investment),
+        weight=_percent(current_value, portfolio_value),
+        day_change=quantity * (current_price - previous_close),
+        day_change_percent=_percent(current_price - previous_close, previous_close)
+    )
+    return frame
+
+def portfolio_totals(valued):
+    """Aggregate investment, value, P&L and day change per (user_id, portfolio)"""
+    groups, first = _portfolio_groups(valued)
+    index = pd.MultiIndex.from_arrays(
+        [valued['user_id'].iloc[first], valued['portfolio'].iloc[first]], names=['user_id', 'portfolio']
+    )
+    totals = pd.DataFrame({
+        column: np.bincount(groups, weights=valued[column].to_numpy(), minlength=len(first))
+        for column in ('investment', 'current_value', 'profit_loss', 'day_change')
+    }, index=index)
+    totals['holdings'] = np.bincount(groups, minlength=len(first))
+    totals['profit_loss_percent'] = _percent(totals['profit_loss'], totals['investment'])
+    totals['day_change_percent'] = _percent(totals['day_change'], totals['current_value'] - totals['day_change'])
+    return totals
+
+def summary_dict(valued):
+    """The get_portfolio_summary result for one portfolio's valued holdings"""
+    records = valued[[
+        'symbol', 'quantity', 'buy_price', 'current_price', 'investment', 'current_value',
+        'profit_loss', 'profit_loss_percent', 'weight', 'day_change', 'day_change_percent'
+    ]].to_dict('records')
+
+    total_investment = float(valued['investment'].sum())
+    current_value = float(valued['current_value'].sum())
+    day_change = float(valued['day_change'].sum())
+    total_profit_loss = current_value - total_investment
+    return {
+        "summary": records,
+        "total_investment": total_investment,
+        "current_value": current_value,
+        "total_profit_loss": total_profit_loss,
+        "total_profit_loss_percent": float(_percent(total_profit_loss, total_investment)),
+        "day_change": day_change,
+        "day_change_percent": float(_percent(day_change, current_value - day_change))
+    }
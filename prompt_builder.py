@@ -0,0 +1,121 @@
+import re
+
+# Gemini and PaLM tokenizers average roughly 4 characters per token on English text;
+# close enough for budgeting without a network call to count_tokens
+CHARS_PER_TOKEN = 4
+
+# Emoji, arrows, box drawing and other symbols used to decorate responses (₹ is kept)
+_EMOJI = re.compile(
+    "[\U0001F000-\U0001FAFF\u2190-\u21FF\u2300-\u23FF\u2500-\u257F"
+    "\u2600-\u27BF\u2B00-\u2BFF\uFE0F\u200D]+"
+)
+_RULE = re.compile(r"[=\-─_*]{3,}")
+_SPACES = re.compile(r"\s+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+def estimate_tokens(text):
+    """Approximate token count of a piece of text"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def truncate_tokens(text, max_tokens):
+    """Cut text to about max_tokens, preferring to end at a sentence or word boundary"""
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    sentence_end = max((m.start() for m in _SENTENCE_END.finditer(cut)), default=-1)
+    if sentence_end > limit // 2:
+        return cut[:sentence_end]
+    return cut.rsplit(' ', 1)[0] + '…'
+
+def clean_for_history(text):
+    """Strip what a model doesn't need to read again: disclaimers, emojis, rules and extra whitespace"""
+    kept = []
+    in_disclaimer = False
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            in_disclaimer = False  # A disclaimer runs to the end of its paragraph
+            continue
+        if in_disclaimer:
+            continue
+        position = line.lower().find('disclaimer')
+        if position >= 0:
+            in_disclaimer = True
+            line = line[:position].strip()
+            if not line:
+                continue
+        if _RULE.fullmatch(line):
+            continue
+        kept.append(line)
+    return _SPACES.sub(' ', _EMOJI.sub('', ' '.join(kept))).strip()
+
+class PromptBuilder:
+    """Builds the dynamic part of a prompt (context, history, query) within a token budget
+
+    The last `recent_turns` exchanges are included, cleaned and shortened; older turns are
+    folded into a rolling one-line-per-turn summary. When the prompt is still over budget,
+    the oldest summary lines go first, then the oldest recent turns.
+    """
+
+    def __init__(self, budget=1200, recent_turns=2, answer_tokens=250, summary_tokens=200, context_tokens=250):
+        self.budget = budget                  # Tokens for everything except the system prompt
+        self.recent_turns = recent_turns
+        self.answer_tokens = answer_tokens    # Per recent answer
+        self.summary_tokens = summary_tokens
+        self.context_tokens = context_tokens
+
+    def summarize_turn(self, question, answer):
+        answer = clean_for_history(answer)
+        first_sentence = _SENTENCE_END.split(answer, 1)[0]
+        return f"- Asked: {truncate_tokens(clean_for_history(question), 30)} | Answered: {truncate_tokens(first_sentence, 40)}"
+
+    def fold_summary(self, summary, question, answer):
+        """Add one turn to a rolling summary, dropping its oldest lines to stay within summary_tokens"""
+        lines = [line for line in summary.splitlines() if line]
+        lines.append(self.summarize_turn(question, answer))
+        while len(lines) > 1 and estimate_tokens('\n'.join(lines)) > self.summary_tokens:
+            lines.pop(0)
+        return '\n'.join(lines)
+
+    def remember(self, history, summary, question, answer):
+        """Append a turn to a bounded history; the turn it pushes out is kept in the summary"""
+        if history.maxlen is not None and len(history) == history.maxlen:
+            summary = self.fold_summary(summary, *history[0])
+        history.append((question, answer))
+        return summary
+
+    def build(self, query, history=(), summary='', context=None):
+        """Prompt text for the query with as much context and history as the budget allows"""
+        turns = list(history)
+        recent = turns[-self.recent_turns:] if self.recent_turns else []
+        for question, answer in turns[:len(turns) - len(recent)]:
+            summary = self.fold_summary(summary, question, answer)
+
+        summary_lines = [line for line in summary.splitlines() if line]
+        recent_blocks = [
+            f"User: {clean_for_history(question)}\n"
+            f"Assistant: {truncate_tokens(clean_for_history(answer), self.answer_tokens)}"
+            for question, answer in recent
+        ]
+        context = truncate_tokens(context.strip(), self.context_tokens) if context else ''
+
+        def assemble():
+            sections = []
+            if context:
+                sections.append(context)
+            if summary_lines:
+                sections.append("Earlier in this conversation:\n" + '\n'.join(summary_lines))
+            if recent_blocks:
+                sections.append("Recent conversation:\n" + '\n\n'.join(recent_blocks))
+            sections.append(f"Current Query: {query}")
+            return '\n\n'.join(sections)
+
+        prompt = assemble()
+        while estimate_tokens(prompt) > self.budget and (summary_lines or recent_blocks):
+            if summary_lines:
+                summary_lines.pop(0)
+            else:
+                recent_blocks.pop(0)
+            prompt = assemble()
+        return prompt
@@ -0,0 +1,150 @@
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+
+class ResponseCache:
+    """LRU cache of AI responses keyed on mode and normalized query, with TTL and optional disk backing
+
+    When an embed_fn is given (text -> vector), a miss on the exact key falls back to
+    the most similar cached query in the same mode above similarity_threshold.
+    """
+
+    _PUNCTUATION = re.compile(r"[^\w\s&%₹.-]|(?<!\d)\.|\.(?!\d)")
+    _WHITESPACE = re.compile(r"\s+")
+
+    def __init__(self, max_entries=512, ttl=3600, mode_ttl=None, db_path=None,
+                 embed_fn=None, similarity_threshold=0.92):
+        self.max_entries = max_entries
+        self.ttl = ttl                      # Seconds a cached response stays valid
+        self.mode_ttl = mode_ttl or {}      # Per-mode overrides, e.g. longer for learning content
+        self.embed_fn = embed_fn
+        self.similarity_threshold = similarity_threshold
+        self._entries = OrderedDict()       # key -> (created, response); least recently used first
+        self._embeddings = {}               # key -> (mode, unit vector)
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, mode TEXT, response TEXT, created REAL)"
+            )
+            self._db.commit()
+
+    @classmethod
+    def normalize(cls, query):
+        """Lowercase, drop punctuation (keeping decimals) and collapse whitespace"""
+        query = cls._PUNCTUATION.sub(' ', query.lower())
+        return cls._WHITESPACE.sub(' ', query).strip()
+
+    def make_key(self, mode, query):
+        return f"{mode}:{self.normalize(query)}"
+
+    def get(self, mode, query):
+        """Return a cached response, or None on a miss"""
+        key = self.make_key(mode, query)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._db is not None:
+                entry = self._load_from_disk(key)
+            if entry is not None and self._is_fresh(mode, entry[0], now):
+                self._remember(key, entry)
+                return entry[1]
+            if entry is not None:
+                self._forget(key)
+
+        if self.embed_fn is not None:
+            return self._get_similar(mode, query, now)
+        return None
+
+    def put(self, mode, query, response):
+        key = self.make_key(mode, query)
+        entry = (time.time(), response)
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, mode, response, created) VALUES (?, ?, ?, ?)",
+                    (key, mode, response, entry[0])
+                )
+                self._db.commit()
+
+        if self.embed_fn is not None:
+            vector = self._embed(query)
+            if vector is not None:
+                with self._lock:
+                    if key in self._entries:
+                        self._embeddings[key] = (mode, vector)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._embeddings.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _is_fresh(self, mode, created, now):
+        return now - created <= self.mode_ttl.get(mode, self.ttl)
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            self._embeddings.pop(evicted, None)
+
+    def _forget(self, key):
+        self._entries.pop(key, None)
+        self._embeddings.pop(key, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._db.commit()
+
+    def _load_from_disk(self, key):
+        row = self._db.execute("SELECT created, response FROM responses WHERE key = ?", (key,)).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def _embed(self, query):
+        try:
+            vector = np.asarray(self.embed_fn(self.normalize(query)), dtype=float)
+        except Exception as e:
+            print(f"Response cache embedding error: {str(e)}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _get_similar(self, mode, query, now):
+        """Find the closest cached query in the same mode by cosine similarity"""
+        with self._lock:
+            candidates = [(key, vector) for key, (entry_mode, vector) in self._embeddings.items()
+                          if entry_mode == mode]
+        if not candidates:
+            return None
+        vector = self._embed(query)
+        if vector is None:
+            return None
+
+        scores = np.stack([candidate for _, candidate in candidates]) @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None
+
+        key = candidates[best][0]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not self._is_fresh(mode, entry[0], now):
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
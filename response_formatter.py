@@ -0,0 +1,93 @@
+import re
+
+class ResponseFormatter:
+    """Formats model output in one regex pass instead of a chain of replace/sub passes
+
+    Handles **bold** markers, ₹ amounts, percentages, long numbers and section labels
+    with a single precompiled alternation. No token spans a line break, so text can
+    also be formatted line by line as it streams in.
+    """
+
+    def __init__(self, labels=None, strip_bold=True, format_numbers=True):
+        self.labels = dict(labels or {})
+        self.strip_bold = strip_bold
+        self.format_numbers = format_numbers
+
+        tokens = []
+        starts = set()
+        if strip_bold:
+            tokens.append(r"\*\*")
+            starts.add(r"\*")
+        if format_numbers:
+            number = r"\d[\d,]*(?:\.\d+)?"
+            tokens += [
+                rf"₹[ \t]*{number}",                                             # ₹ amounts
+                rf"(?<![\d.,])(?:{number}%|\d{{4,}}(?:\.\d+)?(?![\d,]|\.\d))",  # percentages, long numbers
+            ]
+            starts.update(["₹", r"\d"])
+        # Longest first, so 'Pro Tip:' wins over 'Tip:'
+        for name in sorted(self.labels, key=len, reverse=True):
+            tokens.append(re.escape(name))
+            starts.add(re.escape(name[0]))
+        # Groupless alternatives behind a first-character lookahead let the scan skip most positions quickly
+        self.pattern = None
+        if tokens:
+            self.pattern = re.compile(f"(?=[{''.join(sorted(starts))}])(?:{'|'.join(tokens)})")
+
+    def format(self, text):
+        if self.pattern is None or not text:
+            return text
+        return self.pattern.sub(self._replace, text)
+
+    def stream(self, chunks):
+        """Format a stream of text chunks, yielding each complete line once it has arrived"""
+        pending = ''
+        for chunk in chunks:
+            pending += chunk
+            lines, newline, pending = pending.rpartition('\n')
+            if newline:
+                yield self.format(lines + newline)
+        if pending:
+            yield self.format(pending)
+
+    def _replace(self, match):
+        token = match.group()
+        label = self.labels.get(token)
+        if label is not None:
+            return label
+        first = token[0]
+        if first == '*':
+            return ''
+        if first == '₹':
+            amount = float(token[1:].strip().replace(',', ''))
+            return f"₹{amount:,.2f}"
+        if token[-1] == '%':
+            return f"{float(token[:-1].replace(',', '')):,.2f}%"
+        digits, point, fraction = token.partition('.')
+        # Leave years alone ("in 2024"), group everything else ("12,500 shares"), keeping any decimals as written
+        if not point and len(digits) == 4 and 1900 <= int(digits) <= 2100:
+            return token
+        return f"{int(digits):,}{point}{fraction}"
+
+# Section labels used by FinWiseBot responses
+FINWISE_LABELS = {
+    'Summary:': '\n📋 Summary:',
+    'Key Points:': '\n🎯 Key Points:',
+    'Action Items:': '\n✅ Action Items:',
+    'Note:': '\n📝 Note:'
+}
+
+# Section labels used by FinancialAdvisor responses
+ADVISOR_LABELS = {
+    'Disclaimer:': '⚠️ Disclaimer:',
+    'Note:': '📝 Note:',
+    'Warning:': '⚠️ Warning:',
+    'Tip:': '💡 Tip:',
+    'Action Items:': '✅ Action Items:',
+    'Risk Level:': '🎯 Risk Level:',
+    'Tax Implications:': '💰 Tax Implications:',
+    'Pro Tip:': '🎯 Pro Tip:'
+}
+
+finwise_formatter = ResponseFormatter(FINWISE_LABELS)
+advisor_formatter = ResponseFormatter(ADVISOR_LABELS, strip_bold=False, format_numbers=False)
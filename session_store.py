@@ -0,0 +1,74 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+class SessionState:
+    """Compact per-user conversation state: mode, bounded history and preferences"""
+
+    def __init__(self, session_id, user_id="default", max_history=5):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.mode = 'advisor'
+        self.history = deque(maxlen=max_history)
+        self.summary = ''  # Rolling summary of turns that no longer fit in history
+        self.preferences = {
+            'language': 'en',
+            'detail_level': 'detailed',
+            'risk_profile': 'moderate'
+        }
+        self.created_at = time.time()
+        self.last_seen = self.created_at
+        # Requests from the same session run one at a time so history stays in order
+        self.lock = threading.Lock()
+
+class SessionStore:
+    """Thread-safe in-process store of session state with TTL and size-bounded eviction"""
+
+    def __init__(self, ttl=1800, max_sessions=10000, max_history=5, sweep_interval=60):
+        self.ttl = ttl                    # Seconds of inactivity before a session expires
+        self.max_sessions = max_sessions
+        self.max_history = max_history
+        self.sweep_interval = sweep_interval
+        self._sessions = OrderedDict()    # Least recently used first
+        self._lock = threading.Lock()
+        self._last_sweep = time.time()
+
+    @staticmethod
+    def new_session_id():
+        return uuid.uuid4().hex
+
+    def get(self, session_id, user_id="default"):
+        """Get the state for a session, creating it if it is new or has expired"""
+        now = time.time()
+        with self._lock:
+            if now - self._last_sweep > self.sweep_interval:
+                self._evict_expired(now)
+
+            state = self._sessions.get(session_id)
+            if state is None or now - state.last_seen > self.ttl:
+                state = SessionState(session_id, user_id=user_id, max_history=self.max_history)
+                self._sessions[session_id] = state
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+
+            state.last_seen = now
+            self._sessions.move_to_end(session_id)
+            return state
+
+    def remove(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def _evict_expired(self, now):
+        """Drop expired sessions; the oldest are at the front so we stop at the first live one"""
+        while self._sessions:
+            session_id, state = next(iter(self._sessions.items()))
+            if now - state.last_seen <= self.ttl:
+                break
+            self._sessions.pop(session_id)
+        self._last_sweep = now
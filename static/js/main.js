@@ -221,7 +221,15 @@ $(document).ready(function() {
         // Show typing indicator
         const typingIndicator = addTypingIndicator();
 
-        // Send to backend
+        // Stream the response when the browser can read a fetch body, otherwise wait for the whole reply
+        if (window.fetch && window.ReadableStream && window.TextDecoder) {
+            streamCommand(userInput, typingIndicator);
+        } else {
+            sendCommand(userInput, typingIndicator);
+        }
+    }
+
+    function sendCommand(userInput, typingIndicator) {
         $.ajax({
             url: '/api/command',
             method: 'POST',
@@ -235,13 +243,97 @@ $(document).ready(function() {
                 // Scroll to bottom
                 scrollToBottom();
             },
-            error: function() {
+            error: function(xhr) {
                 typingIndicator.remove();
-                addMessage('Sorry, I encountered an error processing your request.', 'bot');
+                const message = xhr.responseJSON && xhr.responseJSON.response;
+                addMessage(message || 'Sorry, I encountered an error processing your request.', 'bot');
             }
         });
     }
 
+    async function streamCommand(userInput, typingIndicator) {
+        let response;
+        try {
+            response = await fetch('/api/command/stream', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ command: userInput })
+            });
+        } catch (err) {
+            sendCommand(userInput, typingIndicator);
+            return;
+        }
+
+        // A server without the streaming endpoint still answers the plain one
+        if (response.status === 404 || response.status === 405) {
+            sendCommand(userInput, typingIndicator);
+            return;
+        }
+        if (!response.ok || !response.body) {
+            const body = await response.json().catch(() => ({}));
+            typingIndicator.remove();
+            addMessage(body.response || 'Sorry, I encountered an error processing your request.', 'bot');
+            return;
+        }
+
+        let message = null;
+        let text = '';
+        const render = () => {
+            if (!message) {
+                typingIndicator.remove();
+                message = addMessage('', 'bot');
+            }
+            message.find('.message-text').html(formatResponse(text));
+            scrollToBottom();
+        };
+
+        try {
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+
+                // SSE messages are separated by a blank line
+                const events = buffer.split('\n\n');
+                buffer = events.pop();
+                for (const raw of events) {
+                    const event = parseServerEvent(raw);
+                    if (event.type === 'error') {
+                        text += `\n\n${event.data.message}`;
+                    } else if (event.type === 'message' && event.data.delta) {
+                        text += event.data.delta;
+                    } else {
+                        continue;
+                    }
+                    render();
+                }
+            }
+        } catch (err) {
+            text += '\n\n⚠️ Connection lost before the response finished.';
+            render();
+            return;
+        }
+
+        if (!message) {
+            text = 'Sorry, I encountered an error processing your request.';
+            render();
+        }
+    }
+
+    function parseServerEvent(raw) {
+        let type = 'message';
+        let data = '';
+        for (const line of raw.split('\n')) {
+            if (line.startsWith('event:')) type = line.slice(6).trim();
+            else if (line.startsWith('data:')) data += line.slice(5).trim();
+        }
+        return { type, data: data ? JSON.parse(data) : {} };
+    }
+
     function addMessage(content, sender) {
         const time = new Date().toLocaleTimeString();
         const message = $(`
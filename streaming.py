@@ -0,0 +1,23 @@
+import json
+
+# Server-Sent Events helpers shared by the Flask and ASGI apps
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no'  # Stop nginx from buffering the stream
+}
+
+def sse_event(data, event=None):
+    """Encode one SSE message; data is sent as JSON so newlines survive"""
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
+
+def sse_stream(chunks):
+    """Turn a stream of response text into SSE messages, ending with a 'done' event"""
+    try:
+        for chunk in chunks:
+            if chunk:
+                yield sse_event({'delta': chunk})
+    except Exception as e:
+        yield sse_event({'message': str(e)}, event='error')
+        return
+    yield sse_event({}, event='done')
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+import yfinance
+
+from ohlcv_cache import download_batch
+from portfolio_manager import PortfolioManager
+from portfolio_valuation import holdings_frame, portfolio_totals, value_holdings
+
+def fake_download(closes, calls):
+    """yf.download stand-in returning ticker-grouped daily bars; closes maps ticker -> list of closes"""
+    def download(tickers, group_by=None, **options):
+        calls.append((list(tickers), options))
+        frames = {}
+        for ticker in tickers:
+            if ticker in closes:
+                close = pd.Series(closes[ticker], dtype=float)
+                frames[ticker] = pd.DataFrame({
+                    'Open': close, 'High': close, 'Low': close, 'Close': close, 'Volume': close * 0 + 1000
+                })
+        if not frames:
+            return pd.DataFrame()
+        data = pd.concat(frames, axis=1)
+        data.index = pd.bdate_range(end='2024-06-28', periods=len(data))
+        return data
+    return download
+
+def test_download_batch_splits_tickers(monkeypatch):
+    calls = []
+    monkeypatch.setattr(yfinance, 'download', fake_download({'TCS.NS': [1, 2], 'INFY.NS': [np.nan, 3]}, calls))
+    frames = download_batch(['TCS.NS', 'INFY.NS', 'MISSING.NS'], period='5d', auto_adjust=False)
+    assert sorted(frames) == ['INFY.NS', 'TCS.NS']
+    assert frames['TCS.NS']['Close'].tolist() == [1, 2]
+    assert frames['INFY.NS']['Close'].tolist() == [3]  # Rows with no data are dropped
+    assert calls == [(['TCS.NS', 'INFY.NS', 'MISSING.NS'], {'progress': False, 'threads': True,
+                                                           'period': '5d', 'auto_adjust': False})]
+
+def test_download_batch_errors_give_nothing(monkeypatch):
+    def broken(*args, **kwargs):
+        raise ConnectionError("offline")
+
+    monkeypatch.setattr(yfinance, 'download', broken)
+    assert download_batch(['TCS.NS']) == {}
+
+def test_download_batch_single_flat_frame(monkeypatch):
+    data = pd.DataFrame({'Close': [1.0, 2.0]}, index=pd.bdate_range(end='2024-06-28', periods=2))
+    monkeypatch.setattr(yfinance, 'download', lambda tickers, **options: data)
+    assert download_batch(['TCS.NS'])['TCS.NS']['Close'].tolist() == [1, 2]
+    assert download_batch(['TCS.NS', 'INFY.NS']) == {}  # Ambiguous without a ticker level
+
+def test_get_quotes_uses_one_download_and_caches(monkeypatch, tmp_path):
+    calls = []
+    monkeypatch.setattr(yfinance, 'download', fake_download({'TCS.NS': [3000, 3050, 3100], 'INFY.NS': [1500]}, calls))
+    manager = PortfolioManager(storage=object(), history_cache=object())
+    quotes = manager.get_quotes(['TCS', 'INFY', 'TCS', 'GONE'])
+    assert quotes == {
+        'TCS': {'price': 3100, 'previous_close': 3050},
+        'INFY': {'price': 1500, 'previous_close': 1500}
+    }
+    assert len(calls) == 1
+    assert manager.get_quotes(['TCS', 'INFY']) == quotes
+    assert len(calls) == 1  # Served from the quote cache
+    manager.get_quotes(['TCS', 'GONE'])
+    assert calls[-1][0] == ['GONE.NS']  # Only the missing symbol goes upstream
+
+def test_value_holdings_with_batched_quotes():
+    holdings = holdings_frame([
+        ('u1', 'default', 'TCS', 10, 3000, 2900),
+        ('u1', 'default', 'INFY', 20, 1500, 1450),
+        ('u2', 'default', 'TCS', 5, 3200, 3000)
+    ])
+    quotes = {'TCS': {'price': 3100, 'previous_close': 3050}}
+    valued = value_holdings(holdings, quotes)
+    assert valued['current_price'].tolist() == [3100, 1450, 3100]  # INFY keeps its stored price
+    assert valued['day_change'].tolist() == [500, 0, 250]
+    assert valued['weight'].tolist() == pytest.approx([31000 / 60000 * 100, 29000 / 60000 * 100, 100])
+
+    totals = portfolio_totals(valued)
+    assert totals.loc[('u1', 'default'), 'current_value'] == 60000
+    assert totals.loc[('u2', 'default'), 'profit_loss'] == -500
+    assert totals.loc[('u1', 'default'), 'holdings'] == 2
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+
+from command_router import CommandRouter
+from financial_advisor_bot import FinancialAdvisor
+from finwise_bot import FinWiseBot
+
+def test_longest_phrase_wins_and_args_become_keywords():
+    router = CommandRouter()
+    router.add('top', lambda: "top")
+    router.add('top gainers', lambda count='5': f"gainers {count}", args=r"(?P<count>\d+)?")
+    assert router.route("top") == "top"
+    assert router.route("TOP Gainers 10") == "gainers 10"
+    assert router.route("top gainers") == "gainers 5"
+
+def test_unmatched_input_returns_none():
+    router = CommandRouter()
+    router.add('price', lambda symbol: symbol, args=r"(?P<symbol>[A-Z]+)")
+    assert router.route("what is the price of gold") is None
+    assert router.route("price") is None
+    assert router.route("price TCS INFY") is None
+    assert sorted(router.commands) == ['price']
+
+def finwise_router():
+    """FinWiseBot's command grammar with its handlers stubbed out"""
+    bot = FinWiseBot.__new__(FinWiseBot)
+    bot.market_analyzer = SimpleNamespace(verify_price=lambda symbol: symbol)
+    bot.format_price_data = lambda symbol, data: f"price {symbol}"
+    bot.financial_advisor = SimpleNamespace(**{
+        name: (lambda *args, name=name, **kwargs: (name, args, kwargs)) for name in (
+            'format_sip_result', 'format_emi_result', 'format_lumpsum_result',
+            'format_sip_simulation', 'format_lumpsum_simulation', 'format_goal_simulation')
+    })
+    advisor = bot.financial_advisor
+    advisor.run_simulation = lambda kind, text: FinancialAdvisor.run_simulation(advisor, kind, text)
+    return bot._build_router()
+
+def test_symbols_must_be_uppercase():
+    router = finwise_router()
+    assert router.route("price TCS") == "price TCS"
+    assert router.route("Price M&M.NS") == "price M&M"
+    assert router.route("price of reliance") is None
+    assert router.route("price today") is None
+    assert router.route("price tcs") is None
+
+def test_unknown_learn_topics_fall_through():
+    router = finwise_router()
+    assert router.route("learn mutual funds").startswith("\n📚 Understanding Mutual Funds")
+    assert router.route("learn Stocks") is not None
+    assert router.route("learn what is a sip") is None
+
+def test_calculator_amounts():
+    router = finwise_router()
+    assert router.route("calculate emi ₹5,00,000 8.5% 20") == ('format_emi_result', (500000.0, 8.5, 20.0), {})
+    assert router.route("simulate goal 1000000 10 5000 12%") == \
+        ('format_goal_simulation', (1000000.0, 10.0, 5000.0), {'expected_return': 12.0})
+    assert router.route("calculate sip 5000") is None
+
+def test_simulations_parse_like_the_advisor():
+    router = finwise_router()
+    assert router.route("simulate sip ₹5,000 20 12%") == \
+        ('format_sip_simulation', (5000.0, 20.0), {'expected_return': 12.0})
+    assert router.route("simulate lumpsum 100000 5") == \
+        ('format_lumpsum_simulation', (100000.0, 5.0), {'expected_return': None})
+    assert router.route("simulate goal 1000000 10") is None
+    assert router.route("simulate sip 5000 for 20 years") is None
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"{name}: ok")
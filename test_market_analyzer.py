@@ -0,0 +1,118 @@
+import threading
+import time
+
+import pytest
+
+import market_analyzer
+from market_analyzer import MarketAnalyzer
+
+@pytest.fixture
+def analyzer(tmp_path):
+    analyzer = MarketAnalyzer()
+    analyzer.analysis_dir = tmp_path
+    return analyzer
+
+def stub_sections(analyzer, seconds, timeout):
+    """Make every report section take the given seconds, with the same timeout for each"""
+    analyzer.report_section_timeouts = {key: timeout for key in analyzer.report_section_timeouts}
+    analyzer.get_context = lambda symbol: None
+    analyzer.get_technical_analysis = lambda symbol, context=None: (time.sleep(seconds), 'technical')[1]
+    analyzer.get_fundamental_analysis = lambda symbol, context=None: (time.sleep(seconds), 'fundamental')[1]
+    analyzer.get_news_sentiment = lambda symbol: (time.sleep(seconds), 'sentiment')[1]
+    analyzer.get_sector_analysis = lambda symbol, context=None: (time.sleep(seconds), 'sector')[1]
+
+def test_report_sections_share_one_executor(analyzer):
+    assert MarketAnalyzer()._report_executor is analyzer._report_executor is market_analyzer.report_executor
+
+def test_report_section_timeout_starts_when_it_runs(analyzer):
+    stub_sections(analyzer, seconds=0.2, timeout=0.3)
+    release = threading.Event()
+    busy = [market_analyzer.report_executor.submit(release.wait, 0.2)
+            for _ in range(market_analyzer.report_executor._max_workers)]
+    report = analyzer.generate_comprehensive_report('TCS')  # Queued 0.2s, then runs 0.2s of its 0.3s
+    assert all(future.done() for future in busy)
+    assert report['technical_analysis'] == 'technical'
+    assert report['sector_analysis'] == 'sector'
+
+def test_report_section_never_started_is_cancelled(analyzer):
+    stub_sections(analyzer, seconds=0.0, timeout=0.1)
+    release = threading.Event()
+    for _ in range(market_analyzer.report_executor._max_workers):
+        market_analyzer.report_executor.submit(release.wait, 1)
+    try:
+        report = analyzer.generate_comprehensive_report('TCS')
+    finally:
+        release.set()
+    assert report['technical_analysis'] == "Error in technical analysis: not started within 0.1s, the server is busy"
+
+def test_slow_report_section_times_out_alone(analyzer):
+    stub_sections(analyzer, seconds=0.0, timeout=0.2)
+    analyzer.get_news_sentiment = lambda symbol: (time.sleep(0.5), 'sentiment')[1]
+    report = analyzer.generate_comprehensive_report('TCS')
+    assert report['sentiment_analysis'] == "Error in sentiment analysis: timed out after 0.2s"
+    assert report['technical_analysis'] == 'technical'
+    time.sleep(0.4)  # Let the abandoned section finish before the next test uses the pool
+
+def stub_price_sources(analyzer, prices, delays):
+    """Price sources answering with the given prices after the given delays; returns the call log"""
+    calls = []
+
+    def source(name):
+        def fetch(symbol):
+            calls.append(name)
+            time.sleep(delays[name])
+            return {'price': prices[name]}
+        return fetch
+
+    analyzer.price_sources = {name: source(name) for name in prices}
+    analyzer.price_source_timeouts = {name: 1 for name in prices}
+    return calls
+
+def timed_price(analyzer, symbol):
+    started = time.monotonic()
+    result = analyzer.verify_price(symbol)
+    return result, time.monotonic() - started
+
+def test_verify_price_waits_for_both_sources_when_cold(analyzer):
+    stub_price_sources(analyzer, {'yahoo': 100.0, 'nse': 100.1}, {'yahoo': 0.0, 'nse': 0.3})
+    result, elapsed = timed_price(analyzer, 'TCS')
+    assert elapsed >= 0.3
+    assert sorted(result['sources']) == ['nse', 'yahoo']
+
+def test_verify_price_returns_early_when_a_recent_quote_agrees(analyzer):
+    prices = {'yahoo': 100.0, 'nse': 100.1}
+    stub_price_sources(analyzer, prices, {'yahoo': 0.0, 'nse': 0.3})
+    analyzer.verify_price('TCS')
+    analyzer.quote_ttl = 0  # Both quotes are now too old to serve, but recent enough to confirm
+    time.sleep(0.01)
+    result, elapsed = timed_price(analyzer, 'TCS')
+    assert elapsed < 0.2
+    assert list(result['sources']) == ['yahoo']
+
+def test_verify_price_waits_when_the_recent_quote_disagrees(analyzer):
+    prices = {'yahoo': 100.0, 'nse': 100.1}
+    stub_price_sources(analyzer, prices, {'yahoo': 0.0, 'nse': 0.3})
+    analyzer.verify_price('TCS')
+    analyzer.quote_ttl = 0
+    prices['yahoo'] = 110.0  # Moved 10% since the last check
+    time.sleep(0.01)
+    result, elapsed = timed_price(analyzer, 'TCS')
+    assert elapsed >= 0.3
+    assert sorted(result['sources']) == ['nse', 'yahoo']
+
+def test_verify_price_quorum_shrinks_to_live_sources(analyzer):
+    stub_price_sources(analyzer, {'yahoo': 100.0, 'nse': 100.1, 'other': 100.0},
+                       {'yahoo': 0.0, 'nse': 0.5, 'other': 0.0})
+
+    def broken(symbol):
+        raise ConnectionError("down")
+
+    analyzer.price_sources['other'] = broken
+    analyzer.price_quorum = 3
+    result, elapsed = timed_price(analyzer, 'TCS')
+    assert elapsed >= 0.5  # Two sources left, so both must answer
+    assert sorted(result['sources']) == ['nse', 'yahoo']
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,39 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from market_context import MarketContextService
+
+def slow_analyzer(delay):
+    """An analyzer whose market mood takes `delay` seconds to fetch"""
+    def mood():
+        time.sleep(delay)
+        return "Neutral"
+
+    return SimpleNamespace(get_market_mood=mood, get_market_breadth=lambda: {'error': "offline"})
+
+def refreshers():
+    return [thread for thread in threading.enumerate() if thread.name == 'market-context' and thread.is_alive()]
+
+def test_restart_during_refresh_leaves_one_refresher():
+    service = MarketContextService(slow_analyzer(0.1), open_interval=0.01, closed_interval=0.01)
+    service.start()
+    first = service._thread
+    service.stop()
+    service.start()  # While the first thread is still refreshing
+    second = service._thread
+    first.join(1)
+    assert not first.is_alive()
+    assert refreshers() == [second]
+
+    service.stop()
+    second.join(1)
+    assert not refreshers()
+    assert service.describe().startswith("Neutral")  # describe() starts a fresh refresher
+    service.stop()
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"{name}: ok")
@@ -0,0 +1,196 @@
+import threading
+import time
+
+from finwise_bot import FinWiseBot
+from model_backends import BackendScheduler, ModelBackend
+from response_cache import ResponseCache
+
+class Chunk:
+    def __init__(self, text):
+        self.text = text
+
+class StreamingModel:
+    """Stands in for a Gemini model; yields one line per chunk"""
+
+    def __init__(self, lines):
+        self.lines = lines
+
+    def generate_content(self, contents, stream=False):
+        for line in self.lines:
+            yield Chunk(line + "\n")
+
+def half_open_backend(lines):
+    """A gemini backend whose circuit has opened and whose cooldown is already over"""
+    backend = ModelBackend('gemini', lambda: StreamingModel(lines), priority=1, cooldown=0)
+    for _ in range(backend.min_calls):
+        backend.record(False, 1.0)
+    assert backend.circuit == 'open'
+    return backend
+
+def streaming_bot(backend):
+    """A FinWiseBot with only what _stream_enhanced_response needs"""
+    bot = FinWiseBot.__new__(FinWiseBot)
+    bot.scheduler = BackendScheduler({'gemini': backend}, max_workers=1)
+    bot.response_cache = ResponseCache()
+    bot._build_response_prompt = lambda query, mode, session=None: ('system', query)
+    bot._gemini_request = lambda model, mode, system_prompt, prompt: (model, prompt)
+    bot._get_enhanced_response = lambda query, mode='advisor', skip=(), session=None: 'fallback'
+    return bot
+
+def test_stream_closed_mid_way_gives_back_half_open_probe():
+    backend = half_open_backend(["First line", "Second line", "Third line"])
+    stream = streaming_bot(backend)._stream_enhanced_response("what is a sip")
+    next(stream)
+    assert backend.circuit == 'half_open' and not backend.available
+    stream.close()  # The SSE client disconnected
+    assert backend.available
+    assert backend.allow_request()
+
+def test_stream_prompt_error_records_failed_probe():
+    backend = half_open_backend(["First line"])
+    bot = streaming_bot(backend)
+
+    def broken_prompt(query, mode, session=None):
+        raise RuntimeError("prompt")
+
+    bot._build_response_prompt = broken_prompt
+    assert list(bot._stream_enhanced_response("what is a sip")) == ['fallback']
+    assert backend.circuit == 'open'
+    assert backend.allow_request()  # Cooldown of 0, so the next probe is allowed at once
+
+def test_stream_closed_mid_way_records_latency():
+    backend = ModelBackend('gemini', lambda: StreamingModel(["First line", "Second line"]), priority=1)
+    stream = streaming_bot(backend)._stream_enhanced_response("what is a sip")
+    next(stream)
+    stream.close()
+    assert list(backend.outcomes) == [True]
+    assert len(backend.latencies) == 1
+
+def test_stream_closed_before_disclaimer_is_still_cached():
+    backend = ModelBackend('gemini', lambda: StreamingModel(["First line", "Second line"]), priority=1)
+    bot = streaming_bot(backend)
+    stream = bot._stream_enhanced_response("what is a sip")
+    streamed = [next(stream) for _ in range(3)]  # Header, then both lines; only the disclaimer is left
+    stream.close()
+    cached = bot.response_cache.get('advisor', "what is a sip")
+    assert cached is not None and cached.startswith(''.join(streamed))
+
+def scheduler_for(delays, deadline=2.0, max_workers=4):
+    """A scheduler over backends a, b, ... (in that priority order) that answer after the given delays
+
+    A delay of None makes that backend fail. Returns the scheduler, the call and the list of
+    backends called, in order.
+    """
+    backends = {name: ModelBackend(name, lambda: object(), priority=i + 1) for i, name in enumerate(delays)}
+    scheduler = BackendScheduler(backends, default_hedge_delay=0.1, min_hedge_delay=0.05,
+                                 deadline=deadline, max_workers=max_workers)
+    called = []
+
+    def call(name, model):
+        called.append(name)
+        if delays[name] is None:
+            raise RuntimeError("down")
+        time.sleep(delays[name])
+        return f"answer from {name}"
+
+    return scheduler, call, called
+
+def test_scheduler_prefers_priority_then_latency():
+    scheduler, call, _ = scheduler_for({'a': 0.0, 'b': 0.0})
+    assert [backend.name for backend in scheduler.ordered()] == ['a', 'b']
+    for _ in range(3):
+        scheduler.backends['a'].record(True, 1.0)
+        scheduler.backends['b'].record(True, 0.01)
+    assert [backend.name for backend in scheduler.ordered()] == ['b', 'a']
+    assert [backend.name for backend in scheduler.ordered(skip=('b',))] == ['a']
+
+def test_scheduler_hedges_to_the_next_backend_when_slow():
+    scheduler, call, called = scheduler_for({'a': 1.0, 'b': 0.05})
+    started = time.monotonic()
+    assert scheduler.run(call) == ('b', "answer from b")
+    assert time.monotonic() - started < 0.5
+    assert called == ['a', 'b']
+
+def test_scheduler_moves_on_at_once_after_a_failure():
+    scheduler, call, called = scheduler_for({'a': None, 'b': 0.0})
+    scheduler.default_hedge_delay = 1.0
+    started = time.monotonic()
+    assert scheduler.run(call) == ('b', "answer from b")
+    assert time.monotonic() - started < 0.5
+    assert list(scheduler.backends['a'].outcomes) == [False]
+
+def test_scheduler_deadline_counts_hung_calls_as_failures():
+    scheduler, call, _ = scheduler_for({'a': 1.0, 'b': 1.0}, deadline=0.3)
+    started = time.monotonic()
+    assert scheduler.run(call) == (None, None)
+    assert time.monotonic() - started < 0.6
+    assert list(scheduler.backends['a'].outcomes) == [False]
+    assert list(scheduler.backends['b'].outcomes) == [False]
+    time.sleep(0.8)  # The abandoned calls finish without recording a second outcome
+    assert len(scheduler.backends['a'].outcomes) == 1
+
+def test_scheduler_does_not_hedge_while_queued():
+    scheduler, call, called = scheduler_for({'a': 0.05, 'b': 0.0}, max_workers=2)
+    busy = threading.Event()
+    for _ in range(2):
+        scheduler._executor.submit(busy.wait, 0.3)  # Other requests hold both workers
+    assert scheduler.run(call) == ('a', "answer from a")
+    assert called == ['a']
+
+def test_scheduler_deadline_runs_from_attempt_start():
+    scheduler, call, called = scheduler_for({'a': 0.2}, deadline=0.3, max_workers=1)
+    busy = threading.Event()
+    scheduler._executor.submit(busy.wait, 0.2)
+    assert scheduler.run(call) == ('a', "answer from a")  # Queued 0.2s, then answered 0.2s after starting
+
+def test_breaker_opens_after_failures_and_closes_after_good_probe():
+    backend = ModelBackend('a', lambda: object(), priority=1, cooldown=0.05, max_cooldown=1)
+    for _ in range(backend.min_calls - 1):
+        backend.record(False, 1.0)
+    assert backend.circuit == 'closed'
+    backend.record(False, 1.0)
+    assert backend.circuit == 'open'
+    assert not backend.available and not backend.allow_request()
+
+    time.sleep(0.06)
+    assert backend.available
+    assert backend.allow_request()
+    assert backend.circuit == 'half_open'
+    assert not backend.allow_request()  # Only one probe at a time
+    backend.record(True, 0.1)
+    assert backend.circuit == 'closed'
+    assert backend.cooldown == backend.base_cooldown
+
+def test_breaker_failed_probe_doubles_cooldown():
+    backend = ModelBackend('a', lambda: object(), priority=1, cooldown=0.05, max_cooldown=0.08)
+    for _ in range(backend.min_calls):
+        backend.record(False, 1.0)
+    time.sleep(0.06)
+    assert backend.allow_request()
+    backend.record(False, 1.0)
+    assert backend.circuit == 'open'
+    assert backend.cooldown == 0.08  # Doubled, but capped at max_cooldown
+
+def test_breaker_release_frees_the_probe():
+    backend = ModelBackend('a', lambda: object(), priority=1, cooldown=0)
+    for _ in range(backend.min_calls):
+        backend.record(False, 1.0)
+    assert backend.allow_request()
+    backend.release()
+    assert backend.circuit == 'half_open'
+    assert backend.allow_request()
+
+def test_failed_load_makes_backend_unavailable():
+    def loader():
+        raise ImportError("missing package")
+
+    backend = ModelBackend('a', loader, priority=1)
+    assert backend.get() is None
+    assert backend.status == 'error'
+    assert not backend.available
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"{name}: ok")
@@ -0,0 +1,57 @@
+import pytest
+
+from financial_advisor_bot import FinancialCalculator, parse_simulation_args
+from monte_carlo import MonteCarloSimulator
+
+YEARS, RATE = 20, 12.0
+
+def close(a, b, tolerance=1e-4):
+    """Equal within a relative tolerance; paths are simulated in float32"""
+    return abs(a - b) <= tolerance * abs(b)
+
+def test_sip_matches_calculator():
+    """With no volatility every path is the deterministic SIP"""
+    result = FinancialCalculator.simulate_sip_returns(5000, YEARS, RATE, volatility=0, paths=100)
+    expected = FinancialCalculator.calculate_sip_returns(5000, YEARS, RATE)
+    assert close(result['percentiles'][5], expected['future_value'])
+    assert close(result['percentiles'][95], expected['future_value'])
+    assert result['total_investment'] == expected['total_investment']
+
+def test_lumpsum_matches_calculator():
+    result = FinancialCalculator.simulate_lumpsum_returns(100000, YEARS, RATE, volatility=0, paths=100)
+    expected = FinancialCalculator.calculate_lumpsum_returns(100000, YEARS, RATE)
+    assert close(result['percentiles'][50], expected['future_value'])
+
+def test_goal_matches_calculator():
+    sip = FinancialCalculator.calculate_sip_returns(5000, YEARS, RATE)['future_value']
+    result = FinancialCalculator.simulate_goal(sip * 0.99, YEARS, monthly_investment=5000,
+                                               expected_return=RATE, volatility=0, paths=100)
+    assert close(result['percentiles'][50], sip)
+    assert result['success_probability'] == 100
+    assert close(result['sip_for_90_percent'], 5000 * 0.99)
+
+    # A lump sum in a goal compounds monthly, like the SIP it is added to
+    result = FinancialCalculator.simulate_goal(1, YEARS, lumpsum=100000, expected_return=RATE, volatility=0, paths=100)
+    assert close(result['percentiles'][50], 100000 * (1 + RATE / 1200) ** (12 * YEARS))
+
+def test_horizon_under_a_month_is_rejected():
+    with pytest.raises(ValueError):
+        FinancialCalculator.simulate_goal(100000, 0.02, monthly_investment=5000, paths=100)
+    with pytest.raises(ValueError):
+        FinancialCalculator.simulate_sip_returns(5000, 0, paths=100)
+    result = FinancialCalculator.simulate_goal(5000, 1 / 12, monthly_investment=5000, volatility=0, paths=100)
+    assert result['sip_for_90_percent'] > 0
+
+def test_simulation_arguments():
+    assert parse_simulation_args('sip', "₹5,000 20 12%") == ([5000.0, 20.0], 12.0)
+    assert parse_simulation_args('lumpsum', "1,00,000 5") == ([100000.0, 5.0], None)
+    assert parse_simulation_args('goal', "1000000 10 5000 12.5") == ([1000000.0, 10.0, 5000.0], 12.5)
+    assert parse_simulation_args('goal', "1000000 10") is None
+    assert parse_simulation_args('sip', "5000 20 12% extra") is None
+    assert parse_simulation_args('swp', "5000 20") is None
+
+if __name__ == "__main__":
+    for test in (test_sip_matches_calculator, test_lumpsum_matches_calculator, test_goal_matches_calculator,
+                 test_horizon_under_a_month_is_rejected, test_simulation_arguments):
+        test()
+        print(f"{test.__name__}: ok")
@@ -0,0 +1,91 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from nse_client import NSEClient
+
+class FakeSession:
+    """Counts homepage and API calls; the homepage takes homepage_delay seconds"""
+
+    def __init__(self, homepage_delay=0.0):
+        self.homepage_delay = homepage_delay
+        self.cookies = []
+        self.homepage_calls = 0
+        self.api_calls = 0
+        self._lock = threading.Lock()
+
+    def get(self, url, params=None, timeout=None):
+        with self._lock:
+            if url == NSEClient.BASE_URL:
+                self.homepage_calls += 1
+            else:
+                self.api_calls += 1
+        if url == NSEClient.BASE_URL:
+            time.sleep(self.homepage_delay)
+        return SimpleNamespace(status_code=200, json=lambda: {'ok': True})
+
+def client_with(session, **options):
+    client = NSEClient(**options)
+    client._session = session
+    return client
+
+def run_together(func, count):
+    threads = [threading.Thread(target=func) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def test_first_cookie_is_fetched_once():
+    session = FakeSession(homepage_delay=0.1)
+    client = client_with(session)
+    run_together(lambda: client.get_json('/api/quote-equity'), 10)
+    assert session.homepage_calls == 1
+    assert session.api_calls == 10
+
+def test_cookie_refresh_does_not_block_other_callers():
+    session = FakeSession(homepage_delay=0.5)
+    client = client_with(session)
+    client._cookie_fetched = time.time() - 400  # An expiring cookie is still there to use
+    refresher = threading.Thread(target=client.get, args=('/api/quote-equity',))
+    refresher.start()
+    time.sleep(0.05)
+    started = time.monotonic()
+    assert client.get_json('/api/quote-equity') == {'ok': True}
+    assert time.monotonic() - started < 0.2
+    refresher.join()
+    assert session.homepage_calls == 1
+    assert client._cookie_expires > time.time()
+
+def test_rejected_cookie_is_refreshed_once_and_retried():
+    session = FakeSession()
+    responses = iter([403, 200])
+    api = session.get
+
+    def get(url, params=None, timeout=None):
+        response = api(url, params, timeout)
+        if url != NSEClient.BASE_URL:
+            response.status_code = next(responses)
+        return response
+
+    session.get = get
+    client = client_with(session)
+    assert client.get_json('/api/quote-equity') == {'ok': True}
+    assert session.homepage_calls == 2  # The first cookie, then the refresh after the 403
+
+def test_throttle_allows_a_burst_then_the_sustained_rate():
+    client = client_with(FakeSession(), rate=20, burst=5)
+    started = time.monotonic()
+    for _ in range(5):
+        client._throttle()
+    assert time.monotonic() - started < 0.05
+    assert 0.2 < client.queue_time(5) <= 0.25
+    for _ in range(5):
+        client._throttle()
+    assert 0.2 <= time.monotonic() - started < 0.4
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"{name}: ok")
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from portfolio_risk import TRADING_DAYS, PortfolioRiskEngine, assess_risk
+
+def returns_frame(holdings, market):
+    """Daily returns with holding columns (SYMBOL.NS) and the benchmark last"""
+    frame = pd.DataFrame({f"{symbol}.NS": values for symbol, values in holdings.items()})
+    frame['^NSEI'] = market
+    return frame
+
+def market_returns(days=250, seed=1):
+    return np.random.default_rng(seed).normal(0.0005, 0.01, days)
+
+def test_beta_and_alpha_of_a_leveraged_holding():
+    market = market_returns()
+    engine = PortfolioRiskEngine(history_cache=None, risk_free_rate=0.0)
+    metrics = engine.compute(returns_frame({'LEV': 2 * market}, market), np.array([100000.0]))
+    assert metrics['beta'] == pytest.approx(2.0)
+    assert metrics['alpha'] == pytest.approx(0.0, abs=1e-9)
+    assert metrics['holding_betas'] == {'LEV': 2.0}
+    assert metrics['volatility'] == pytest.approx(2 * market.std(ddof=1) * np.sqrt(TRADING_DAYS) * 100)
+    assert metrics['days'] == 250
+
+def test_sharpe_sortino_drawdown_and_var():
+    market = market_returns()
+    holding = np.random.default_rng(2).normal(0.001, 0.02, 250)
+    engine = PortfolioRiskEngine(history_cache=None)
+    metrics = engine.compute(returns_frame({'A': holding}, market), np.array([50000.0]))
+
+    annual = holding.mean() * TRADING_DAYS
+    volatility = holding.std(ddof=1) * np.sqrt(TRADING_DAYS)
+    assert metrics['sharpe_ratio'] == pytest.approx((annual - 0.065) / volatility)
+    downside = np.sqrt(np.mean(np.minimum(holding - 0.065 / TRADING_DAYS, 0) ** 2) * TRADING_DAYS)
+    assert metrics['sortino_ratio'] == pytest.approx((annual - 0.065) / downside)
+
+    wealth = np.cumprod(1 + holding)
+    assert metrics['max_drawdown'] == pytest.approx((wealth / np.maximum.accumulate(wealth) - 1).min() * 100)
+    assert metrics['var_historical'] == pytest.approx(-np.percentile(holding, 5) * 100)
+    assert metrics['var_amount'] == pytest.approx(metrics['var_historical'] / 100 * 50000)
+    assert metrics['var_parametric'] == pytest.approx(-(holding.mean() - 1.6448536 * holding.std(ddof=1)) * 100, rel=1e-6)
+
+def test_weights_come_from_values():
+    market = market_returns()
+    engine = PortfolioRiskEngine(history_cache=None, risk_free_rate=0.0)
+    metrics = engine.compute(returns_frame({'A': market, 'B': 3 * market}, market), np.array([75.0, 25.0]))
+    assert metrics['beta'] == pytest.approx(0.75 * 1 + 0.25 * 3)
+    assert metrics['max_weight'] == 75
+    assert metrics['diversification_score'] == pytest.approx(1 / (0.75 ** 2 + 0.25 ** 2), abs=0.05)
+
+def test_too_little_history_gives_concentration_only():
+    market = market_returns(days=10)
+    engine = PortfolioRiskEngine(history_cache=None)
+    metrics = engine.compute(returns_frame({'A': market}, market), np.array([100.0]))
+    assert 'beta' not in metrics and metrics['days'] == 0
+    assert assess_risk(metrics, 1)[0] == "High"
+
+def test_holdings_without_history_are_left_out():
+    market = market_returns()
+    engine = PortfolioRiskEngine(history_cache=None, risk_free_rate=0.0)
+    returns = returns_frame({'A': 2 * market, 'NEW': np.full(250, np.nan)}, market)
+    metrics = engine.compute(returns, np.array([50.0, 50.0]))
+    assert metrics['beta'] == pytest.approx(2.0)
+    assert list(metrics['holding_betas']) == ['A']
+
+class FakeHistoryCache:
+    def __init__(self, closes):
+        self.closes = closes
+        self.calls = 0
+
+    def get_histories(self, tickers, period='1y'):
+        self.calls += 1
+        index = pd.bdate_range(end='2024-06-28', periods=len(next(iter(self.closes.values()))))
+        return {
+            ticker: pd.DataFrame({'Close': self.closes[ticker]}, index=index) if ticker in self.closes else pd.DataFrame()
+            for ticker in tickers
+        }
+
+def test_get_metrics_aligns_histories_and_caches_by_key():
+    market = np.cumprod(1 + market_returns())
+    cache = FakeHistoryCache({'TCS.NS': market ** 2, '^NSEI': market})
+    engine = PortfolioRiskEngine(cache, risk_free_rate=0.0)
+    metrics = engine.get_metrics(('u1', 'default', 3), ['TCS', 'GONE'], [1000.0, 500.0])
+    assert metrics['holding_betas'] == {'TCS': pytest.approx(2.0, abs=0.05)}
+    assert engine.get_metrics(('u1', 'default', 3), ['TCS', 'GONE'], [1000.0, 500.0]) is metrics
+    assert cache.calls == 1
+    engine.get_metrics(('u1', 'default', 4), ['TCS', 'GONE'], [1000.0, 500.0])  # A write bumped the version
+    assert cache.calls == 2
+
+def test_assess_risk_actions():
+    metrics = {'diversification_score': 2.0, 'max_weight': 60.0, 'volatility': 30.0,
+               'beta': 1.5, 'max_drawdown': -40.0, 'sharpe_ratio': -0.2}
+    level, actions = assess_risk(metrics, 3)
+    assert level == "High"
+    assert len(actions) == 5
+    calm = {'diversification_score': 8.0, 'max_weight': 15.0, 'volatility': 12.0,
+            'beta': 0.9, 'max_drawdown': -10.0, 'sharpe_ratio': 1.1}
+    assert assess_risk(calm, 12) == ("Low", ["Portfolio is well diversified"])
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,96 @@
+import json
+import threading
+
+import pytest
+
+from portfolio_store import JSONPortfolioStore, SQLitePortfolioStore, create_store, import_json_portfolios
+
+@pytest.fixture(params=['sqlite', 'json'])
+def store(request, tmp_path):
+    if request.param == 'sqlite':
+        return SQLitePortfolioStore(tmp_path / "portfolios.db")
+    return JSONPortfolioStore(tmp_path)
+
+def test_create_is_idempotent(store):
+    assert store.create("u1")
+    assert not store.create("u1")
+    assert store.exists("u1")
+    assert not store.exists("u2")
+    assert store.version("u1") == 0
+    assert store.version("u2") is None
+
+def test_add_holding_averages_buy_price(store):
+    store.create("u1")
+    assert store.add_holding("u1", "default", "TCS", 10, 3000, 3100)
+    assert store.add_holding("u1", "default", "TCS", 30, 3400, 3500)
+    holding = store.load("u1")["stocks"]["TCS"]
+    assert holding["quantity"] == 40
+    assert holding["buy_price"] == pytest.approx(3300)
+    assert holding["current_price"] == 3500
+    assert store.version("u1") == 2
+
+def test_add_holding_needs_a_portfolio(store):
+    assert not store.add_holding("u1", "default", "TCS", 10, 3000, 3100)
+
+def test_concurrent_adds_are_not_lost(store):
+    store.create("u1")
+    threads = [
+        threading.Thread(target=store.add_holding, args=("u1", "default", "INFY", 1, 1000 + i, 1500))
+        for i in range(20)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    holding = store.load("u1")["stocks"]["INFY"]
+    assert holding["quantity"] == 20
+    assert holding["buy_price"] == pytest.approx(1009.5)
+    assert store.version("u1") == 20
+
+def test_all_holdings_covers_every_portfolio(store):
+    store.create("u1")
+    store.create("u2", "retirement")
+    store.add_holding("u1", "default", "TCS", 10, 3000, 3100)
+    store.add_holding("u2", "retirement", "INFY", 5, 1400, 1500)
+    store.add_holding("u2", "retirement", "AXISBLUECHIP", 100, 50, 55, kind="mutual_funds")
+    assert sorted(store.all_holdings()) == [
+        ("u1", "default", "TCS", 10, 3000, 3100),
+        ("u2", "retirement", "INFY", 5, 1400, 1500)
+    ]
+
+def write_legacy(directory, user_id, name, stocks):
+    portfolio = {
+        "stocks": stocks, "mutual_funds": {},
+        "created_at": "2024-01-01T00:00:00", "last_updated": "2024-01-02T00:00:00"
+    }
+    with open(directory / f"{user_id}_{name}.json", 'w') as f:
+        json.dump(portfolio, f)
+
+def test_import_json_portfolios_once(tmp_path):
+    legacy = tmp_path / "legacy"
+    legacy.mkdir()
+    write_legacy(legacy, "u1", "default", {"TCS": {"quantity": 10, "buy_price": 3000, "current_price": 3100}})
+    write_legacy(legacy, "u_2", "growth", {"INFY": {"quantity": 5, "buy_price": 1400}})
+    (legacy / "broken_default.json").write_text("{not json")
+
+    store = SQLitePortfolioStore(tmp_path / "portfolios.db")
+    assert import_json_portfolios(store, legacy) == 2
+    assert import_json_portfolios(store, legacy) == 0
+    portfolio = store.load("u1")
+    assert portfolio["created_at"] == "2024-01-01T00:00:00"
+    assert portfolio["stocks"]["TCS"]["quantity"] == 10
+    assert store.load("u_2", "growth")["stocks"]["INFY"]["current_price"] == 0
+    assert store.load("broken") is None
+
+def test_create_store_imports_legacy_files(tmp_path):
+    write_legacy(tmp_path, "u1", "default", {"TCS": {"quantity": 10, "buy_price": 3000, "current_price": 3100}})
+    store = create_store('sqlite', tmp_path)
+    assert isinstance(store, SQLitePortfolioStore)
+    assert store.load("u1")["stocks"]["TCS"]["buy_price"] == 3000
+    assert isinstance(create_store('json', tmp_path), JSONPortfolioStore)
+    with pytest.raises(ValueError):
+        create_store('mongo', tmp_path)
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(pytest.main([__file__, "-q"]))
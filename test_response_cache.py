@@ -0,0 +1,91 @@
+import time
+
+from finwise_bot import FinWiseBot
+from response_cache import ResponseCache
+from session_store import SessionState
+
+def test_lru_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2)
+    cache.put('advisor', "What is a SIP?", "sip")
+    cache.put('advisor', "what is an emi", "emi")
+    assert cache.get('advisor', "what is a sip") == "sip"  # Now the most recently used
+    cache.put('advisor', "what is nav", "nav")
+    assert len(cache) == 2
+    assert cache.get('advisor', "what is an emi") is None
+    assert cache.get('advisor', "what is a sip") == "sip"
+
+def test_keys_normalize_queries_but_keep_modes_apart():
+    cache = ResponseCache()
+    cache.put('advisor', "  What is a SIP?? ", "sip")
+    assert cache.get('advisor', "what is a sip") == "sip"
+    assert cache.get('learning', "what is a sip") is None
+    assert ResponseCache.normalize("Returns of 12.5% on ₹5,000?") == "returns of 12.5% on ₹5 000"
+
+def test_entries_expire_after_their_mode_ttl():
+    cache = ResponseCache(ttl=0.05, mode_ttl={'learning': 60})
+    cache.put('advisor', "market view", "advice")
+    cache.put('learning', "what is a stock", "lesson")
+    time.sleep(0.1)
+    assert cache.get('advisor', "market view") is None
+    assert len(cache) == 1
+    assert cache.get('learning', "what is a stock") == "lesson"
+
+def test_sqlite_tier_survives_restart(tmp_path):
+    db_path = tmp_path / "responses.db"
+    ResponseCache(db_path=db_path).put('advisor', "what is a sip", "sip")
+    cache = ResponseCache(db_path=db_path)
+    assert len(cache) == 0
+    assert cache.get('advisor', "what is a sip") == "sip"
+
+    cache.clear()
+    assert ResponseCache(db_path=db_path).get('advisor', "what is a sip") is None
+
+def test_sqlite_tier_drops_expired_rows(tmp_path):
+    db_path = tmp_path / "responses.db"
+    ResponseCache(db_path=db_path).put('advisor', "what is a sip", "sip")
+    assert ResponseCache(ttl=-1, db_path=db_path).get('advisor', "what is a sip") is None
+    assert ResponseCache(db_path=db_path).get('advisor', "what is a sip") is None
+
+def letter_counts(text):
+    return [text.count(letter) for letter in "abcdefghijklmnopqrstuvwxyz"]
+
+def test_similar_queries_match_in_the_same_mode():
+    cache = ResponseCache(embed_fn=letter_counts, similarity_threshold=0.95)
+    cache.put('advisor', "how does a sip work", "sip")
+    assert cache.get('advisor', "how does an sip work") == "sip"
+    assert cache.get('learning', "how does an sip work") is None
+    assert cache.get('advisor', "best midcap funds for retirement") is None
+
+def test_failed_embedding_is_a_miss():
+    def broken(text):
+        raise RuntimeError("no model")
+
+    cache = ResponseCache(embed_fn=broken)
+    cache.put('advisor', "how does a sip work", "sip")
+    assert cache.get('advisor', "how does a sip work") == "sip"
+    assert cache.get('advisor', "how do sips work") is None
+
+def test_only_follow_ups_use_conversation_context():
+    bot = FinWiseBot.__new__(FinWiseBot)
+    session = SessionState('u1')
+    assert bot._is_cacheable("why is that?", 'advisor', session)  # Nothing to follow up on yet
+
+    session.history.append(("what is a sip", "A SIP is ..."))
+    assert bot._uses_context("why is that?", 'advisor', session)
+    assert bot._uses_context("what about HDFC?", 'analysis', session)
+    assert not bot._is_cacheable("why is that?", 'advisor', session)
+    assert bot._is_cacheable("what is an index fund", 'advisor', session)
+    assert bot._is_cacheable("explain that again", 'learning', session)
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    for test in (test_lru_evicts_least_recently_used, test_keys_normalize_queries_but_keep_modes_apart,
+                 test_entries_expire_after_their_mode_ttl, test_similar_queries_match_in_the_same_mode,
+                 test_failed_embedding_is_a_miss, test_only_follow_ups_use_conversation_context):
+        test()
+        print(f"{test.__name__}: ok")
+    for test in (test_sqlite_tier_survives_restart, test_sqlite_tier_drops_expired_rows):
+        with tempfile.TemporaryDirectory() as directory:
+            test(Path(directory))
+        print(f"{test.__name__}: ok")
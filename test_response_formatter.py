@@ -0,0 +1,37 @@
+from response_formatter import ADVISOR_LABELS, ResponseFormatter, advisor_formatter, finwise_formatter
+
+def test_longest_label_wins():
+    assert advisor_formatter.format("Pro Tip: start early. Tip: stay invested.") == \
+        "🎯 Pro Tip: start early. 💡 Tip: stay invested."
+
+def test_rupee_amounts_are_read_whole():
+    assert finwise_formatter.format("Invest ₹12,500 a month") == "Invest ₹12,500.00 a month"
+    assert finwise_formatter.format("₹ 1500.5") == "₹1,500.50"
+
+def test_percentages_and_long_numbers():
+    assert finwise_formatter.format("Returns of 12.5% and 1234.5678 units") == "Returns of 12.50% and 1,234.5678 units"
+    assert finwise_formatter.format("Bought 125000 shares") == "Bought 125,000 shares"
+    assert finwise_formatter.format("A 3-for-1 split and 450 shares") == "A 3-for-1 split and 450 shares"
+
+def test_years_are_left_alone():
+    assert finwise_formatter.format("In 2024 the Nifty crossed 21000") == "In 2024 the Nifty crossed 21,000"
+
+def test_bold_markers_and_labels():
+    assert finwise_formatter.format("**Summary:** markets rose") == "\n📋 Summary: markets rose"
+    assert advisor_formatter.format("**Note:** 12500") == "**📝 Note:** 12500"
+
+def test_stream_matches_whole_text():
+    text = "**Summary:** Nifty at 19845, up 0.85%\nBuy ₹12,500 of index funds\nPro Tip: 2024 was strong"
+    chunks = [text[i:i + 7] for i in range(0, len(text), 7)]  # Splits numbers and labels across chunks
+    for formatter in (finwise_formatter, advisor_formatter):
+        assert ''.join(formatter.stream(chunks)) == formatter.format(text)
+
+def test_nothing_to_format():
+    assert ResponseFormatter(strip_bold=False, format_numbers=False).format("**12500**") == "**12500**"
+    assert ResponseFormatter(ADVISOR_LABELS).format('') == ''
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"{name}: ok")